@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for MetadataManager
+
+Generates a deterministic corpus of JPEG, PNG, TIFF, BMP and WebP files
+carrying EXIF (with GPS and a large MakerNote), XMP and IPTC, then times
+the basic mode, advanced mode and metadata extraction over it. Each case
+runs in a fresh interpreter so its peak RSS is its own.
+
+    python benchmark.py                                   # print results
+    python benchmark.py --save-baseline baseline.json     # record a baseline
+    python benchmark.py --baseline baseline.json          # exit 1 on regression
+
+Baselines are machine-specific: record them on the machine that checks them.
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image, PngImagePlugin, TiffImagePlugin
+
+from metadata_engine import DEFAULT_SETTINGS, BatchEngine, default_worker_count, extract_metadata
+from metadata_formats import PHOTOSHOP_HEADER, XMP_HEADER
+
+
+CORPUS_FORMATS = ('.jpg', '.png', '.tif', '.bmp', '.webp')
+CASES = ('basic', 'advanced', 'extract')
+
+# Fields written by the advanced-mode case
+ADVANCED_FIELDS = {
+    'Artist': "Benchmark Photographer",
+    'Copyright': "(c) MetadataManager benchmark",
+    'Software': "MetadataManager",
+}
+
+# Allowed slowdown (or RSS growth) against the baseline before failing
+DEFAULT_TOLERANCE = 0.25
+
+# JPEG APP1 segments hold at most 64 KiB, EXIF header included
+JPEG_MAX_MAKERNOTE = 60 * 1024
+
+
+# ---------------------------------------------------------------------------
+# Corpus generation
+# ---------------------------------------------------------------------------
+
+def make_pixels(rng, size):
+    """Seeded noise, upscaled so it compresses roughly like a photo"""
+    width, height = size
+    small = ((width + 7) // 8, (height + 7) // 8)
+    noise = Image.frombytes('RGB', small, rng.randbytes(small[0] * small[1] * 3))
+    return noise.resize(size, Image.Resampling.BILINEAR)
+
+
+def make_exif(rng, makernote_size):
+    """EXIF block with camera tags, a GPS IFD and a MakerNote of the given size"""
+    exif = Image.Exif()
+    exif[0x010F] = "BenchCam"              # Make
+    exif[0x0110] = "Model 7"               # Model
+    exif[0x0131] = "Firmware 1.2.3"        # Software
+    exif[0x0132] = "2025:08:01 12:00:00"   # DateTime
+    exif[0x013B] = "Someone Private"       # Artist
+
+    sub = exif.get_ifd(0x8769)
+    sub[0x9003] = "2025:08:01 12:00:00"    # DateTimeOriginal
+    if makernote_size:
+        sub[0x927C] = rng.randbytes(makernote_size)
+
+    gps = exif.get_ifd(0x8825)
+    gps[1] = "N"
+    gps[2] = (52.0, 22.0, rng.randrange(60) + 0.5)
+    gps[3] = "E"
+    gps[4] = (4.0, 53.0, rng.randrange(60) + 0.5)
+    return exif.tobytes()
+
+
+def make_xmp(size):
+    """An XMP packet padded to roughly size bytes"""
+    packet = ('<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF '
+              'xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+              '<rdf:Description dc:creator="Someone Private" '
+              'xmlns:dc="http://purl.org/dc/elements/1.1/"/></rdf:RDF></x:xmpmeta>')
+    return (packet + ' ' * max(0, size - len(packet))).encode('utf-8')
+
+
+def make_iptc():
+    """IPTC-IIM record with a caption, keywords and a byline"""
+    record = b''
+    for dataset, value in ((120, b'Private caption'), (25, b'family'),
+                           (25, b'holiday'), (80, b'Someone Private')):
+        record += struct.pack('>BBBH', 0x1C, 2, dataset, len(value)) + value
+    return record
+
+
+def _jpeg_segment(marker, payload):
+    return bytes((0xFF, marker)) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def save_sample(path, ext, rng, size, makernote_size, xmp_size):
+    """Write one corpus image with all metadata the format can carry"""
+    image = make_pixels(rng, size)
+    xmp = make_xmp(xmp_size)
+    iptc = make_iptc()
+    buf = io.BytesIO()
+
+    if ext == '.jpg':
+        exif = make_exif(rng, min(makernote_size, JPEG_MAX_MAKERNOTE))
+        image.save(buf, 'JPEG', quality=90, exif=exif)
+        data = buf.getvalue()
+        resource = b'8BIM' + struct.pack('>HHI', 0x0404, 0, len(iptc)) + iptc
+        if len(iptc) & 1:
+            resource += b'\x00'
+        extra = (_jpeg_segment(0xE1, XMP_HEADER + xmp)
+                 + _jpeg_segment(0xED, PHOTOSHOP_HEADER + resource))
+        data = data[:2] + extra + data[2:]
+    elif ext == '.png':
+        info = PngImagePlugin.PngInfo()
+        info.add_itxt("XML:com.adobe.xmp", xmp.decode('utf-8'))
+        info.add_text("Raw profile type iptc", f"\niptc\n{len(iptc):8d}\n{iptc.hex()}\n")
+        image.save(buf, 'PNG', pnginfo=info, exif=make_exif(rng, makernote_size))
+        data = buf.getvalue()
+    elif ext == '.webp':
+        image.save(buf, 'WEBP', quality=90, exif=make_exif(rng, makernote_size), xmp=xmp)
+        data = buf.getvalue()
+    elif ext == '.tif':
+        info = TiffImagePlugin.ImageFileDirectory_v2()
+        info[271] = "BenchCam"
+        info[272] = "Model 7"
+        info[305] = "Firmware 1.2.3"
+        info[700] = xmp
+        info[33723] = iptc
+        info[34665] = {36867: "2025:08:01 12:00:00", 37500: rng.randbytes(makernote_size)}
+        info[34853] = {1: "N", 2: (52.0, 22.0, 1.5)}
+        image.save(buf, 'TIFF', tiffinfo=info)
+        data = buf.getvalue()
+    else:
+        # BMP has nowhere to put metadata; it exercises the decode path
+        image.save(buf, 'BMP')
+        data = buf.getvalue()
+
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def generate_corpus(folder, files_per_format=10, size=(1024, 768),
+                    makernote_size=32 * 1024, xmp_size=4 * 1024, seed=1234):
+    """Write a deterministic corpus into folder and return the file paths.
+
+    The same arguments always produce byte-identical files.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    files = []
+    for index in range(files_per_format):
+        for ext in CORPUS_FORMATS:
+            path = os.path.join(folder, f"sample_{index:04d}{ext}")
+            save_sample(path, ext, rng, size, makernote_size, xmp_size)
+            files.append(path)
+    return files
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def peak_rss():
+    """Peak RSS in bytes of this process or its largest child, or None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    scale = 1 if sys.platform == 'darwin' else 1024
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    try:
+        # ru_maxrss survives exec on Linux, so prefer the kernel's own figure
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale)
+
+
+def run_case(case, files, jobs, work_dir):
+    """Time one case over files in this process and return its results"""
+    settings = dict(DEFAULT_SETTINGS, create_backup=False, output_dir=work_dir)
+    if case == 'advanced':
+        settings.update(advanced_mode=True, custom_metadata=dict(ADVANCED_FIELDS))
+
+    total_bytes = sum(os.path.getsize(path) for path in files)
+    failed = 0
+    start = time.perf_counter()
+    if case == 'extract':
+        for path in files:
+            extract_metadata(path)
+    else:
+        for _, result in BatchEngine(settings, jobs=jobs).run(files):
+            if not result['success']:
+                failed += 1
+    seconds = max(time.perf_counter() - start, 1e-9)
+
+    return {
+        'files': len(files),
+        'failed': failed,
+        'seconds': seconds,
+        'files_per_sec': len(files) / seconds,
+        'mb_per_sec': total_bytes / seconds / (1024 * 1024),
+        'peak_rss': peak_rss(),
+    }
+
+
+def run_case_isolated(case, corpus_dir, jobs):
+    """Run a case in a fresh interpreter so peak RSS is not shared"""
+    with tempfile.TemporaryDirectory(prefix=f"bench_{case}_") as work_dir:
+        command = [sys.executable, os.path.abspath(__file__), '--run-case', case,
+                   '--corpus', corpus_dir, '--jobs', str(jobs), '--work-dir', work_dir]
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """List regressions of results against baseline, both keyed by case"""
+    regressions = []
+    for case, current in results.items():
+        reference = baseline.get(case)
+        if not reference:
+            continue
+        for metric in ('files_per_sec', 'mb_per_sec'):
+            floor = reference[metric] * (1 - tolerance)
+            if current[metric] < floor:
+                regressions.append(f"{case}: {metric} {current[metric]:.2f} < {floor:.2f}")
+        if current.get('peak_rss') and reference.get('peak_rss'):
+            ceiling = reference['peak_rss'] * (1 + tolerance)
+            if current['peak_rss'] > ceiling:
+                regressions.append(f"{case}: peak_rss {current['peak_rss'] / 2**20:.1f} MiB "
+                                   f"> {ceiling / 2**20:.1f} MiB")
+    return regressions
+
+
+def format_results(results):
+    """Results as an aligned text table"""
+    lines = [f"{'case':<10}{'files':>7}{'files/s':>10}{'MB/s':>9}{'peak RSS':>12}"]
+    for case, result in results.items():
+        rss = f"{result['peak_rss'] / 2**20:.1f} MiB" if result.get('peak_rss') else "n/a"
+        lines.append(f"{case:<10}{result['files']:>7}{result['files_per_sec']:>10.1f}"
+                     f"{result['mb_per_sec']:>9.2f}{rss:>12}")
+    return "\n".join(lines)
+
+
+def build_parser():
+    """Create the argument parser"""
+    parser = argparse.ArgumentParser(description="Benchmark MetadataManager on a synthetic corpus.")
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--files-per-format', type=int, default=10)
+    parser.add_argument('--width', type=int, default=1024)
+    parser.add_argument('--height', type=int, default=768)
+    parser.add_argument('--makernote-kb', type=int, default=32,
+                        help="MakerNote size (capped at 60 KiB in JPEGs)")
+    parser.add_argument('--xmp-kb', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('-j', '--jobs', type=int, default=default_worker_count())
+    parser.add_argument('--corpus', help="corpus folder (generated into a temp folder if omitted)")
+    parser.add_argument('--baseline', help="fail if results regress past this baseline JSON")
+    parser.add_argument('--save-baseline', metavar='PATH', help="write the results as a baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--run-case', choices=CASES, help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    return parser
+
+
+def corpus_files(folder):
+    """Sorted corpus images in folder"""
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if os.path.splitext(name)[1] in CORPUS_FORMATS)
+
+
+def main(argv=None):
+    """Run the benchmark; returns the process exit code"""
+    args = build_parser().parse_args(argv)
+
+    if args.run_case:
+        result = run_case(args.run_case, corpus_files(args.corpus), args.jobs, args.work_dir)
+        print(json.dumps(result))
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix="bench_corpus_") as temp_dir:
+        corpus_dir = args.corpus or temp_dir
+        if not args.corpus or not os.path.isdir(corpus_dir) or not corpus_files(corpus_dir):
+            generate_corpus(corpus_dir, args.files_per_format, (args.width, args.height),
+                            args.makernote_kb * 1024, args.xmp_kb * 1024, args.seed)
+
+        results = {case: run_case_isolated(case, corpus_dir, args.jobs) for case in args.cases}
+
+    print(format_results(results))
+    failures = [f"{case}: {result['failed']} of {result['files']} files failed"
+                for case, result in results.items() if result['failed']]
+    for failure in failures:
+        print(f"ERROR {failure}")
+    if failures:
+        return 1
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Virtualized file list widget for MetadataManager
+
+A canvas-backed replacement for tk.Listbox that only draws the rows in
+view. The widget keeps a reference to the caller's list of paths instead
+of copying it, so adding files costs nothing until they scroll into view,
+and memory stays proportional to the visible rows. Each row can show a
+processing status reported by the batch engine and, given a
+ThumbnailLoader, a thumbnail that is made in the background once the row
+is in view and drawn when it is ready.
+"""
+
+import base64
+import os
+import tkinter as tk
+from collections import OrderedDict
+from tkinter import font as tkfont
+from tkinter import ttk
+
+
+# Status glyphs drawn in front of a row's file name
+STATUS_GLYPHS = {
+    'done': '✅',
+    'clean': '✨',
+    'unchanged': '⏭️',
+    'resumed': '⏭️',
+    'failed': '❌',
+}
+
+# Thumbnail images kept in memory; older ones are made again from the disk cache
+THUMBNAIL_IMAGES = 1024
+
+# Milliseconds between collecting finished thumbnails
+THUMBNAIL_POLL_MS = 100
+
+
+class VirtualFileList(tk.Frame):
+    """Scrollable, multi-select file list that materializes only visible rows"""
+
+    def __init__(self, parent, files, colors, on_activate=None, on_select=None,
+                 font=('Segoe UI', 9), thumbnails=None, thumbnail_size=32):
+        super().__init__(parent, bg=colors['white'])
+        self.files = files
+        self.colors = colors
+        self.on_activate = on_activate
+        self.on_select = on_select
+
+        self.selection = set()
+        self.statuses = {}
+        self.top = 0
+        self.rows = []
+        self.thumbnail_items = []
+
+        # Thumbnail PhotoImages by path, None for files without one
+        self.thumbnails = thumbnails
+        self.images = OrderedDict()
+
+        self.font = tkfont.Font(root=self, font=font)
+        self.row_height = self.font.metrics('linespace') + 4
+        self.thumbnail_width = 0
+        if thumbnails is not None:
+            self.row_height = max(self.row_height, thumbnail_size + 4)
+            self.thumbnail_width = thumbnail_size + 8
+        self.glyph_width = self.font.measure('⏭️') + 8
+        self.text_top = (self.row_height - self.font.metrics('linespace')) // 2
+
+        self.canvas = tk.Canvas(self, bg=colors['white'],
+                                borderwidth=1, relief='solid',
+                                highlightthickness=0)
+        self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        # A private bind tag in front keeps the wheel from also scrolling the page
+        tag = f"VirtualFileList{id(self)}"
+        self.canvas.bindtags((tag,) + self.canvas.bindtags())
+        self.canvas.bind_class(tag, '<MouseWheel>', self._on_mousewheel)
+        self.canvas.bind_class(tag, '<Button-4>', lambda e: self._scroll_units(-3))
+        self.canvas.bind_class(tag, '<Button-5>', lambda e: self._scroll_units(3))
+        self.canvas.bind('<Configure>', lambda e: self.refresh())
+        self.canvas.bind('<Button-1>', self._on_click)
+        self.canvas.bind('<Double-Button-1>', self._on_double_click)
+
+        if thumbnails is not None:
+            self.bind('<Destroy>', self._on_destroy)
+            self.poll_id = self.after(THUMBNAIL_POLL_MS, self._poll_thumbnails)
+
+    def visible_rows(self):
+        """Number of rows that fit in the canvas, counting a partial last row"""
+        height = max(self.canvas.winfo_height(), self.row_height)
+        return height // self.row_height + 1
+
+    def refresh(self):
+        """Redraw the visible rows after the file list or the size changed"""
+        total = len(self.files)
+        visible = self.visible_rows()
+        self.top = max(0, min(self.top, total - visible + 1))
+        self._ensure_rows(visible)
+
+        missing = []
+        for slot, (background, glyph, name) in enumerate(self.rows):
+            index = self.top + slot
+            if index >= total:
+                for item in (background, glyph, name):
+                    self.canvas.itemconfigure(item, state='hidden')
+                if self.thumbnails is not None:
+                    self.canvas.itemconfigure(self.thumbnail_items[slot], state='hidden')
+                continue
+
+            selected = index in self.selection
+            self.canvas.itemconfigure(background, state='normal',
+                                      fill=self.colors['secondary'] if selected else self.colors['white'])
+            self.canvas.itemconfigure(glyph, state='normal',
+                                      text=STATUS_GLYPHS.get(self.statuses.get(index), ''))
+            self.canvas.itemconfigure(name, state='normal',
+                                      text=os.path.basename(self.files[index]),
+                                      fill='white' if selected else self.colors['dark'])
+            if self.thumbnails is not None:
+                path = self.files[index]
+                if path in self.images:
+                    self.images.move_to_end(path)
+                else:
+                    missing.append(path)
+                self.canvas.itemconfigure(self.thumbnail_items[slot], state='normal',
+                                          image=self.images.get(path) or '')
+
+        if self.thumbnails is not None:
+            # Also replaces requests for rows that scrolled out of view
+            self.thumbnails.request(missing)
+
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + visible - 1) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def _ensure_rows(self, count):
+        """Grow the pool of canvas items to cover count rows"""
+        width = 10000
+        while len(self.rows) < count:
+            y = len(self.rows) * self.row_height
+            background = self.canvas.create_rectangle(0, y, width, y + self.row_height, width=0)
+            glyph = self.canvas.create_text(self.thumbnail_width + 4, y + self.text_top,
+                                            anchor='nw', font=self.font)
+            name = self.canvas.create_text(self.thumbnail_width + self.glyph_width,
+                                           y + self.text_top, anchor='nw', font=self.font)
+            self.rows.append((background, glyph, name))
+            if self.thumbnails is not None:
+                self.thumbnail_items.append(self.canvas.create_image(4, y + 2, anchor='nw'))
+
+    def yview(self, *args):
+        """Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        total = len(self.files)
+        if not args or not total:
+            return
+        if args[0] == 'moveto':
+            self.top = int(float(args[1]) * total)
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= max(1, self.visible_rows() - 2)
+            self.top += step
+        self.refresh()
+
+    def _scroll_units(self, step):
+        self.yview('scroll', step, 'units')
+        return 'break'
+
+    def _on_mousewheel(self, event):
+        return self._scroll_units(int(-3 * (event.delta / 120)) or (-1 if event.delta > 0 else 1))
+
+    def index_at(self, y):
+        """Row index under a canvas y coordinate, or None below the last row"""
+        index = self.top + int(y) // self.row_height
+        return index if index < len(self.files) else None
+
+    def _on_click(self, event):
+        """Toggle the clicked row, like a MULTIPLE-mode Listbox"""
+        index = self.index_at(event.y)
+        if index is None:
+            return
+        if index in self.selection:
+            self.selection.discard(index)
+        else:
+            self.selection.add(index)
+        self.refresh()
+        if self.on_select:
+            self.on_select(index)
+
+    def _on_double_click(self, event):
+        index = self.index_at(event.y)
+        if index is None:
+            return
+        self.selection.add(index)
+        self.refresh()
+        if self.on_activate:
+            self.on_activate(index)
+
+    def curselection(self):
+        """Selected row indices in ascending order, like Listbox.curselection"""
+        return tuple(sorted(self.selection))
+
+    def clear(self):
+        """Forget selection, statuses and thumbnails after the file list was emptied"""
+        self.selection.clear()
+        self.statuses.clear()
+        self.images.clear()
+        self.top = 0
+        self.refresh()
+
+    def reload_thumbnails(self):
+        """Drop the thumbnails in memory so the rows in view ask for them again"""
+        self.images.clear()
+        self.refresh()
+
+    def set_statuses(self, updates):
+        """Apply (index, status) pairs and redraw once; None clears a status"""
+        for index, status in updates:
+            if status is None:
+                self.statuses.pop(index, None)
+            else:
+                self.statuses[index] = status
+        self.refresh()
+
+    def clear_statuses(self):
+        """Remove all row statuses before a new batch"""
+        self.statuses.clear()
+        self.refresh()
+
+    def _poll_thumbnails(self):
+        """Turn finished thumbnails into images and redraw if any arrived"""
+        finished = self.thumbnails.results()
+        for path, data in finished:
+            image = None
+            if data:
+                try:
+                    image = tk.PhotoImage(master=self, data=base64.b64encode(data))
+                except tk.TclError:
+                    pass
+            self.images[path] = image
+            self.images.move_to_end(path)
+        while len(self.images) > THUMBNAIL_IMAGES:
+            self.images.popitem(last=False)
+        if finished:
+            self.refresh()
+        self.poll_id = self.after(THUMBNAIL_POLL_MS, self._poll_thumbnails)
+
+    def _on_destroy(self, event):
+        if event.widget is self:
+            self.after_cancel(self.poll_id)
+            self.thumbnails.close()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Progress log buffering for MetadataManager
+
+Log lines from any thread are collected in a LogSink and picked up by the
+GUI at a fixed frame rate, so a large batch costs one widget update per
+frame instead of one Tk callback per line. The full log can also be
+written to a rotating file, independent of what is kept on screen.
+
+This module must not import tkinter so it can be used from headless tools.
+"""
+
+import logging
+import logging.handlers
+import os
+from collections import deque
+
+
+# Lines kept in the on-screen progress log
+DEFAULT_MAX_LINES = 5000
+
+# Rotating log file size and number of old files kept
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+
+
+def default_log_path():
+    """Per-user location of the rotating progress log"""
+    return os.path.join(os.path.expanduser("~"), ".metadatamanager", "logs", "metadatamanager.log")
+
+
+class LogSink:
+    """Thread-safe buffer of log lines waiting to be shown.
+
+    write() may be called from any thread. drain() returns the pending
+    lines, keeping at most max_lines of them since older ones would be
+    trimmed from the screen straight away.
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES):
+        self.max_lines = max_lines
+        self.pending = deque(maxlen=max_lines)
+        self.file_logger = None
+        self.file_handler = None
+
+    def write(self, line):
+        """Queue a line for the screen and append it to the log file, if any"""
+        self.pending.append(line)
+        logger = self.file_logger
+        if logger is not None:
+            logger.info(line)
+
+    def drain(self):
+        """Take all pending lines, oldest first"""
+        lines = []
+        try:
+            while True:
+                lines.append(self.pending.popleft())
+        except IndexError:
+            pass
+        return lines
+
+    def set_log_file(self, path):
+        """Start writing the full log to a rotating file; None stops it"""
+        self.close_log_file()
+        if not path:
+            return
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+
+        logger = logging.getLogger(f"metadatamanager.progress.{id(self)}")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.file_handler = handler
+        self.file_logger = logger
+
+    def close_log_file(self):
+        """Flush and close the log file, if one is open"""
+        if self.file_logger is None:
+            return
+        self.file_logger.removeHandler(self.file_handler)
+        self.file_handler.close()
+        self.file_logger = None
+        self.file_handler = None
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Bulk metadata audit for MetadataManager
+
+Reports which files of a photo library carry GPS positions, camera or
+lens serial numbers, embedded thumbnails, XMP, IPTC or comments, without
+changing any file. Only the metadata segments of each file are read (see
+metadata_formats.read_metadata). Files go to a pool of worker processes
+in chunks, so the per-file overhead stays small, and findings are
+streamed to CSV or JSON Lines in input order as they arrive. An
+AuditSummary counts how many files carry each finding and each tag.
+
+This module must not import tkinter so it can be used from worker
+processes and the CLI.
+"""
+
+import csv
+import json
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL.ExifTags import GPSTAGS, TAGS
+
+from metadata_engine import default_worker_count, ignore_interrupts
+from metadata_formats import (METADATA_READERS, TIFF_IMAGE_TAGS, TIFF_IPTC, TIFF_PHOTOSHOP,
+                              TIFF_SUB_IFD_NAMES, TIFF_THUMBNAIL_LENGTH, TIFF_THUMBNAIL_OFFSET,
+                              TIFF_XMP, iptc_dataset_name, iter_exif_entries, iter_iptc_records,
+                              read_metadata, read_tiff_value, xmp_property_names)
+
+
+# EXIF tags holding serial numbers of the camera body or lens
+SERIAL_TAGS = {0xA431, 0xA435, 0xC62F}
+
+# XMP properties holding serial numbers or GPS positions
+XMP_SERIAL_PROPERTIES = {'aux:SerialNumber', 'aux:LensSerialNumber',
+                         'exifEX:BodySerialNumber', 'exifEX:LensSerialNumber'}
+XMP_GPS_PROPERTIES = {'exif:GPSLatitude', 'exif:GPSLongitude'}
+
+# IFD entries that only point at other blocks, reported by those blocks
+POINTER_TAGS = set(TIFF_SUB_IFD_NAMES) | {TIFF_XMP, TIFF_IPTC, TIFF_PHOTOSHOP}
+
+# GPSLatitude and GPSLongitude in the GPS IFD
+GPS_POSITION_TAGS = {2, 4}
+
+# Make and Model in IFD0
+MAKE_TAG = 271
+MODEL_TAG = 272
+
+# Yes/no findings, in the order they are reported
+AUDIT_FLAGS = ('exif', 'gps', 'serial', 'thumbnail', 'xmp', 'iptc', 'comment')
+
+# Columns of the CSV output
+AUDIT_FIELDS = ('path', 'format', 'size') + AUDIT_FLAGS + ('make', 'model', 'tags', 'error')
+
+# Files handed to a worker at once; header reads are cheap, so batching
+# them keeps the inter-process traffic from dominating
+AUDIT_CHUNK_SIZE = 64
+
+
+def audit_format_for(path):
+    """Output format for a findings path: 'csv' for .csv files, else 'jsonl'"""
+    return 'csv' if path and path.lower().endswith('.csv') else 'jsonl'
+
+
+def _ascii(data):
+    return data.split(b'\x00', 1)[0].decode('utf-8', 'replace').strip()
+
+
+def _audit_exif(tiff, finding, tags, is_tiff):
+    """Record the EXIF tags of a TiffStructure in finding and tags"""
+    for ifd, entry in iter_exif_entries(tiff):
+        tag = entry[0]
+        if tag in POINTER_TAGS:
+            continue
+        if ifd == 'GPS':
+            finding['gps'] = finding['gps'] or tag in GPS_POSITION_TAGS
+            tags[f"EXIF:{GPSTAGS.get(tag, f'GPS0x{tag:04X}')}"] = None
+            continue
+        if tag in (TIFF_THUMBNAIL_OFFSET, TIFF_THUMBNAIL_LENGTH) and ifd != 'IFD0':
+            finding['thumbnail'] = True
+            continue
+        if is_tiff and ifd.startswith('IFD') and tag in TIFF_IMAGE_TAGS:
+            # The image structure of a TIFF file is not metadata
+            continue
+        if tag in SERIAL_TAGS:
+            finding['serial'] = True
+        if ifd == 'IFD0' and tag in (MAKE_TAG, MODEL_TAG):
+            finding['make' if tag == MAKE_TAG else 'model'] = _ascii(read_tiff_value(tiff, entry))
+        tags[f"EXIF:{TAGS.get(tag, f'0x{tag:04X}')}"] = None
+
+
+def audit_file(path):
+    """Header-only audit of one file; returns a picklable finding dict.
+
+    The finding has the AUDIT_FIELDS keys. 'tags' is a list of the tags
+    found, such as 'EXIF:Model', 'XMP:aux:SerialNumber' or
+    'IPTC:Keywords'. Errors are reported in 'error', with whatever was
+    found before them kept.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    finding = dict.fromkeys(AUDIT_FLAGS, False)
+    finding.update({'path': path, 'format': ext.lstrip('.'), 'size': None,
+                    'make': '', 'model': '', 'tags': [], 'error': None})
+    tags = {}
+    try:
+        with open(path, 'rb') as src:
+            finding['size'] = os.fstat(src.fileno()).st_size
+            if ext not in METADATA_READERS:
+                # Formats without a reader (BMP) carry no metadata
+                return finding
+            blocks = read_metadata(ext, src)
+            for kind in blocks.kinds:
+                finding[kind] = True
+
+            if blocks.exif is not None:
+                _audit_exif(blocks.exif, finding, tags, ext in ('.tif', '.tiff'))
+            if blocks.xmp:
+                for name in xmp_property_names(blocks.xmp):
+                    finding['serial'] = finding['serial'] or name in XMP_SERIAL_PROPERTIES
+                    finding['gps'] = finding['gps'] or name in XMP_GPS_PROPERTIES
+                    tags[f"XMP:{name}"] = None
+            if blocks.iptc:
+                for record, dataset, _ in iter_iptc_records(blocks.iptc):
+                    if dataset:
+                        tags[f"IPTC:{iptc_dataset_name(record, dataset)}"] = None
+    except Exception as e:
+        finding['error'] = str(e) or type(e).__name__
+    finding['tags'] = list(tags)
+    return finding
+
+
+def audit_chunk(paths):
+    """Worker entry point: audit a list of files"""
+    return [audit_file(path) for path in paths]
+
+
+def _chunked(paths, size):
+    chunk = []
+    for path in paths:
+        chunk.append(path)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def audit_files(paths, jobs=None, chunk_size=AUDIT_CHUNK_SIZE):
+    """Yield a finding for each path, in input order.
+
+    paths may be a lazy iterable such as scan_images(), which is consumed
+    as the audit goes, so an iterable that stops early also stops the
+    audit. At most jobs * 4 chunks are in flight.
+    """
+    jobs = max(1, jobs or default_worker_count())
+    chunks = _chunked(paths, chunk_size)
+    if jobs == 1:
+        for chunk in chunks:
+            yield from audit_chunk(chunk)
+        return
+
+    window = jobs * 4
+    with ProcessPoolExecutor(max_workers=jobs, initializer=ignore_interrupts) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(audit_chunk, chunk))
+            if len(pending) >= window:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class AuditSummary:
+    """Number of audited files carrying each finding and each tag"""
+
+    def __init__(self):
+        self.files = 0
+        self.errors = 0
+        self.flags = Counter()
+        self.tags = Counter()
+
+    def add(self, finding):
+        """Count one finding from audit_file"""
+        self.files += 1
+        if finding['error']:
+            self.errors += 1
+        self.flags.update(flag for flag in AUDIT_FLAGS if finding[flag])
+        self.tags.update(finding['tags'])
+
+    def to_dict(self):
+        """Picklable, JSON-ready summary; tags are ordered by frequency"""
+        return {'files': self.files, 'errors': self.errors,
+                'flags': {flag: self.flags[flag] for flag in AUDIT_FLAGS},
+                'tags': dict(self.tags.most_common())}
+
+    def format_table(self, top=25):
+        """Findings and the most frequent tags as aligned text"""
+        lines = [f"Audited {self.files} files ({self.errors} unreadable)"]
+        for flag in AUDIT_FLAGS:
+            lines.append(f"  {flag:<12}{self.flags[flag]:>10}")
+        if self.tags:
+            lines.append(f"Most frequent tags ({len(self.tags)} distinct):")
+            width = max(len(tag) for tag, _ in self.tags.most_common(top))
+            for tag, count in self.tags.most_common(top):
+                lines.append(f"  {tag:<{width}}  {count:>10}")
+        return "\n".join(lines)
+
+
+def write_findings(findings, out, fmt='jsonl', summary=None):
+    """Stream findings to the text file out as 'csv' or 'jsonl'.
+
+    CSV files get a header row and the tags joined with ';'. Returns
+    the AuditSummary of the findings written.
+    """
+    summary = summary or AuditSummary()
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, AUDIT_FIELDS)
+        writer.writeheader()
+        for finding in findings:
+            summary.add(finding)
+            writer.writerow(dict(finding, tags=';'.join(finding['tags'])))
+    else:
+        for finding in findings:
+            summary.add(finding)
+            out.write(json.dumps(finding) + "\n")
+    return summary
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Backups of original files for MetadataManager
+
+A backup is made of each original before a processed copy is written.
+Copying every original doubles the I/O of a batch even though, when not
+overwriting, the original is never modified. Backups therefore share the
+original's data where they can. The backup mode is one of:
+
+- 'link': a reflink (copy-on-write clone) where the filesystem supports
+  one, otherwise a hard link, otherwise a full copy
+- 'copy': an independent copy; a reflink clone is one, so it is still
+  used where supported
+- 'store': the original goes into a content-addressed store, so identical
+  originals are kept only once, and <file>.backup is hard-linked to the
+  stored object when the store is on the same filesystem
+
+This module must not import tkinter so it can be used from worker
+processes and headless tools.
+"""
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from metadata_manifest import file_digest
+
+
+BACKUP_MODES = ('link', 'copy', 'store')
+
+# Linux ioctl that clones one file's extents into another (btrfs, XFS, ...)
+FICLONE = 0x40049409
+
+
+def default_backup_store():
+    """Per-user folder of the content-addressed backup store"""
+    return os.path.join(os.path.expanduser("~"), ".metadatamanager", "backups")
+
+
+def reflink(src, dst):
+    """Clone src to a new file dst that shares its data blocks.
+
+    Raises OSError if the platform or filesystem cannot clone files; dst
+    is not left behind in that case.
+    """
+    if fcntl is None or not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, "Reflinks are not supported on this platform")
+    with open(src, 'rb') as source, open(dst, 'xb') as target:
+        try:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        except OSError:
+            target.close()
+            os.remove(dst)
+            raise
+    shutil.copystat(src, dst)
+
+
+def clone_or_copy(src, dst, data=None):
+    """Copy src to dst as a reflink if possible; returns 'reflink' or 'copy'.
+
+    data, if given, is src's contents, written instead of reading src again.
+    """
+    try:
+        reflink(src, dst)
+        return 'reflink'
+    except OSError:
+        pass
+    if data is None:
+        shutil.copy2(src, dst)
+    else:
+        with open(dst, 'wb') as f:
+            f.write(data)
+        shutil.copystat(src, dst)
+    return 'copy'
+
+
+def link_or_copy(src, dst, data=None):
+    """Back up src to dst sharing its data; returns 'reflink', 'link' or 'copy'"""
+    try:
+        reflink(src, dst)
+        return 'reflink'
+    except OSError:
+        pass
+    try:
+        os.link(src, dst)
+        return 'link'
+    except OSError:
+        pass
+    return clone_or_copy(src, dst, data)
+
+
+class BackupStore:
+    """Content-addressed store of original files, deduplicated by SHA-256.
+
+    Objects live under objects/<first two hex digits>/<digest> and are
+    never modified once written. index.jsonl records which path was stored
+    under which digest, one JSON line per backup, so the latest backup of
+    a path can be found and restored.
+    """
+
+    def __init__(self, root=None):
+        self.root = root or default_backup_store()
+        self.index_path = os.path.join(self.root, "index.jsonl")
+
+    def object_path(self, digest):
+        """Where the object with the given SHA-256 hex digest is stored"""
+        return os.path.join(self.root, "objects", digest[:2], digest)
+
+    def put(self, path, data=None):
+        """Store path's contents; returns (digest, stored).
+
+        stored is False when an identical original was already in the
+        store. data, if given, is the file's contents, used instead of
+        reading path again.
+        """
+        digest = hashlib.sha256(data).hexdigest() if data is not None else file_digest(path)
+        target = self.object_path(digest)
+        stored = False
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            # Objects are immutable, so they are cloned or copied, never hard-linked
+            temp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                clone_or_copy(path, temp, data)
+                os.replace(temp, target)
+            finally:
+                if os.path.exists(temp):
+                    os.remove(temp)
+            stored = True
+        self._record(path, digest)
+        return digest, stored
+
+    def _record(self, path, digest):
+        """Append one line to the index; single small appends do not interleave"""
+        line = json.dumps({'path': os.path.abspath(path), 'digest': digest, 'time': time.time()})
+        fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, (line + "\n").encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def lookup(self, path):
+        """Digest of the latest backup of path, or None"""
+        path = os.path.abspath(path)
+        digest = None
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get('path') == path:
+                        digest = entry.get('digest')
+        except FileNotFoundError:
+            pass
+        return digest
+
+    def restore(self, path, dest=None):
+        """Copy the latest backup of path to dest (default: path); returns dest"""
+        digest = self.lookup(path)
+        if digest is None:
+            raise FileNotFoundError(f"No backup of {path} in {self.root}")
+        dest = dest or path
+        shutil.copy2(self.object_path(digest), dest)
+        return dest
+
+
+def make_backup(file_path, backup_path, mode='link', data=None, store_root=None):
+    """Back up file_path according to a BACKUP_MODES mode.
+
+    data, if given, is the file's contents, used instead of reading it
+    again. Returns how the backup was made: 'reflink', 'link', 'copy',
+    'stored' or 'deduplicated'.
+    """
+    if mode == 'copy':
+        return clone_or_copy(file_path, backup_path, data)
+    if mode == 'link':
+        return link_or_copy(file_path, backup_path, data)
+    if mode == 'store':
+        store = BackupStore(store_root)
+        digest, stored = store.put(file_path, data)
+        try:
+            os.link(store.object_path(digest), backup_path)
+        except OSError:
+            pass
+        return 'stored' if stored else 'deduplicated'
+    raise ValueError(f"Unknown backup mode: {mode!r}")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Pause, cancel and resume for MetadataManager batches
+
+BatchControl lets the thread that started a batch pause, resume or
+cancel it. The engine stops starting new files while paused or
+cancelled, but files already in flight are finished, committed and
+reported, so nothing is left half written.
+
+BatchCheckpoint records how far a batch got. Results are reported in
+submission order, so the number of files reported so far is all it
+needs: a batch restarted with the same file list and settings skips
+that many files and carries on from there. The checkpoint is a small
+JSON file, replaced atomically at most once a second while the batch
+runs and removed once the batch completes.
+
+This module must not import tkinter so it can be used from the CLI.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from metadata_commit import new_temp_path
+from metadata_manifest import settings_fingerprint
+
+
+# Minimum seconds between checkpoint writes while a batch runs
+CHECKPOINT_INTERVAL = 1.0
+
+
+def default_checkpoint_path():
+    """Per-user checkpoint location used by the GUI"""
+    return os.path.join(os.path.expanduser("~"), ".metadatamanager", "checkpoint.json")
+
+
+def batch_key(files, settings):
+    """Stable hash identifying a batch by its file list and settings"""
+    digest = hashlib.sha256(settings_fingerprint(settings).encode('utf-8'))
+    for path in files:
+        digest.update(os.path.abspath(path).encode('utf-8', 'surrogateescape') + b'\0')
+    return digest.hexdigest()
+
+
+class BatchControl:
+    """Pause and cancel switches shared between a batch and its caller.
+
+    Safe to use from any thread. Cancelling also releases a paused batch
+    so it can wind down.
+    """
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def stopping(self):
+        """True when no new file should be started"""
+        return self.paused or self.cancelled
+
+    def wait(self):
+        """Block while paused; returns False once the batch is cancelled"""
+        self._running.wait()
+        return not self.cancelled
+
+
+class BatchCheckpoint:
+    """How many files of a batch, in submission order, are done.
+
+    completed is loaded from path when the stored batch key matches the
+    given files and settings, and is 0 otherwise.
+    """
+
+    def __init__(self, path, files, settings):
+        self.path = path
+        self.key = batch_key(files, settings)
+        self.total = len(files)
+        self.completed = self._load()
+        self.saved = self.completed
+        self.saved_at = time.monotonic()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('key') != self.key:
+                return 0
+            return max(0, min(int(data.get('completed', 0)), self.total))
+        except (OSError, ValueError, TypeError, AttributeError):
+            return 0
+
+    def advance(self, completed):
+        """Note that the first completed files are done; saved now and then"""
+        self.completed = completed
+        if time.monotonic() - self.saved_at >= CHECKPOINT_INTERVAL:
+            self.save()
+
+    def save(self):
+        """Write the checkpoint if it moved since the last write"""
+        if self.completed == self.saved:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = new_temp_path(self.path)
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'key': self.key, 'completed': self.completed, 'total': self.total,
+                           'time': time.time()}, f)
+            os.replace(temp_path, self.path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        self.saved = self.completed
+        self.saved_at = time.monotonic()
+
+    def finish(self):
+        """Remove the checkpoint once the batch is complete, else save it"""
+        if self.completed < self.total:
+            self.save()
+            return
+        if not self.saved:
+            # Never written by this batch; leave other batches' checkpoints alone
+            return
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Command-line interface for MetadataManager
+
+Runs the batch engine without a GUI and prints one JSON object per file,
+one per line, in the order the files were found:
+
+    python -m metadataremover photos/ "shares/**/*.jpg" --jobs 8 --output-dir clean/
+
+This module is imported before tkinter when metadataremover is started
+with arguments, so it must not import tkinter itself.
+"""
+
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+
+from metadata_audit import audit_files, audit_format_for, write_findings
+from metadata_backup import BACKUP_MODES
+from metadata_checkpoint import default_checkpoint_path
+from metadata_commit import DURABILITY_MODES
+from metadata_engine import (DEFAULT_SETTINGS, BatchEngine, default_worker_count, is_supported,
+                             scan_images)
+from metadata_manifest import default_manifest_path
+from metadata_metrics import BatchMetrics
+from metadata_pipeline import PipelineEngine
+
+
+def expand_paths(patterns):
+    """Expand files, directories and glob patterns into supported image paths.
+
+    Directories are searched recursively. Glob patterns support ** for
+    recursive matching. Each file is listed once, in discovery order.
+    """
+    seen = set()
+    for pattern in patterns:
+        if glob.has_magic(pattern):
+            candidates = sorted(glob.glob(pattern, recursive=True))
+        else:
+            candidates = [pattern]
+
+        for candidate in candidates:
+            if os.path.isdir(candidate):
+                for path in scan_images(candidate):
+                    if path not in seen:
+                        seen.add(path)
+                        yield path
+            elif os.path.isfile(candidate) and is_supported(candidate) and candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+
+def parse_field(text):
+    """Parse a FIELD=VALUE argument for advanced mode"""
+    field, sep, value = text.partition('=')
+    if not sep or not field:
+        raise argparse.ArgumentTypeError(f"expected FIELD=VALUE, got {text!r}")
+    return field.strip(), value.strip()
+
+
+def build_parser():
+    """Create the argument parser"""
+    parser = argparse.ArgumentParser(
+        prog="metadataremover",
+        description="Remove or edit image metadata without the GUI. "
+                    "Prints one JSON line per processed file.")
+    parser.add_argument('paths', nargs='+',
+                        help="image files, directories or glob patterns (use ** to recurse)")
+    parser.add_argument('--mode', choices=('basic', 'advanced'), default='basic',
+                        help="basic removes metadata, advanced applies --set fields (default: basic)")
+    parser.add_argument('-j', '--jobs', type=int, default=default_worker_count(),
+                        help="number of worker processes (default: one per CPU core)")
+    parser.add_argument('-o', '--output-dir',
+                        help="folder for processed files (default: next to each source)")
+    parser.add_argument('--overwrite', action='store_true',
+                        help="replace the original files instead of writing copies")
+    parser.add_argument('--no-backup', action='store_true',
+                        help="do not create .backup copies of the originals")
+    parser.add_argument('--backup-mode', choices=BACKUP_MODES, default='link',
+                        help="link: reflink or hard link when possible, copy: full copy, "
+                             "store: deduplicated backup store (default: link)")
+    parser.add_argument('--durability', choices=DURABILITY_MODES, default='batch',
+                        help="none: no fsync, file: fsync every output, "
+                             "batch: sync outputs in groups at checkpoints (default: batch)")
+    parser.add_argument('--keep-exif', action='store_true', help="keep EXIF data")
+    parser.add_argument('--keep-iptc', action='store_true', help="keep IPTC data")
+    parser.add_argument('--keep-xmp', action='store_true', help="keep XMP data")
+    parser.add_argument('--scrub-exif', action='store_true',
+                        help="keep EXIF but remove GPS location and the embedded thumbnail")
+    parser.add_argument('--scrub-tag', dest='scrub_tags', action='append', default=[],
+                        metavar='TAG', help="EXIF tag name or ID to remove with --scrub-exif")
+    parser.add_argument('--manifest', nargs='?', const=default_manifest_path(), metavar='PATH',
+                        help="skip files unchanged since their last successful run, "
+                             "recorded in this SQLite file (default: the GUI's manifest)")
+    parser.add_argument('--checkpoint', nargs='?', const=default_checkpoint_path(), metavar='PATH',
+                        help="save progress to this file and resume an interrupted run of the "
+                             "same files and settings (default: the GUI's checkpoint)")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="overlap reading, processing and writing (faster on network shares)")
+    parser.add_argument('--audit', nargs='?', const='-', metavar='PATH',
+                        help="only report the metadata each file carries, changing nothing; "
+                             "findings go to PATH (.csv for CSV, otherwise JSON Lines; "
+                             "default: standard output) and a tag summary to standard error")
+    parser.add_argument('--metrics', metavar='PATH',
+                        help="write per-stage timing percentiles for the batch to this JSON file")
+    parser.add_argument('--set', dest='fields', action='append', type=parse_field, default=[],
+                        metavar='FIELD=VALUE', help="metadata field to apply in advanced mode")
+    return parser
+
+
+def settings_from_args(args):
+    """Translate parsed arguments into batch engine settings"""
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({
+        'advanced_mode': args.mode == 'advanced',
+        'remove_exif': not args.keep_exif,
+        'remove_iptc': not args.keep_iptc,
+        'remove_xmp': not args.keep_xmp,
+        'scrub_exif': args.scrub_exif,
+        'scrub_tags': list(args.scrub_tags),
+        'create_backup': not args.no_backup,
+        'backup_mode': args.backup_mode,
+        'overwrite_original': args.overwrite,
+        'durability': args.durability,
+        'output_dir': args.output_dir or DEFAULT_SETTINGS['output_dir'],
+        'custom_metadata': dict(args.fields),
+    })
+    return settings
+
+
+def main(argv=None, out=None):
+    """Run the command-line interface; returns the process exit code"""
+    out = out or sys.stdout
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.audit is not None:
+        return run_audit(args, out)
+    settings = settings_from_args(args)
+
+    if settings['advanced_mode'] and not settings['custom_metadata']:
+        parser.error("advanced mode needs at least one --set FIELD=VALUE")
+    if not settings['advanced_mode'] and not (
+            settings['remove_exif'] or settings['remove_iptc'] or settings['remove_xmp']
+            or settings['scrub_exif']):
+        parser.error("nothing to remove: --keep-exif, --keep-iptc and --keep-xmp are all set")
+    if settings['scrub_tags'] and not settings['scrub_exif']:
+        parser.error("--scrub-tag needs --scrub-exif")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    files = list(expand_paths(args.paths))
+    if not files:
+        print("No supported image files found", file=sys.stderr)
+        return 2
+
+    failed = 0
+    metrics = BatchMetrics()
+    try:
+        engine_class = PipelineEngine if args.pipeline else BatchEngine
+        engine = engine_class(settings, jobs=args.jobs, manifest_path=args.manifest,
+                              checkpoint_path=args.checkpoint)
+    except ValueError as e:
+        parser.error(str(e))
+
+    previous_handler = install_interrupt_handler(engine.control)
+    try:
+        for index, result in engine.run(files):
+            if not result['success']:
+                failed += 1
+            metrics.add(result['metrics'])
+            out.write(json.dumps(dict(result, index=index)) + "\n")
+            out.flush()
+    finally:
+        if previous_handler is not None:
+            signal.signal(signal.SIGINT, previous_handler)
+
+    if args.metrics:
+        metrics.finish()
+        metrics.export(args.metrics)
+
+    if engine.control.cancelled:
+        return 130
+    return 1 if failed else 0
+
+
+def run_audit(args, out):
+    """Audit the given paths without changing them; returns the exit code"""
+    target = out if args.audit == '-' else open(args.audit, 'w', newline='', encoding='utf-8')
+    try:
+        findings = audit_files(expand_paths(args.paths), jobs=args.jobs)
+        summary = write_findings(findings, target, audit_format_for(args.audit))
+    finally:
+        if target is not out:
+            target.close()
+    if not summary.files:
+        print("No supported image files found", file=sys.stderr)
+        return 2
+    print(summary.format_table(), file=sys.stderr)
+    return 0
+
+
+def install_interrupt_handler(control):
+    """Make the first Ctrl+C cancel the batch cleanly; returns the previous handler.
+
+    Files in flight are finished before the run stops. A second Ctrl+C
+    aborts at once. Returns None when called off the main thread, where
+    signal handlers cannot be installed.
+    """
+    def cancel(signum, frame):
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        print("Stopping after the files in progress (Ctrl+C again to abort)...", file=sys.stderr)
+        control.cancel()
+
+    try:
+        return signal.signal(signal.SIGINT, cancel)
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Crash-safe output commits for MetadataManager
+
+Every output is written to a uniquely named temporary file in the target
+directory and moved over the final name with one atomic os.replace, so
+the final path always holds either the old or the new complete file.
+How much is flushed to disk is set by the durability mode:
+
+- 'none': no fsync; fastest, but a crash may lose recent outputs
+- 'file': fsync each temporary file before the replace and its
+  directory after it; durable, at two fsyncs per file
+- 'batch': finished temporary files are collected and committed together
+  at checkpoints: an fsync of each file before its replace, then one
+  fsync per directory. Only the batch's own files are flushed, not every
+  filesystem on the machine as os.sync would.
+  A crash before a checkpoint leaves the originals untouched and only
+  hidden temporary files behind
+
+Temporary files end in .tmp rather than an image extension, so a folder
+scan never mistakes one left by a crash for an image, and the next batch
+removes those left in the folders it writes to.
+
+This module must not import tkinter so it can be used from worker
+processes and headless tools.
+"""
+
+import os
+import re
+import time
+import uuid
+
+
+DURABILITY_MODES = ('none', 'file', 'batch')
+
+# A 'batch' checkpoint is taken after this many files or seconds
+CHECKPOINT_FILES = 256
+CHECKPOINT_SECONDS = 2.0
+
+
+# Names made by new_temp_path
+TEMP_NAME = re.compile(r'\..+\.[0-9a-f]{12}\.tmp')
+
+
+def new_temp_path(output_path):
+    """Unique hidden temporary path next to output_path.
+
+    The name ends in .tmp, so writers that need a format must pass it
+    explicitly instead of relying on the extension.
+    """
+    directory, name = os.path.split(output_path)
+    return os.path.join(directory, f".{name}.{uuid.uuid4().hex[:12]}.tmp")
+
+
+def is_temp_name(name):
+    """True if name is one new_temp_path makes"""
+    return TEMP_NAME.fullmatch(name) is not None
+
+
+def remove_stale_temps(directory):
+    """Remove temporary files an interrupted run left in directory.
+
+    Call it before writing to directory, since temporary files still being
+    written are removed too. Returns the number removed; errors are ignored.
+    """
+    removed = 0
+    try:
+        with os.scandir(directory or '.') as it:
+            stale = [entry.path for entry in it
+                     if is_temp_name(entry.name) and entry.is_file(follow_symlinks=False)]
+    except OSError:
+        return 0
+    for path in stale:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def fsync_file(path):
+    """Flush a file's data to disk"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def fsync_dir(directory):
+    """Flush a directory's entries to disk; a no-op where directories cannot be opened"""
+    if os.name == 'nt':
+        return
+    fd = os.open(directory or '.', os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def commit_file(temp_path, final_path, durability='none', commits=None):
+    """Atomically move temp_path over final_path.
+
+    A temp_path of None means final_path was changed in place and only
+    needs flushing. With durability 'file' the data is flushed before the
+    replace and the directory entry after it. With 'batch' the commit is
+    appended to commits, for a CommitGroup to make at its next checkpoint;
+    without a commits list it is made at once, as with 'file'.
+    """
+    if durability == 'batch' and commits is not None:
+        commits.append((temp_path, final_path))
+        return
+    durable = durability != 'none'
+    if temp_path is None:
+        if durable:
+            fsync_file(final_path)
+        return
+    if durable:
+        fsync_file(temp_path)
+    os.replace(temp_path, final_path)
+    if durable:
+        fsync_dir(os.path.dirname(final_path))
+
+
+class CommitGroup:
+    """Commits of finished files held back until the next checkpoint.
+
+    Each result may carry 'commits', a list of (temp_path, final_path);
+    a temp_path of None marks a file changed in place that only needs
+    flushing. Results are held with their commits and released by
+    commit() once their files are durable.
+    """
+
+    def __init__(self, max_files=CHECKPOINT_FILES, max_seconds=CHECKPOINT_SECONDS):
+        self.max_files = max_files
+        self.max_seconds = max_seconds
+        self.held = []
+        self.started = None
+
+    def add(self, item, result):
+        """Hold item, whose result's pending commits are taken from it"""
+        if self.started is None:
+            self.started = time.monotonic()
+        self.held.append((item, result, result.pop('commits', None) or []))
+
+    def due(self):
+        """True once a checkpoint should be taken"""
+        return bool(self.held) and (len(self.held) >= self.max_files
+                                    or time.monotonic() - self.started >= self.max_seconds)
+
+    def commit(self):
+        """Take a checkpoint; returns the held items in the order they were added.
+
+        Files are flushed, moved into place and their directories flushed.
+        A commit that fails marks its result as failed, drops its manifest
+        'state' and removes its temporary file.
+        """
+        held, self.held, self.started = self.held, [], None
+        directories = set()
+        for _, result, commits in held:
+            for temp, final in commits:
+                try:
+                    if temp is None:
+                        fsync_file(final)
+                        continue
+                    fsync_file(temp)
+                    os.replace(temp, final)
+                    directories.add(os.path.dirname(final))
+                except OSError as e:
+                    result['success'] = False
+                    result.pop('state', None)
+                    result['log'].append(f"  ❌ Error: {str(e)}")
+                    if temp and os.path.exists(temp):
+                        os.remove(temp)
+        for directory in directories:
+            fsync_dir(directory)
+        return [item for item, _, _ in held]
@@ -0,0 +1,951 @@
+#!/usr/bin/env python3
+"""
+Processing engine for MetadataManager
+
+Holds the per-file metadata removal/editing logic and the batch engine
+that fans files out across a pool of worker processes. Settings are
+passed around as plain dictionaries so they can be pickled to workers;
+see DEFAULT_SETTINGS for the keys.
+
+This module must not import tkinter so it can be used from worker
+processes and headless tools.
+"""
+
+import io
+import mmap
+import os
+import shutil
+import signal
+import struct
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image
+from PIL.ExifTags import GPSTAGS, IFD, TAGS
+from PIL.TiffImagePlugin import IFDRational
+
+from metadata_backup import default_backup_store, make_backup
+from metadata_checkpoint import BatchCheckpoint, BatchControl
+from metadata_commit import (CommitGroup, commit_file, is_temp_name, new_temp_path,
+                             remove_stale_temps)
+from metadata_formats import (METADATA_READERS, TIFF_IMAGE_TAGS, TIFF_IPTC, TIFF_PHOTOSHOP,
+                              TIFF_SUB_IFD_NAMES, TIFF_XMP, ExifScrubPolicy, MetadataFormatError,
+                              decode_tiff_value, inject_exif_file, inject_exif_stream, iptc_values,
+                              iter_exif_entries, needs_stripping, probe_file, read_metadata,
+                              strip_file, strip_file_in_place, strip_stream,
+                              supports_exif_injection, supports_in_place, supports_lossless,
+                              supports_probe, xmp_properties)
+from metadata_manifest import RunManifest, file_state
+from metadata_metrics import FileMetrics
+
+
+# Supported image formats
+SUPPORTED_FORMATS = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp', '.webp'}
+
+# Processing settings shared by the GUI and the batch engine
+DEFAULT_SETTINGS = {
+    'advanced_mode': False,
+    'remove_exif': True,
+    'remove_iptc': True,
+    'remove_xmp': True,
+    # Keep EXIF but drop GPS, the thumbnail and scrub_tags (tag names) from it
+    'scrub_exif': False,
+    'scrub_tags': [],
+    'create_backup': True,
+    # How backups are made, one of metadata_backup.BACKUP_MODES
+    'backup_mode': 'link',
+    'overwrite_original': False,
+    # How outputs are flushed to disk, one of metadata_commit.DURABILITY_MODES
+    'durability': 'batch',
+    'output_dir': "Same as source",
+    'custom_metadata': {},
+    # Serialized custom_metadata, filled in once per batch by BatchEngine
+    'exif_blob': None,
+}
+
+# Reverse indexes of the EXIF tag names, built once at import
+EXIF_TAG_IDS = {name: tag for tag, name in TAGS.items()}
+GPS_TAG_IDS = {name: tag for tag, name in GPSTAGS.items()}
+
+# Custom metadata fields written to the main EXIF IFD by advanced mode
+EXIF_FIELDS = ('Artist', 'Copyright', 'ImageDescription', 'Software', 'Make', 'Model', 'DateTime')
+
+# Custom GPS fields: (GPS tag, reference tag, positive ref, negative ref, limit)
+GPS_FIELDS = {
+    'GPS_Latitude': ('GPSLatitude', 'GPSLatitudeRef', 'N', 'S', 90),
+    'GPS_Longitude': ('GPSLongitude', 'GPSLongitudeRef', 'E', 'W', 180),
+}
+
+
+def default_worker_count():
+    """Number of worker processes to use when none is configured"""
+    return max(1, os.cpu_count() or 1)
+
+
+def ignore_interrupts():
+    """Worker process initializer: leave Ctrl+C to the parent, which cancels cleanly"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def is_supported(path):
+    """Check a path's extension against SUPPORTED_FORMATS with one set lookup"""
+    return os.path.splitext(path)[1].lower() in SUPPORTED_FORMATS
+
+
+def scan_images(folder, cancel=None):
+    """Yield supported image paths under folder as they are discovered.
+
+    Directories are read with os.scandir, so file types come from the
+    directory entries without extra stat calls. Each directory's files are
+    yielded before its subdirectories are entered, in name order, and
+    symlinked directories are not followed. Unreadable directories are
+    skipped, as are temporary files left by an interrupted run. Scanning
+    stops early once the optional cancel event is set.
+    """
+    pending = [folder]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if cancel is not None and cancel.is_set():
+                return
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                elif (is_supported(entry.name) and not is_temp_name(entry.name)
+                      and entry.is_file()):
+                    yield entry.path
+            except OSError:
+                continue
+        pending.extend(reversed(subdirs))
+
+
+def _removal_flags(settings):
+    """Keyword arguments for the container-level strippers.
+
+    With scrub_exif, EXIF is kept and scrubbed by the strippers whatever
+    remove_exif says; remove_exif still decides about comments.
+    """
+    return {
+        'remove_exif': settings['remove_exif'],
+        'remove_iptc': settings['remove_iptc'],
+        'remove_xmp': settings['remove_xmp'],
+    }
+
+
+def scrub_policy(settings):
+    """ExifScrubPolicy for the settings, or None when EXIF is not scrubbed.
+
+    scrub_tags may hold EXIF tag names or numeric IDs. Raises ValueError
+    for names that are not EXIF tags.
+    """
+    if not settings.get('scrub_exif'):
+        return None
+
+    tags = []
+    for name in settings.get('scrub_tags', ()):
+        if name in EXIF_TAG_IDS:
+            tags.append(EXIF_TAG_IDS[name])
+            continue
+        try:
+            tags.append(int(name, 0))
+        except ValueError:
+            raise ValueError(f"Unknown EXIF tag: {name!r}")
+    return ExifScrubPolicy(tags)
+
+
+def process_single_file(file_path, settings, log, metrics=None, commits=None):
+    """Process a single file to remove or edit metadata.
+
+    Progress messages are passed to the log callable and stage timings
+    are added to metrics, a FileMetrics. Outputs are committed as
+    settings['durability'] asks; in 'batch' mode they are appended to
+    commits instead, when given (see metadata_commit). Returns True on
+    success and False on failure; errors are logged, not raised.
+    """
+    metrics = metrics or FileMetrics()
+    try:
+        advanced = settings['advanced_mode']
+        overwrite = settings['overwrite_original']
+
+        # Get original file extension for proper PIL handling
+        original_ext = os.path.splitext(file_path)[1]
+
+        # Check if format is supported
+        if original_ext.lower() not in SUPPORTED_FORMATS:
+            log(f"  ❌ Unsupported format: {original_ext}")
+            return False
+
+        # Overwriting a TIFF only needs its IFDs patched, not a full copy
+        if not advanced and overwrite and strip_in_place(file_path, settings, log, metrics):
+            return True
+
+        # Determine output path
+        if overwrite:
+            output_path = file_path
+        else:
+            output_path = output_path_for(file_path, settings)
+        temp_path = new_temp_path(output_path)
+
+        # Create backup if requested
+        if settings['create_backup'] and not overwrite:
+            create_backup(file_path, settings, log, metrics)
+
+        # Rewrite the container directly when the format allows it
+        if advanced:
+            exif_blob = exif_blob_for(settings)
+            if not write_exif_container(file_path, temp_path, exif_blob, settings, log, metrics):
+                reencode_image(file_path, temp_path, original_ext, settings, log, metrics, exif_blob)
+        elif not strip_container(file_path, temp_path, settings, log, metrics):
+            reencode_image(file_path, temp_path, original_ext, settings, log, metrics)
+
+        # Atomically replace the original or the previous output
+        if os.path.exists(temp_path):
+            with metrics.stage('rename'):
+                commit_file(temp_path, output_path, settings.get('durability', 'none'), commits)
+            if overwrite:
+                action = "updated" if advanced else "cleaned"
+                log(f"  ✅ Original file {action}")
+            else:
+                action = "edited" if advanced else "clean"
+                log(f"  ✅ {action.title()} file saved: {os.path.basename(output_path)}")
+
+            return True
+        else:
+            log("  ❌ Failed to create processed file")
+            return False
+
+    except Exception as e:
+        log(f"  ❌ Error: {str(e)}")
+        # Clean up temp file if it exists
+        if 'temp_path' in locals() and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+
+def output_path_for(file_path, settings):
+    """Where a processed copy of file_path is written when not overwriting"""
+    output_dir = settings['output_dir']
+    if output_dir == "Same as source":
+        output_dir = os.path.dirname(file_path)
+
+    filename = os.path.basename(file_path)
+    name, ext = os.path.splitext(filename)
+
+    if settings['advanced_mode']:
+        return os.path.join(output_dir, f"{name}_edited{ext}")
+    return os.path.join(output_dir, f"{name}_no_metadata{ext}")
+
+
+def create_backup(file_path, settings, log, metrics=None, data=None):
+    """Back up file_path to <file>.backup unless a backup already exists.
+
+    The backup shares the original's data when settings['backup_mode']
+    allows it (see metadata_backup). data, if given, is the file's
+    contents, used instead of reading it again.
+    """
+    backup_path = file_path + ".backup"
+    if os.path.exists(backup_path):
+        return
+
+    metrics = metrics or FileMetrics()
+    with metrics.stage('backup'):
+        method = make_backup(file_path, backup_path, settings.get('backup_mode', 'link'), data)
+    if method == 'copy':
+        size = os.path.getsize(backup_path)
+        metrics.add_bytes(read=0 if data is not None else size, written=size)
+    if method in ('stored', 'deduplicated') and not os.path.exists(backup_path):
+        log(f"  Backup {method} in {default_backup_store()}")
+    else:
+        log(f"  Backup created: {os.path.basename(backup_path)} ({method})")
+
+
+def is_already_clean(file_path, settings, src=None):
+    """True if a header probe finds none of the metadata basic mode would remove.
+
+    src, if given, is a binary stream of the file's contents probed
+    instead of reading file_path.
+    """
+    if settings['advanced_mode'] or not supports_probe(os.path.splitext(file_path)[1]):
+        return False
+
+    try:
+        kinds = probe_file(file_path, src)
+    except (MetadataFormatError, OSError):
+        # Let the normal path deal with (and report) unreadable files
+        return False
+    if settings.get('scrub_exif') and 'exif' in kinds:
+        # The probe cannot see inside EXIF, so any EXIF may need scrubbing
+        return False
+    return not needs_stripping(kinds, **_removal_flags(settings))
+
+
+def keep_clean_file(file_path, settings, log, metrics=None, commits=None):
+    """Handle a file with nothing to remove without decoding or rewriting it"""
+    metrics = metrics or FileMetrics()
+    temp_path = None
+    try:
+        if settings['overwrite_original']:
+            log("  ✨ No metadata to remove, original left untouched")
+        else:
+            output_path = output_path_for(file_path, settings)
+            temp_path = new_temp_path(output_path)
+            with metrics.stage('copy'):
+                shutil.copy2(file_path, temp_path)
+                size = os.path.getsize(temp_path)
+                commit_file(temp_path, output_path, settings.get('durability', 'none'), commits)
+            temp_path = None
+            metrics.add_bytes(read=size, written=size)
+            log(f"  ✨ No metadata to remove, copied as is: {os.path.basename(output_path)}")
+        return True
+    except Exception as e:
+        log(f"  ❌ Error: {str(e)}")
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+
+def strip_in_place(file_path, settings, log, metrics=None):
+    """Patch metadata out of the original file; return False if unsupported.
+
+    A crash partway through the patch leaves the only copy damaged, so
+    this is only done with durability 'none'; the other modes rewrite
+    the file through a temporary copy.
+    """
+    if settings.get('durability', 'none') != 'none':
+        return False
+    if not supports_in_place(os.path.splitext(file_path)[1]):
+        return False
+    if os.stat(file_path).st_nlink > 1:
+        # Patching would also change hard-linked backups; rewrite instead
+        return False
+
+    metrics = metrics or FileMetrics()
+    try:
+        scrub = scrub_policy(settings)
+        with metrics.stage('strip'):
+            removed = strip_file_in_place(file_path, scrub=scrub, **_removal_flags(settings))
+        log(f"  🗑️ Removed {removed} metadata entries (in place)")
+        if scrub:
+            log("  📍 EXIF kept; location and listed tags scrubbed")
+        log("  ✅ Original file cleaned")
+        return True
+    except MetadataFormatError as e:
+        log(f"  ⚠️ In-place strip failed ({str(e)}), rewriting instead")
+        return False
+
+
+def strip_container(file_path, temp_path, settings, log, metrics=None):
+    """Remove metadata without decoding; return False if a re-encode is needed"""
+    if not supports_lossless(os.path.splitext(file_path)[1]):
+        return False
+
+    metrics = metrics or FileMetrics()
+    try:
+        scrub = scrub_policy(settings)
+        with metrics.stage('strip'):
+            removed = strip_file(file_path, temp_path, scrub=scrub, **_removal_flags(settings))
+        metrics.add_bytes(read=os.path.getsize(file_path), written=os.path.getsize(temp_path))
+        log(f"  🗑️ Removed {removed} metadata blocks (lossless)")
+        if scrub:
+            log("  📍 EXIF kept; location, thumbnail and listed tags scrubbed")
+        return True
+    except MetadataFormatError as e:
+        log(f"  ⚠️ Lossless strip failed ({str(e)}), re-encoding instead")
+        return False
+
+
+def write_exif_container(file_path, temp_path, exif_blob, settings, log, metrics=None):
+    """Splice custom EXIF into a copy without decoding; False if a re-encode is needed"""
+    if not supports_exif_injection(os.path.splitext(file_path)[1]):
+        return False
+
+    metrics = metrics or FileMetrics()
+    try:
+        with metrics.stage('inject'):
+            inject_exif_file(file_path, temp_path, exif_blob,
+                             remove_iptc=settings['remove_iptc'],
+                             remove_xmp=settings['remove_xmp'])
+        metrics.add_bytes(read=os.path.getsize(file_path), written=os.path.getsize(temp_path))
+        fields = exif_field_names(settings['custom_metadata'])
+        if fields:
+            log(f"  ✏️ Applied {len(fields)} metadata fields (lossless)")
+        else:
+            log("  ⚠️ No custom EXIF fields to apply")
+        return True
+    except MetadataFormatError as e:
+        log(f"  ⚠️ Lossless EXIF write failed ({str(e)}), re-encoding instead")
+        return False
+
+
+def _file_size(target):
+    """Size of a file path or of an in-memory binary stream"""
+    if isinstance(target, io.BytesIO):
+        return target.getbuffer().nbytes
+    return os.path.getsize(target)
+
+
+def reencode_image(file_path, temp_path, original_ext, settings, log, metrics=None, exif_blob=None):
+    """Decode the image, process it and save it to temp_path.
+
+    file_path and temp_path may also be BytesIO streams. In advanced mode
+    exif_blob, from build_exif_blob, is written to the output. The
+    'encode' stage covers both compressing and writing temp_path, since
+    Pillow streams the encoder output straight to the file.
+    """
+    metrics = metrics or FileMetrics()
+    with metrics.stage('open'):
+        img = Image.open(file_path)
+    with img:
+        with metrics.stage('decode'):
+            img.load()
+        metrics.add_bytes(read=_file_size(file_path))
+
+        # Handle different modes
+        with metrics.stage('process'):
+            if settings['advanced_mode']:
+                # Advanced mode: Add/edit metadata
+                processed_img = apply_custom_metadata(img, settings['custom_metadata'], log)
+            else:
+                # Basic mode: Remove metadata
+                processed_img = remove_metadata(img)
+                # Free the decoded source so only one copy is held while encoding
+                img.close()
+
+        # Save processed image
+        save_kwargs = {}
+
+        # Determine format from extension
+        file_format = None
+        ext_lower = original_ext.lower()
+        if ext_lower in ['.jpg', '.jpeg']:
+            file_format = 'JPEG'
+            save_kwargs['quality'] = 95
+            save_kwargs['optimize'] = True
+        elif ext_lower == '.png':
+            file_format = 'PNG'
+            save_kwargs['optimize'] = True
+        elif ext_lower in ['.tiff', '.tif']:
+            file_format = 'TIFF'
+        elif ext_lower == '.bmp':
+            file_format = 'BMP'
+        elif ext_lower == '.webp':
+            file_format = 'WEBP'
+            save_kwargs['quality'] = 95
+
+        # BMP has nowhere to store EXIF
+        if exif_blob and file_format != 'BMP':
+            save_kwargs['exif'] = exif_blob
+
+        # Save to temporary file first with explicit format
+        with metrics.stage('encode'):
+            if file_format:
+                processed_img.save(temp_path, format=file_format, **save_kwargs)
+            else:
+                processed_img.save(temp_path, **save_kwargs)
+        metrics.add_bytes(written=_file_size(temp_path))
+
+
+def remove_metadata(img):
+    """Remove metadata from image (basic mode).
+
+    The pixels are copied into a fresh image with C-level buffer copies,
+    so no per-pixel Python objects are created. The result carries none of
+    the source's info, EXIF or TIFF tags.
+    """
+    # Convert to RGB if necessary (for JPEG compatibility)
+    if img.mode in ('RGBA', 'LA', 'P'):
+        background = Image.new('RGB', img.size, (255, 255, 255))
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        background.paste(img, mask=img.getchannel('A'))
+        return background
+
+    # Create new image without metadata
+    clean_img = Image.new(img.mode, img.size)
+    clean_img.paste(img)
+
+    return clean_img
+
+
+def _gps_coordinate(value, positive, negative, limit):
+    """Decimal degrees as an EXIF reference and degrees/minutes/seconds triple"""
+    try:
+        degrees = float(value)
+    except ValueError:
+        raise ValueError(f"Invalid GPS coordinate: {value!r}")
+    if not -limit <= degrees <= limit:
+        raise ValueError(f"GPS coordinate out of range: {value!r}")
+
+    ref = positive if degrees >= 0 else negative
+    degrees = abs(degrees)
+    whole = int(degrees)
+    minutes = int((degrees - whole) * 60)
+    seconds = round(((degrees - whole) * 60 - minutes) * 60 * 10000)
+    return ref, (IFDRational(whole), IFDRational(minutes), IFDRational(seconds, 10000))
+
+
+def exif_field_names(custom_metadata):
+    """Custom metadata fields that advanced mode writes to EXIF"""
+    return [field for field in custom_metadata
+            if field in EXIF_FIELDS or field in GPS_FIELDS]
+
+
+def build_exif_blob(custom_metadata):
+    """Serialize the EXIF-mappable custom fields into an EXIF block.
+
+    Returns bytes starting with the Exif header, ready to be spliced into
+    a container or passed to Image.save, or None if no field maps to EXIF.
+    BatchEngine calls this once per batch. Raises ValueError for GPS
+    values that are not decimal degrees.
+    """
+    exif = Image.Exif()
+    for field in EXIF_FIELDS:
+        if field in custom_metadata:
+            exif[EXIF_TAG_IDS[field]] = custom_metadata[field]
+
+    gps = {}
+    for field, (tag, ref_tag, positive, negative, limit) in GPS_FIELDS.items():
+        if field in custom_metadata:
+            ref, value = _gps_coordinate(custom_metadata[field], positive, negative, limit)
+            gps[GPS_TAG_IDS[ref_tag]] = ref
+            gps[GPS_TAG_IDS[tag]] = value
+    if gps:
+        gps[GPS_TAG_IDS['GPSVersionID']] = b'\x02\x02\x00\x00'
+        exif.get_ifd(IFD.GPSInfo).update(gps)
+
+    if not exif_field_names(custom_metadata):
+        return None
+    return exif.tobytes()
+
+
+def exif_blob_for(settings):
+    """The batch's precompiled EXIF block, building it if the caller did not"""
+    if settings.get('exif_blob') is not None:
+        return settings['exif_blob']
+    return build_exif_blob(settings['custom_metadata'])
+
+
+def apply_custom_metadata(img, custom_metadata, log):
+    """Prepare an image for saving with custom metadata (advanced mode).
+
+    The EXIF block itself is built once per batch by build_exif_blob and
+    handed to Image.save by reencode_image.
+    """
+    fields = exif_field_names(custom_metadata)
+    if not fields:
+        log("  ⚠️ No custom EXIF fields to apply")
+    else:
+        log(f"  ✏️ Applied {len(fields)} metadata fields")
+    return img.copy()
+
+
+# IFD entries that only hold other blocks, reported in their own right
+EXIF_CONTAINER_TAGS = set(TIFF_SUB_IFD_NAMES) | {TIFF_XMP, TIFF_IPTC, TIFF_PHOTOSHOP}
+
+
+def _exif_metadata(tiff, is_tiff):
+    """EXIF dict of a TiffStructure in the shape Image.getexif() merges it.
+
+    IFD0 and the Exif IFD are merged, the GPS IFD becomes a 'GPSInfo'
+    sub-dict and the thumbnail IFD is left out. UNDEFINED values that are
+    printable UTF-8 text, such as ExifVersion, are decoded to str; other
+    binary values stay bytes.
+    """
+    exif = {}
+    gps = {}
+    for ifd, entry in iter_exif_entries(tiff):
+        tag = entry[0]
+        if ifd not in ('IFD0', 'Exif', 'GPS') or tag in EXIF_CONTAINER_TAGS:
+            continue
+        if is_tiff and ifd == 'IFD0' and tag in TIFF_IMAGE_TAGS:
+            # The image structure of a TIFF file is not metadata
+            continue
+        try:
+            value = decode_tiff_value(tiff, entry)
+        except (MetadataFormatError, struct.error):
+            continue
+        if isinstance(value, bytes):
+            try:
+                text = value.decode('utf-8')
+                if text.isprintable():
+                    value = text
+            except UnicodeDecodeError:
+                pass
+        if ifd == 'GPS':
+            gps[GPSTAGS.get(tag, tag)] = value
+        else:
+            exif[TAGS.get(tag, tag)] = value
+    if gps:
+        exif['GPSInfo'] = gps
+    return exif
+
+
+def extract_metadata(file_path):
+    """Extract metadata from an image file.
+
+    Returns a dict with 'exif', 'iptc' and 'xmp' sub-dicts keyed by tag
+    name. The file is memory-mapped and only its metadata segments are
+    parsed (see metadata_formats.read_metadata); no image decoder is
+    involved. Errors opening or parsing the file are raised to the caller.
+    """
+    metadata = {
+        'exif': {},
+        'iptc': {},
+        'xmp': {}
+    }
+    ext = os.path.splitext(file_path)[1].lower()
+    with open(file_path, 'rb') as src:
+        if ext not in METADATA_READERS or not os.fstat(src.fileno()).st_size:
+            # Formats without a reader (BMP) carry no metadata
+            return metadata
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            blocks = read_metadata(ext, mapped)
+            if blocks.exif is not None:
+                metadata['exif'] = _exif_metadata(blocks.exif, ext in ('.tif', '.tiff'))
+    if blocks.iptc:
+        metadata['iptc'] = iptc_values(blocks.iptc)
+    if blocks.xmp:
+        metadata['xmp'] = xmp_properties(blocks.xmp)
+    return metadata
+
+
+def process_file(file_path, settings, track_state=False, defer_commits=False):
+    """Worker entry point: process one file and collect its log lines.
+
+    Returns a picklable result dict with 'path', 'success', 'skipped',
+    'log' and 'metrics'. 'skipped' is None for files that were processed,
+    'clean' for files with no targeted metadata and 'unchanged' for files
+    skipped via the run manifest. 'metrics' holds the file's stage timings
+    (see FileMetrics.to_dict). With track_state, successful results also
+    carry the file's post-run 'state' for the manifest, hashed here on the
+    worker. With defer_commits, 'batch' durability outputs are left in
+    their temporary files and listed in the result's 'commits'.
+    """
+    lines = []
+    skipped = None
+    metrics = FileMetrics()
+    commits = [] if defer_commits else None
+    with metrics.stage('probe'):
+        clean = is_already_clean(file_path, settings)
+    if clean:
+        success = keep_clean_file(file_path, settings, lines.append, metrics, commits)
+        if success:
+            skipped = 'clean'
+    else:
+        success = process_single_file(file_path, settings, lines.append, metrics, commits)
+    result = {'path': file_path, 'success': success, 'skipped': skipped, 'log': lines,
+              'metrics': metrics.to_dict()}
+    if commits:
+        result['commits'] = commits
+    if track_state and success:
+        try:
+            result['state'] = file_state(pending_path(file_path, commits))
+        except OSError:
+            pass
+    return result
+
+
+def pending_path(file_path, commits):
+    """Where file_path's new contents are until its deferred commit is made"""
+    for temp_path, final_path in commits or ():
+        if temp_path and final_path == file_path:
+            return temp_path
+    return file_path
+
+
+def transform_data(file_path, data, settings, log, metrics=None):
+    """Process a file's contents in memory and return the new contents.
+
+    Follows process_single_file: the container is rewritten directly when
+    the format allows it and the image is re-encoded otherwise. Errors
+    are raised to the caller.
+    """
+    metrics = metrics or FileMetrics()
+    ext = os.path.splitext(file_path)[1].lower()
+    out = io.BytesIO()
+    exif_blob = None
+
+    if settings['advanced_mode']:
+        exif_blob = exif_blob_for(settings)
+        if supports_exif_injection(ext):
+            try:
+                with metrics.stage('inject'):
+                    inject_exif_stream(ext, io.BytesIO(data), out, exif_blob,
+                                       remove_iptc=settings['remove_iptc'],
+                                       remove_xmp=settings['remove_xmp'])
+                metrics.add_bytes(read=len(data), written=out.tell())
+                fields = exif_field_names(settings['custom_metadata'])
+                if fields:
+                    log(f"  ✏️ Applied {len(fields)} metadata fields (lossless)")
+                else:
+                    log("  ⚠️ No custom EXIF fields to apply")
+                return out.getvalue()
+            except MetadataFormatError as e:
+                log(f"  ⚠️ Lossless EXIF write failed ({str(e)}), re-encoding instead")
+                out = io.BytesIO()
+    elif supports_lossless(ext):
+        try:
+            scrub = scrub_policy(settings)
+            with metrics.stage('strip'):
+                removed = strip_stream(ext, io.BytesIO(data), out, scrub=scrub,
+                                       **_removal_flags(settings))
+            metrics.add_bytes(read=len(data), written=out.tell())
+            log(f"  🗑️ Removed {removed} metadata blocks (lossless)")
+            if scrub:
+                log("  📍 EXIF kept; location, thumbnail and listed tags scrubbed")
+            return out.getvalue()
+        except MetadataFormatError as e:
+            log(f"  ⚠️ Lossless strip failed ({str(e)}), re-encoding instead")
+            out = io.BytesIO()
+
+    reencode_image(io.BytesIO(data), out, ext, settings, log, metrics, exif_blob)
+    return out.getvalue()
+
+
+def process_data(file_path, data, settings):
+    """Worker entry point of the pipelined engine: transform a file's bytes.
+
+    Like process_file, but reading the source and writing the output are
+    left to the caller. The result also carries 'output': the new file
+    contents, or None when nothing was produced. Files with nothing to
+    remove come back with 'skipped' set to 'clean' and no output.
+    """
+    lines = []
+    metrics = FileMetrics()
+    result = {'path': file_path, 'success': False, 'skipped': None, 'log': lines,
+              'metrics': None, 'output': None}
+    try:
+        ext = os.path.splitext(file_path)[1]
+        if ext.lower() not in SUPPORTED_FORMATS:
+            lines.append(f"  ❌ Unsupported format: {ext}")
+        else:
+            with metrics.stage('probe'):
+                clean = is_already_clean(file_path, settings, io.BytesIO(data))
+            if clean:
+                result['skipped'] = 'clean'
+            else:
+                result['output'] = transform_data(file_path, data, settings, lines.append, metrics)
+            result['success'] = True
+    except Exception as e:
+        lines.append(f"  ❌ Error: {str(e)}")
+    result['metrics'] = metrics.to_dict()
+    return result
+
+
+def skipped_result(file_path):
+    """Result for a file left alone because the manifest says it is unchanged"""
+    return {'path': file_path, 'success': True, 'skipped': 'unchanged',
+            'log': ["  ⏭️ Unchanged since last run, skipped"], 'metrics': None}
+
+
+def resumed_result(file_path):
+    """Result for a file finished before an interrupted run of the same batch"""
+    return {'path': file_path, 'success': True, 'skipped': 'resumed',
+            'log': ["  ⏭️ Done before the batch was interrupted, skipped"], 'metrics': None}
+
+
+# Yielded by BatchEngine._run before it waits while paused, so pending
+# commits, the manifest and the checkpoint can be flushed first
+PAUSE_POINT = (None, None)
+
+
+class BatchEngine:
+    """Runs process_file over a batch of files on a pool of worker processes.
+
+    With a manifest_path, files recorded as unchanged since their last
+    successful run with the same settings are skipped, and newly processed
+    files are recorded. The manifest is opened on the thread calling run().
+    In advanced mode the custom EXIF block is built here, once per batch.
+    Invalid GPS values or scrub tag names raise ValueError.
+
+    With 'batch' durability, outputs are committed in groups at
+    checkpoints, and each result is yielded (and recorded in the manifest)
+    only once its files are committed.
+
+    control, a BatchControl, pauses or cancels the batch; files in flight
+    are finished first. With a checkpoint_path, progress is saved there
+    and a run of the same files with the same settings resumes after the
+    files already done, which are reported with 'skipped' set to 'resumed'.
+
+    Temporary files left by an interrupted run are removed from the
+    folders the batch writes to before any file is processed.
+
+    If a worker process dies, the files in flight are reported as failed
+    and the rest of the batch continues on a new pool.
+    """
+
+    def __init__(self, settings, jobs=None, manifest_path=None, checkpoint_path=None,
+                 control=None):
+        self.settings = dict(settings)
+        if self.settings['advanced_mode']:
+            # Serialize the custom fields once instead of once per file
+            self.settings['exif_blob'] = build_exif_blob(self.settings['custom_metadata'])
+        else:
+            # Reject unknown scrub tag names before any file is touched
+            scrub_policy(self.settings)
+        self.jobs = max(1, jobs or default_worker_count())
+        self.manifest_path = manifest_path
+        self.checkpoint_path = checkpoint_path
+        self.control = control or BatchControl()
+        self.defer_commits = self.settings.get('durability', 'none') == 'batch'
+        # Files submitted ahead of the oldest unfinished one, per worker
+        self.queue_depth = 4
+
+    def run(self, files):
+        """Yield (index, result) for each file, in submission order.
+
+        Results are yielded in the order the files were given even when
+        workers finish out of order, so progress can be reported
+        sequentially. At most jobs * queue_depth files are in flight.
+        A cancelled run stops early, after the files in flight.
+        """
+        files = list(files)
+        self._remove_stale_temps(files)
+        checkpoint = None
+        start = 0
+        if self.checkpoint_path:
+            checkpoint = BatchCheckpoint(self.checkpoint_path, files, self.settings)
+            start = checkpoint.completed
+            for index in range(start):
+                yield index, resumed_result(files[index])
+
+        try:
+            if not self.manifest_path:
+                for index, result in self._committed(self._run(files[start:], None)):
+                    if index is None:
+                        if checkpoint:
+                            checkpoint.save()
+                        continue
+                    if checkpoint:
+                        checkpoint.advance(start + index + 1)
+                    yield start + index, result
+                return
+
+            with RunManifest(self.manifest_path, self.settings) as manifest:
+                for index, result in self._committed(self._run(files[start:], manifest)):
+                    if index is None:
+                        manifest.commit()
+                        if checkpoint:
+                            checkpoint.save()
+                        continue
+                    state = result.pop('state', None)
+                    if state is not None:
+                        manifest.record(result['path'], state, self._output_of(result['path']))
+                    if checkpoint:
+                        checkpoint.advance(start + index + 1)
+                    yield start + index, result
+        finally:
+            if checkpoint:
+                checkpoint.finish()
+
+    def _output_of(self, file_path):
+        """The separate output written for file_path, or None when overwriting"""
+        if self.settings['overwrite_original']:
+            return None
+        return os.path.abspath(output_path_for(file_path, self.settings))
+
+    def _remove_stale_temps(self, files):
+        """Clear leftover temporary files from every folder outputs go to"""
+        overwrite = self.settings['overwrite_original']
+        directories = set()
+        for file_path in files:
+            output_path = file_path if overwrite else output_path_for(file_path, self.settings)
+            directories.add(os.path.dirname(output_path))
+        for directory in directories:
+            remove_stale_temps(directory)
+
+    def _committed(self, results):
+        """Hold results back until a checkpoint has committed their outputs"""
+        if not self.defer_commits:
+            yield from results
+            return
+
+        group = CommitGroup()
+        try:
+            for index, result in results:
+                if index is None:
+                    yield from group.commit()
+                    yield PAUSE_POINT
+                    continue
+                group.add((index, result), result)
+                if group.due() or self.control.stopping:
+                    yield from group.commit()
+        finally:
+            # Also commit what finished before an error or an early stop
+            ready = group.commit()
+        yield from ready
+
+    def _run(self, files, manifest):
+        """Run the batch, consulting the manifest (if any) before each file"""
+        track_state = manifest is not None
+
+        if self.jobs == 1:
+            for index, file_path in enumerate(files):
+                if self.control.stopping:
+                    yield PAUSE_POINT
+                    if not self.control.wait():
+                        return
+                if manifest and manifest.is_unchanged(file_path):
+                    yield index, skipped_result(file_path)
+                else:
+                    yield index, process_file(file_path, self.settings, track_state,
+                                              self.defer_commits)
+            return
+
+        window = self.jobs * self.queue_depth
+        pool = self._new_pool()
+        try:
+            pending = deque()
+            for index, file_path in enumerate(files):
+                if self.control.stopping:
+                    yield from self._drain(pending)
+                    if not self.control.wait():
+                        break
+                if manifest and manifest.is_unchanged(file_path):
+                    # Keep skipped files in the ordered window with the rest
+                    future = Future()
+                    future.set_result(skipped_result(file_path))
+                else:
+                    args = (process_file, file_path, self.settings, track_state,
+                            self.defer_commits)
+                    try:
+                        future = pool.submit(*args)
+                    except BrokenProcessPool:
+                        # A worker died; the files it took down are reported as
+                        # failed by _collect, and the rest go to a fresh pool
+                        pool.shutdown(wait=False)
+                        pool = self._new_pool()
+                        future = pool.submit(*args)
+                pending.append((index, file_path, future))
+                if len(pending) >= window:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            pool.shutdown()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=ignore_interrupts)
+
+    def _drain(self, pending):
+        """Finish the files in flight, then mark the point where the batch pauses"""
+        while pending:
+            yield self._collect(*pending.popleft())
+        yield PAUSE_POINT
+
+    @staticmethod
+    def _collect(index, file_path, future):
+        """Wait for a submitted file, turning worker crashes into failures"""
+        try:
+            return index, future.result()
+        except Exception as e:
+            return index, {'path': file_path, 'success': False, 'skipped': None,
+                           'log': [f"  ❌ Error: {str(e)}"], 'metrics': None}
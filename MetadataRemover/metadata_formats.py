@@ -0,0 +1,1576 @@
+#!/usr/bin/env python3
+"""
+Container-level metadata handling for MetadataManager
+
+These routines rewrite image files at the byte level instead of decoding
+and re-encoding the pixels. Metadata segments are dropped according to
+the same EXIF/IPTC/XMP toggles used by the GUI, while the compressed
+image data is copied through untouched.
+
+This module must not import tkinter so it can be used from worker
+processes and headless tools.
+"""
+
+import io
+import os
+import re
+import shutil
+import struct
+import zlib
+from xml.etree import ElementTree
+
+
+# Size of the blocks used when copying image data through unchanged
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class MetadataFormatError(ValueError):
+    """Raised when a file's container structure cannot be parsed"""
+
+
+def _read_exact(src, size):
+    """Read exactly size bytes or raise MetadataFormatError"""
+    data = src.read(size)
+    if len(data) != size:
+        raise MetadataFormatError("Unexpected end of file")
+    return data
+
+
+def _copy_exact(src, dst, size):
+    """Copy exactly size bytes from src to dst in bounded blocks"""
+    while size > 0:
+        block = src.read(min(size, COPY_CHUNK_SIZE))
+        if not block:
+            raise MetadataFormatError("Unexpected end of file")
+        dst.write(block)
+        size -= len(block)
+
+
+def _skip_exact(src, size):
+    """Discard exactly size bytes from src"""
+    while size > 0:
+        block = src.read(min(size, COPY_CHUNK_SIZE))
+        if not block:
+            raise MetadataFormatError("Unexpected end of file")
+        size -= len(block)
+
+
+def _should_drop(kind, remove_exif, remove_iptc, remove_xmp, scrub=None, scrubbable=False):
+    """Decide whether a metadata segment of the given kind is removed.
+
+    With an ExifScrubPolicy scrub, EXIF blocks the scrub can rewrite
+    (scrubbable) are kept, and every other EXIF carrier, such as a PNG
+    text profile, is removed since it could hold a location. Comments
+    follow remove_exif either way.
+    """
+    if kind == 'exif' and scrub is not None:
+        return not scrubbable
+    if kind in ('exif', 'comment'):
+        return remove_exif
+    if kind == 'iptc':
+        return remove_iptc
+    if kind == 'xmp':
+        return remove_xmp
+    return False
+
+
+# ---------------------------------------------------------------------------
+# JPEG
+# ---------------------------------------------------------------------------
+
+JPEG_SOI = 0xD8
+JPEG_EOI = 0xD9
+JPEG_SOS = 0xDA
+JPEG_APP0 = 0xE0
+JPEG_APP1 = 0xE1
+JPEG_APP13 = 0xED
+JPEG_COM = 0xFE
+
+# Markers that are not followed by a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, JPEG_SOI, JPEG_EOI}
+
+EXIF_HEADER = b'Exif\x00\x00'
+XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+XMP_EXTENSION_HEADER = b'http://ns.adobe.com/xmp/extension/\x00'
+PHOTOSHOP_HEADER = b'Photoshop 3.0\x00'
+
+
+def classify_jpeg_segment(marker, payload):
+    """Return the metadata kind of a JPEG segment, or None for image data"""
+    if marker == JPEG_APP1:
+        if payload.startswith(EXIF_HEADER):
+            return 'exif'
+        if payload.startswith(XMP_HEADER) or payload.startswith(XMP_EXTENSION_HEADER):
+            return 'xmp'
+    elif marker == JPEG_APP13:
+        # Photoshop image resource blocks carry the IPTC-IIM record
+        return 'iptc'
+    elif marker == JPEG_COM:
+        return 'comment'
+    return None
+
+
+def _next_jpeg_marker(src):
+    """Read the next marker code, skipping any 0xFF fill bytes"""
+    if _read_exact(src, 1) != b'\xff':
+        raise MetadataFormatError("Expected a JPEG marker")
+    code = _read_exact(src, 1)[0]
+    while code == 0xFF:
+        code = _read_exact(src, 1)[0]
+    return code
+
+
+def strip_jpeg(src, dst, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Copy a JPEG stream without its metadata segments.
+
+    Only the marker segments in front of the first scan are inspected.
+    Everything from the SOS marker onwards is copied byte for byte. With
+    an ExifScrubPolicy scrub, EXIF segments are kept and rewritten by it.
+    Returns the number of segments that were removed.
+    """
+    if _read_exact(src, 2) != b'\xff\xd8':
+        raise MetadataFormatError("Not a JPEG file (missing SOI marker)")
+    dst.write(b'\xff\xd8')
+
+    removed = 0
+    while True:
+        marker = _next_jpeg_marker(src)
+        if marker in JPEG_STANDALONE_MARKERS:
+            dst.write(bytes((0xFF, marker)))
+            if marker == JPEG_EOI:
+                return removed
+            continue
+
+        length_bytes = _read_exact(src, 2)
+        length = struct.unpack('>H', length_bytes)[0]
+        if length < 2:
+            raise MetadataFormatError(f"Invalid length for JPEG marker 0x{marker:02X}")
+        payload = _read_exact(src, length - 2)
+
+        kind = classify_jpeg_segment(marker, payload)
+        if kind and _should_drop(kind, remove_exif, remove_iptc, remove_xmp, scrub, True):
+            removed += 1
+            continue
+        if kind == 'exif' and scrub is not None:
+            payload = EXIF_HEADER + scrub_exif_block(payload[len(EXIF_HEADER):], scrub)
+            length_bytes = struct.pack('>H', len(payload) + 2)
+
+        dst.write(bytes((0xFF, marker)) + length_bytes + payload)
+        if marker == JPEG_SOS:
+            # Entropy-coded data and any further scans are copied verbatim
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            return removed
+
+
+def inject_jpeg_exif(src, dst, exif_blob, remove_iptc=True, remove_xmp=True):
+    """Copy a JPEG stream, replacing its EXIF with exif_blob.
+
+    Existing EXIF segments and comments are dropped and a single APP1
+    segment holding exif_blob (with its Exif header) is written after SOI
+    and any JFIF APP0 segment. A None blob only drops the old EXIF. Scan
+    data is copied byte for byte. Returns the number of segments that
+    were removed.
+    """
+    if exif_blob is not None and len(exif_blob) > 0xFFFF - 2:
+        raise MetadataFormatError("EXIF data too large for a JPEG APP1 segment")
+    if _read_exact(src, 2) != b'\xff\xd8':
+        raise MetadataFormatError("Not a JPEG file (missing SOI marker)")
+    dst.write(b'\xff\xd8')
+
+    removed = 0
+    inserted = exif_blob is None
+    while True:
+        marker = _next_jpeg_marker(src)
+        if not inserted and marker != JPEG_APP0:
+            dst.write(bytes((0xFF, JPEG_APP1)) + struct.pack('>H', len(exif_blob) + 2) + exif_blob)
+            inserted = True
+
+        if marker in JPEG_STANDALONE_MARKERS:
+            dst.write(bytes((0xFF, marker)))
+            if marker == JPEG_EOI:
+                return removed
+            continue
+
+        length_bytes = _read_exact(src, 2)
+        length = struct.unpack('>H', length_bytes)[0]
+        if length < 2:
+            raise MetadataFormatError(f"Invalid length for JPEG marker 0x{marker:02X}")
+        payload = _read_exact(src, length - 2)
+
+        kind = classify_jpeg_segment(marker, payload)
+        if kind and _should_drop(kind, True, remove_iptc, remove_xmp):
+            removed += 1
+            continue
+
+        dst.write(bytes((0xFF, marker)) + length_bytes + payload)
+        if marker == JPEG_SOS:
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            return removed
+
+
+# ---------------------------------------------------------------------------
+# PNG
+# ---------------------------------------------------------------------------
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_TEXT_CHUNKS = {b'tEXt', b'zTXt', b'iTXt'}
+PNG_METADATA_CHUNKS = PNG_TEXT_CHUNKS | {b'eXIf', b'tIME'}
+
+# Keyword prefix of the hex "raw profile" text chunks ImageMagick writes
+RAW_PROFILE_PREFIX = b'Raw profile type '
+
+
+def classify_png_chunk(chunk_type, data):
+    """Return the metadata kind of a PNG chunk, or None for image data"""
+    if chunk_type in (b'eXIf', b'tIME'):
+        return 'exif'
+    if chunk_type in PNG_TEXT_CHUNKS:
+        keyword = data.split(b'\x00', 1)[0]
+        if keyword == b'XML:com.adobe.xmp':
+            return 'xmp'
+        # ImageMagick stores foreign metadata blocks as hex "raw profiles"
+        if keyword.startswith(RAW_PROFILE_PREFIX):
+            profile = keyword[len(RAW_PROFILE_PREFIX):].lower()
+            if profile in (b'iptc', b'8bim'):
+                return 'iptc'
+            if profile == b'xmp':
+                return 'xmp'
+            if profile in (b'exif', b'app1'):
+                return 'exif'
+        return 'comment'
+    return None
+
+
+def strip_png(src, dst, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Copy a PNG stream without its text, eXIf and tIME chunks.
+
+    Kept chunks, including IDAT, are copied verbatim together with their
+    original CRCs, so the image data is never decompressed. With an
+    ExifScrubPolicy scrub, the eXIf chunk is kept and rewritten by it,
+    while raw EXIF text profiles and tIME, which it cannot rewrite, are
+    removed. Anything after IEND is dropped. Returns the number of chunks
+    that were removed.
+    """
+    if _read_exact(src, 8) != PNG_SIGNATURE:
+        raise MetadataFormatError("Not a PNG file (bad signature)")
+    dst.write(PNG_SIGNATURE)
+
+    removed = 0
+    while True:
+        header = _read_exact(src, 8)
+        length, chunk_type = struct.unpack('>I4s', header)
+
+        if chunk_type in PNG_METADATA_CHUNKS:
+            body = _read_exact(src, length + 4)
+            kind = classify_png_chunk(chunk_type, body[:length])
+            if _should_drop(kind, remove_exif, remove_iptc, remove_xmp, scrub,
+                            chunk_type == b'eXIf'):
+                removed += 1
+                continue
+            if chunk_type == b'eXIf' and scrub is not None:
+                data = scrub_exif_block(body[:length], scrub)
+                header = struct.pack('>I4s', len(data), chunk_type)
+                body = data + struct.pack('>I', zlib.crc32(chunk_type + data))
+            dst.write(header + body)
+        else:
+            # Data and CRC are streamed through untouched
+            dst.write(header)
+            _copy_exact(src, dst, length + 4)
+
+        if chunk_type == b'IEND':
+            return removed
+
+
+def inject_png_exif(src, dst, exif_blob, remove_iptc=True, remove_xmp=True):
+    """Copy a PNG stream, replacing its EXIF with exif_blob.
+
+    Existing eXIf, tIME and comment chunks are dropped, as in strip_png
+    with remove_exif set, and an eXIf chunk holding exif_blob (minus its
+    Exif header) is written right after IHDR. A None blob only drops the
+    old EXIF. Returns the number of chunks that were removed.
+    """
+    if _read_exact(src, 8) != PNG_SIGNATURE:
+        raise MetadataFormatError("Not a PNG file (bad signature)")
+    dst.write(PNG_SIGNATURE)
+
+    removed = 0
+    while True:
+        header = _read_exact(src, 8)
+        length, chunk_type = struct.unpack('>I4s', header)
+
+        if chunk_type in PNG_METADATA_CHUNKS:
+            body = _read_exact(src, length + 4)
+            kind = classify_png_chunk(chunk_type, body[:length])
+            if _should_drop(kind, True, remove_iptc, remove_xmp):
+                removed += 1
+                continue
+            dst.write(header + body)
+        else:
+            dst.write(header)
+            _copy_exact(src, dst, length + 4)
+
+        if chunk_type == b'IHDR' and exif_blob is not None:
+            data = exif_blob[len(EXIF_HEADER):] if exif_blob.startswith(EXIF_HEADER) else exif_blob
+            dst.write(struct.pack('>I4s', len(data), b'eXIf') + data
+                      + struct.pack('>I', zlib.crc32(b'eXIf' + data)))
+        elif chunk_type == b'IEND':
+            return removed
+
+
+# ---------------------------------------------------------------------------
+# WebP
+# ---------------------------------------------------------------------------
+
+# Feature flags in the first byte of the VP8X chunk payload
+WEBP_FLAG_EXIF = 0x08
+WEBP_FLAG_XMP = 0x04
+
+
+def classify_webp_chunk(fourcc):
+    """Return the metadata kind of a RIFF chunk, or None for image data"""
+    if fourcc == b'EXIF':
+        return 'exif'
+    if fourcc == b'XMP ':
+        return 'xmp'
+    return None
+
+
+def strip_webp(src, dst, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Copy a WebP RIFF stream without its EXIF and XMP chunks.
+
+    Lossy, lossless and animated bitstream chunks are copied untouched.
+    With an ExifScrubPolicy scrub, the EXIF chunk is kept and rewritten
+    by it. The VP8X feature flags and the RIFF size are updated to match,
+    which requires dst to be seekable. WebP has no IPTC container, so
+    remove_iptc is accepted only for a uniform signature. Returns the
+    number of chunks that were removed.
+    """
+    start = dst.tell()
+    header = _read_exact(src, 12)
+    riff, riff_size, form = struct.unpack('<4sI4s', header)
+    if riff != b'RIFF' or form != b'WEBP':
+        raise MetadataFormatError("Not a WebP file (bad RIFF header)")
+    dst.write(header)
+
+    drop_exif = _should_drop('exif', remove_exif, remove_iptc, remove_xmp, scrub, True)
+    clear_flags = (WEBP_FLAG_EXIF if drop_exif else 0) | (WEBP_FLAG_XMP if remove_xmp else 0)
+    remaining = riff_size - 4
+    new_size = 4
+    removed = 0
+    while remaining >= 8:
+        chunk_header = _read_exact(src, 8)
+        fourcc, size = struct.unpack('<4sI', chunk_header)
+        padded = size + (size & 1)
+        if 8 + padded > remaining:
+            raise MetadataFormatError(f"WebP chunk {fourcc!r} runs past the end of the file")
+        remaining -= 8 + padded
+
+        kind = classify_webp_chunk(fourcc)
+        if kind and _should_drop(kind, remove_exif, remove_iptc, remove_xmp, scrub, True):
+            _skip_exact(src, padded)
+            removed += 1
+            continue
+
+        if kind == 'exif' and scrub is not None:
+            data = _read_exact(src, padded)[:size]
+            # Some writers keep the JPEG-style Exif header in the chunk
+            prefix = EXIF_HEADER if data.startswith(EXIF_HEADER) else b''
+            data = prefix + scrub_exif_block(data[len(prefix):], scrub)
+            dst.write(struct.pack('<4sI', fourcc, len(data)) + data + b'\x00' * (len(data) & 1))
+            new_size += 8 + len(data) + (len(data) & 1)
+            continue
+
+        dst.write(chunk_header)
+        if fourcc == b'VP8X' and clear_flags:
+            payload = bytearray(_read_exact(src, padded))
+            payload[0] &= ~clear_flags & 0xFF
+            dst.write(payload)
+        else:
+            _copy_exact(src, dst, padded)
+        new_size += 8 + padded
+
+    if new_size != riff_size:
+        end = dst.tell()
+        dst.seek(start + 4)
+        dst.write(struct.pack('<I', new_size))
+        dst.seek(end)
+    return removed
+
+
+# ---------------------------------------------------------------------------
+# TIFF
+# ---------------------------------------------------------------------------
+
+# Byte sizes of the TIFF / BigTIFF field types
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8,
+                   11: 4, 12: 8, 13: 4, 16: 8, 17: 8, 18: 8}
+
+TIFF_EXIF_IFD = 34665
+TIFF_GPS_IFD = 34853
+TIFF_INTEROP_IFD = 40965
+TIFF_XMP = 700
+TIFF_IPTC = 33723
+TIFF_PHOTOSHOP = 34377
+
+# Tags whose value is the offset of another IFD
+TIFF_IFD_POINTERS = {TIFF_EXIF_IFD, TIFF_GPS_IFD, TIFF_INTEROP_IFD}
+
+# Baseline tags identifying the camera, software, author and capture time
+TIFF_IDENTITY_TAGS = {271, 272, 305, 306, 315, 316}
+
+# Location of the JPEG thumbnail in an EXIF IFD1
+TIFF_THUMBNAIL_OFFSET = 513
+TIFF_THUMBNAIL_LENGTH = 514
+
+
+def classify_tiff_tag(tag):
+    """Return the metadata kind of an IFD0 tag, or None for image data"""
+    if tag in (TIFF_EXIF_IFD, TIFF_GPS_IFD) or tag in TIFF_IDENTITY_TAGS:
+        return 'exif'
+    if tag == TIFF_XMP:
+        return 'xmp'
+    if tag in (TIFF_IPTC, TIFF_PHOTOSHOP):
+        return 'iptc'
+    return None
+
+
+class TiffStructure:
+    """Random-access reader for the IFD structure of a TIFF or BigTIFF file"""
+
+    def __init__(self, src):
+        self.src = src
+        src.seek(0, os.SEEK_END)
+        self.size = src.tell()
+        src.seek(0)
+
+        header = _read_exact(src, 8)
+        if header[:2] == b'II':
+            self.order = '<'
+        elif header[:2] == b'MM':
+            self.order = '>'
+        else:
+            raise MetadataFormatError("Not a TIFF file (bad byte order mark)")
+
+        version = struct.unpack(self.order + 'H', header[2:4])[0]
+        if version == 42:
+            self.count_fmt, self.entry_fmt, self.offset_fmt = 'H', 'HHII', 'I'
+            self.first_ifd = struct.unpack(self.order + 'I', header[4:8])[0]
+        elif version == 43:
+            self.count_fmt, self.entry_fmt, self.offset_fmt = 'Q', 'HHQQ', 'Q'
+            self.first_ifd = struct.unpack(self.order + 'Q', _read_exact(src, 8))[0]
+        else:
+            raise MetadataFormatError(f"Unsupported TIFF version {version}")
+
+        self.count_size = struct.calcsize('=' + self.count_fmt)
+        self.entry_size = struct.calcsize('=' + self.entry_fmt)
+        self.offset_size = struct.calcsize('=' + self.offset_fmt)
+
+    def read(self, offset, size):
+        """Read a byte range, rejecting ranges outside the file"""
+        if offset + size > self.size:
+            raise MetadataFormatError("TIFF offset points past the end of the file")
+        self.src.seek(offset)
+        return _read_exact(self.src, size)
+
+    def read_ifd(self, offset):
+        """Return ([(tag, type, count, value, raw_entry), ...], next_ifd_offset)"""
+        count = struct.unpack(self.order + self.count_fmt, self.read(offset, self.count_size))[0]
+        raw = self.read(offset + self.count_size, count * self.entry_size + self.offset_size)
+
+        entries = []
+        for i in range(count):
+            start = i * self.entry_size
+            tag, field_type, n, value = struct.unpack_from(self.order + self.entry_fmt, raw, start)
+            entries.append((tag, field_type, n, value, raw[start:start + self.entry_size]))
+        next_offset = struct.unpack_from(self.order + self.offset_fmt, raw, count * self.entry_size)[0]
+        return entries, next_offset
+
+    def ifd_size(self, entry_count):
+        """Size in bytes of an IFD with the given number of entries"""
+        return self.count_size + entry_count * self.entry_size + self.offset_size
+
+    def value_range(self, field_type, count, value):
+        """Return (offset, size) of an out-of-line value, or None if stored inline"""
+        size = TIFF_TYPE_SIZES.get(field_type, 1) * count
+        if size <= self.offset_size:
+            return None
+        if value + size > self.size:
+            raise MetadataFormatError("TIFF value points past the end of the file")
+        return value, size
+
+
+def _tiff_blank_patches(tiff, tag, field_type, count, value, visited):
+    """Patches that zero a removed entry's value and any IFD it points to"""
+    patches = []
+    value_range = tiff.value_range(field_type, count, value)
+    if value_range:
+        patches.append((value_range[0], bytes(value_range[1])))
+
+    if tag in TIFF_IFD_POINTERS and value and value not in visited:
+        visited.add(value)
+        entries, _ = tiff.read_ifd(value)
+        for entry in entries:
+            patches.extend(_tiff_blank_patches(tiff, *entry[:4], visited))
+        patches.append((value, bytes(tiff.ifd_size(len(entries)))))
+    return patches
+
+
+def _tiff_ifd_patch(tiff, offset, entries, kept, next_offset):
+    """Patch rewriting an IFD at its offset with only the kept entries"""
+    ifd = (struct.pack(tiff.order + tiff.count_fmt, len(kept))
+           + b''.join(entry[4] for entry in kept)
+           + struct.pack(tiff.order + tiff.offset_fmt, next_offset))
+    # The IFD shrinks in place; the freed tail is zeroed
+    return offset, ifd + bytes(tiff.ifd_size(len(entries)) - len(ifd))
+
+
+def plan_tiff_strip(tiff, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Work out the byte patches that remove metadata from every IFD.
+
+    Each IFD in the main chain is rewritten at its original offset with the
+    metadata entries left out. Removed values and sub-IFDs are zeroed so no
+    orphaned metadata stays behind. Strip and tile offsets are untouched.
+    With an ExifScrubPolicy scrub, its tags are also removed from each IFD
+    and from the Exif sub-IFDs that are kept. Returns
+    (patches, removed_entry_count), where patches is a list of
+    (offset, bytes) to write in order.
+    """
+    patches = []
+    removed = 0
+    visited = set()
+    offset = tiff.first_ifd
+    while offset and offset not in visited:
+        visited.add(offset)
+        entries, next_offset = tiff.read_ifd(offset)
+
+        kept = []
+        for entry in entries:
+            kind = classify_tiff_tag(entry[0])
+            if kind and _should_drop(kind, remove_exif, remove_iptc, remove_xmp, scrub, True):
+                patches.extend(_tiff_blank_patches(tiff, *entry[:4], visited))
+            elif scrub is not None and entry[0] in scrub.drop_tags:
+                patches.extend(_tiff_blank_patches(tiff, *entry[:4], visited))
+            else:
+                kept.append(entry)
+                if scrub is not None and entry[0] == TIFF_EXIF_IFD:
+                    sub_patches, sub_removed = _plan_ifd_scrub(tiff, entry[3], scrub.drop_tags, visited)
+                    patches.extend(sub_patches)
+                    removed += sub_removed
+
+        if len(kept) != len(entries):
+            removed += len(entries) - len(kept)
+            patches.append(_tiff_ifd_patch(tiff, offset, entries, kept, next_offset))
+        offset = next_offset
+    return patches, removed
+
+
+class ExifScrubPolicy:
+    """Which parts of EXIF a selective scrub removes; the rest is kept.
+
+    drop_tags are numeric tag IDs removed from IFD0 and the Exif and
+    Interop sub-IFDs. drop_gps adds the GPS IFD pointer, whose IFD is
+    zeroed. drop_thumbnail cuts IFD1 and its embedded JPEG from EXIF
+    blocks; it does not apply to TIFF files, where IFD1 is the next page.
+    """
+
+    def __init__(self, drop_tags=(), drop_gps=True, drop_thumbnail=True):
+        self.drop_tags = frozenset(drop_tags) | ({TIFF_GPS_IFD} if drop_gps else frozenset())
+        self.drop_thumbnail = drop_thumbnail
+
+
+def _tiff_blank_chain(tiff, offset, visited):
+    """Patches that zero an IFD chain, its values and any JPEG thumbnail"""
+    patches = []
+    while offset and offset not in visited:
+        visited.add(offset)
+        entries, next_offset = tiff.read_ifd(offset)
+        values = {entry[0]: entry[3] for entry in entries}
+        for entry in entries:
+            patches.extend(_tiff_blank_patches(tiff, *entry[:4], visited))
+        if TIFF_THUMBNAIL_OFFSET in values and TIFF_THUMBNAIL_LENGTH in values:
+            start, size = values[TIFF_THUMBNAIL_OFFSET], values[TIFF_THUMBNAIL_LENGTH]
+            if start + size > tiff.size:
+                raise MetadataFormatError("EXIF thumbnail points past the end of the block")
+            patches.append((start, bytes(size)))
+        patches.append((offset, bytes(tiff.ifd_size(len(entries)))))
+        offset = next_offset
+    return patches
+
+
+def _plan_ifd_scrub(tiff, offset, drop_tags, visited, cut_chain=False):
+    """Patches removing drop_tags from an IFD and the Exif/Interop IFDs below it.
+
+    With cut_chain, the IFDs following this one (the EXIF thumbnail) are
+    zeroed and unlinked. Returns (patches, removed_entry_count).
+    """
+    if not offset or offset in visited:
+        return [], 0
+    visited.add(offset)
+    entries, next_offset = tiff.read_ifd(offset)
+
+    patches = []
+    removed = 0
+    kept = []
+    for entry in entries:
+        if entry[0] in drop_tags:
+            patches.extend(_tiff_blank_patches(tiff, *entry[:4], visited))
+        else:
+            kept.append(entry)
+            if entry[0] in (TIFF_EXIF_IFD, TIFF_INTEROP_IFD):
+                sub_patches, sub_removed = _plan_ifd_scrub(tiff, entry[3], drop_tags, visited)
+                patches.extend(sub_patches)
+                removed += sub_removed
+    removed += len(entries) - len(kept)
+
+    cut = cut_chain and next_offset
+    if cut:
+        patches.extend(_tiff_blank_chain(tiff, next_offset, visited))
+        next_offset = 0
+        removed += 1
+    if cut or len(kept) != len(entries):
+        patches.append(_tiff_ifd_patch(tiff, offset, entries, kept, next_offset))
+    return patches, removed
+
+
+def _tiff_data_end(tiff, offset, visited):
+    """End of the last byte used by an IFD chain, its values and sub-IFDs"""
+    end = 0
+    while offset and offset not in visited:
+        visited.add(offset)
+        entries, next_offset = tiff.read_ifd(offset)
+        end = max(end, offset + tiff.ifd_size(len(entries)))
+        values = {}
+        for tag, field_type, count, value, _ in entries:
+            values[tag] = value
+            value_range = tiff.value_range(field_type, count, value)
+            if value_range:
+                end = max(end, value_range[0] + value_range[1])
+            if tag in TIFF_IFD_POINTERS:
+                end = max(end, _tiff_data_end(tiff, value, visited))
+        if TIFF_THUMBNAIL_OFFSET in values and TIFF_THUMBNAIL_LENGTH in values:
+            end = max(end, values[TIFF_THUMBNAIL_OFFSET] + values[TIFF_THUMBNAIL_LENGTH])
+        offset = next_offset
+    return end
+
+
+def scrub_exif_block(data, scrub):
+    """Apply an ExifScrubPolicy to an EXIF block (TIFF header onwards).
+
+    Entries are removed by rewriting IFDs where they are and zeroing the
+    dropped values, so offsets used by kept tags, MakerNotes included,
+    stay valid. A zeroed tail that nothing kept refers to, typically the
+    thumbnail, is cut off. Returns the new block.
+    """
+    tiff = TiffStructure(io.BytesIO(data))
+    patches, _ = _plan_ifd_scrub(tiff, tiff.first_ifd, scrub.drop_tags, set(),
+                                 cut_chain=scrub.drop_thumbnail)
+    if not patches:
+        return data
+
+    block = bytearray(data)
+    for offset, patch in patches:
+        block[offset:offset + len(patch)] = patch
+    scrubbed = TiffStructure(io.BytesIO(block))
+    end = _tiff_data_end(scrubbed, scrubbed.first_ifd, set())
+    return bytes(block[:max(end, len(block.rstrip(b'\x00')))])
+
+
+def _apply_patches(dst, base, patches):
+    """Write (offset, bytes) patches relative to base"""
+    for offset, data in patches:
+        dst.seek(base + offset)
+        dst.write(data)
+
+
+# Tags needed to reproduce the image itself; rebuild_tiff keeps only these
+TIFF_IMAGE_TAGS = {
+    254, 256, 257, 258, 259, 262, 266, 273, 274, 277, 278, 279, 282, 283, 284,
+    296, 317, 320, 322, 323, 324, 325, 338, 339, 347, 529, 530, 531, 532, 34675,
+}
+
+# (offsets tag, byte counts tag) pairs locating strip and tile data
+TIFF_DATA_TAGS = ((273, 279), (324, 325))
+
+TIFF_INTEGER_FORMATS = {3: 'H', 4: 'I', 13: 'I', 16: 'Q', 18: 'Q'}
+
+
+def _tiff_entry_bytes(tiff, field_type, count, value, raw_entry):
+    """Return the value bytes of an IFD entry, inline or out of line"""
+    value_range = tiff.value_range(field_type, count, value)
+    if value_range:
+        return tiff.read(*value_range)
+    size = TIFF_TYPE_SIZES.get(field_type, 1) * count
+    return raw_entry[-tiff.offset_size:][:size]
+
+
+def _tiff_integers(tiff, field_type, count, data):
+    """Decode an array of unsigned integers from IFD value bytes"""
+    fmt = TIFF_INTEGER_FORMATS.get(field_type)
+    if fmt is None:
+        raise MetadataFormatError(f"Unexpected TIFF field type {field_type} for an offset array")
+    return struct.unpack(f"{tiff.order}{count}{fmt}", data)
+
+
+def rebuild_tiff(src, dst):
+    """Write a new TIFF holding only the image-structure tags of src.
+
+    Every IFD in the main chain is rebuilt from the tags in TIFF_IMAGE_TAGS,
+    and its strips or tiles are streamed across one at a time, so memory
+    use is bounded by the largest strip rather than the image. Compressed
+    data is copied as-is. Returns the number of IFD entries dropped.
+    """
+    tiff = TiffStructure(src)
+    offset_type = 16 if tiff.offset_fmt == 'Q' else 4
+    start = dst.tell()
+
+    def pack(fmt, *values):
+        return struct.pack(tiff.order + fmt, *values)
+
+    def tell():
+        return dst.tell() - start
+
+    def align():
+        if tell() % 2:
+            dst.write(b'\x00')
+
+    # Header; the first IFD offset is patched once it is known
+    src.seek(0)
+    header = _read_exact(src, 16 if tiff.offset_fmt == 'Q' else 8)
+    dst.write(header)
+    pointer_pos = len(header) - tiff.offset_size
+
+    removed = 0
+    visited = set()
+    offset = tiff.first_ifd
+    while offset and offset not in visited:
+        visited.add(offset)
+        entries, next_offset = tiff.read_ifd(offset)
+        kept = {}
+        for tag, field_type, count, value, raw_entry in entries:
+            if tag in TIFF_IMAGE_TAGS:
+                kept[tag] = [field_type, count, _tiff_entry_bytes(tiff, field_type, count, value, raw_entry)]
+            else:
+                removed += 1
+
+        # Stream the image data and point the offset arrays at the copies
+        for offsets_tag, counts_tag in TIFF_DATA_TAGS:
+            if offsets_tag not in kept or counts_tag not in kept:
+                continue
+            offsets = _tiff_integers(tiff, *kept[offsets_tag])
+            byte_counts = _tiff_integers(tiff, *kept[counts_tag])
+            new_offsets = []
+            for data_offset, byte_count in zip(offsets, byte_counts):
+                if data_offset + byte_count > tiff.size:
+                    raise MetadataFormatError("TIFF image data points past the end of the file")
+                align()
+                new_offsets.append(tell())
+                src.seek(data_offset)
+                _copy_exact(src, dst, byte_count)
+            kept[offsets_tag] = [offset_type, len(new_offsets),
+                                 pack(f"{len(new_offsets)}{tiff.offset_fmt}", *new_offsets)]
+
+        # Out-of-line values, then the IFD itself
+        ifd_entries = []
+        for tag in sorted(kept):
+            field_type, count, data = kept[tag]
+            if len(data) > tiff.offset_size:
+                align()
+                value_field = pack(tiff.offset_fmt, tell())
+                dst.write(data)
+            else:
+                value_field = data.ljust(tiff.offset_size, b'\x00')
+            ifd_entries.append(pack(tiff.entry_fmt[:3], tag, field_type, count) + value_field)
+
+        align()
+        ifd_pos = tell()
+        dst.write(pack(tiff.count_fmt, len(ifd_entries)) + b''.join(ifd_entries))
+        next_pointer_pos = tell()
+        dst.write(bytes(tiff.offset_size))
+
+        # Link the new IFD into the chain
+        end = dst.tell()
+        dst.seek(start + pointer_pos)
+        dst.write(pack(tiff.offset_fmt, ifd_pos))
+        dst.seek(end)
+        pointer_pos = next_pointer_pos
+        offset = next_offset
+    return removed
+
+
+def strip_tiff(src, dst, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Copy a TIFF file and rewrite only its IFDs in the copy.
+
+    The source is copied block by block, then the planned IFD patches are
+    written over the copy. Image strips and tiles are never decoded or
+    moved. Returns the number of IFD entries that were removed.
+
+    If the metadata cannot be patched out (for example a damaged EXIF
+    sub-IFD), the file is rebuilt strip by strip with rebuild_tiff instead.
+    Like the decode fallback it replaces, that keeps image tags only.
+    """
+    try:
+        patches, removed = plan_tiff_strip(TiffStructure(src), remove_exif, remove_iptc, remove_xmp,
+                                           scrub)
+    except MetadataFormatError:
+        return rebuild_tiff(src, dst)
+    src.seek(0)
+    start = dst.tell()
+    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+    end = dst.tell()
+    _apply_patches(dst, start, patches)
+    dst.seek(end)
+    return removed
+
+
+def strip_tiff_in_place(path, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Remove metadata from a TIFF file by patching its IFDs where they are.
+
+    All patches are planned before anything is written, so a parse error
+    leaves the file untouched. Returns the number of IFD entries removed.
+    """
+    with open(path, 'r+b') as f:
+        patches, removed = plan_tiff_strip(TiffStructure(f), remove_exif, remove_iptc, remove_xmp,
+                                           scrub)
+        _apply_patches(f, 0, patches)
+    return removed
+
+
+# ---------------------------------------------------------------------------
+# Header probes
+# ---------------------------------------------------------------------------
+
+# Bytes of a segment or chunk payload needed to classify it
+PROBE_PREFIX_SIZE = 80
+
+
+def _read_prefix(src, size):
+    """Read the start of a size-byte payload and seek past the rest"""
+    prefix = _read_exact(src, min(size, PROBE_PREFIX_SIZE))
+    src.seek(size - len(prefix), os.SEEK_CUR)
+    return prefix
+
+
+def probe_jpeg(src):
+    """Return the metadata kinds in the JPEG segments in front of the first scan"""
+    if _read_exact(src, 2) != b'\xff\xd8':
+        raise MetadataFormatError("Not a JPEG file (missing SOI marker)")
+
+    kinds = set()
+    while True:
+        marker = _next_jpeg_marker(src)
+        if marker in JPEG_STANDALONE_MARKERS:
+            if marker == JPEG_EOI:
+                return kinds
+            continue
+        if marker == JPEG_SOS:
+            return kinds
+
+        length = struct.unpack('>H', _read_exact(src, 2))[0]
+        if length < 2:
+            raise MetadataFormatError(f"Invalid length for JPEG marker 0x{marker:02X}")
+        kind = classify_jpeg_segment(marker, _read_prefix(src, length - 2))
+        if kind:
+            kinds.add(kind)
+
+
+def probe_png(src):
+    """Return the metadata kinds in a PNG's chunk table, skipping chunk data.
+
+    Text chunks may follow IDAT, so the walk continues to IEND; only the
+    8-byte chunk headers and the keywords of metadata chunks are read.
+    """
+    if _read_exact(src, 8) != PNG_SIGNATURE:
+        raise MetadataFormatError("Not a PNG file (bad signature)")
+
+    kinds = set()
+    while True:
+        length, chunk_type = struct.unpack('>I4s', _read_exact(src, 8))
+        if chunk_type == b'IEND':
+            return kinds
+        if chunk_type in PNG_METADATA_CHUNKS:
+            kinds.add(classify_png_chunk(chunk_type, _read_prefix(src, length)))
+            src.seek(4, os.SEEK_CUR)
+        else:
+            src.seek(length + 4, os.SEEK_CUR)
+
+
+def probe_webp(src):
+    """Return the metadata kinds in a WebP's RIFF chunk table"""
+    riff, riff_size, form = struct.unpack('<4sI4s', _read_exact(src, 12))
+    if riff != b'RIFF' or form != b'WEBP':
+        raise MetadataFormatError("Not a WebP file (bad RIFF header)")
+
+    kinds = set()
+    remaining = riff_size - 4
+    while remaining >= 8:
+        fourcc, size = struct.unpack('<4sI', _read_exact(src, 8))
+        padded = size + (size & 1)
+        if 8 + padded > remaining:
+            raise MetadataFormatError(f"WebP chunk {fourcc!r} runs past the end of the file")
+        remaining -= 8 + padded
+
+        kind = classify_webp_chunk(fourcc)
+        if kind:
+            kinds.add(kind)
+        src.seek(padded, os.SEEK_CUR)
+    return kinds
+
+
+def probe_tiff(src):
+    """Return the metadata kinds tagged in a TIFF's main IFD chain"""
+    tiff = TiffStructure(src)
+    kinds = set()
+    visited = set()
+    offset = tiff.first_ifd
+    while offset and offset not in visited:
+        visited.add(offset)
+        entries, offset = tiff.read_ifd(offset)
+        for entry in entries:
+            kind = classify_tiff_tag(entry[0])
+            if kind:
+                kinds.add(kind)
+    return kinds
+
+
+# Header probes by lowercase file extension
+PROBES = {
+    '.jpg': probe_jpeg,
+    '.jpeg': probe_jpeg,
+    '.png': probe_png,
+    '.webp': probe_webp,
+    '.tif': probe_tiff,
+    '.tiff': probe_tiff,
+}
+
+
+def supports_probe(ext):
+    """Check whether a file extension has a header-only metadata probe"""
+    return ext.lower() in PROBES
+
+
+def probe_file(path, src=None):
+    """Report which metadata kinds ('exif', 'iptc', 'xmp', 'comment') path holds.
+
+    Only the container's headers are read; image data is seeked over.
+    src, if given, is a binary stream of the file's contents read instead
+    of opening path. The kinds match what the lossless strippers would
+    find. Raises MetadataFormatError if the container cannot be parsed.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    probe = PROBES.get(ext)
+    if probe is None:
+        raise MetadataFormatError(f"No header probe for {ext} files")
+    if src is not None:
+        return probe(src)
+    with open(path, 'rb') as src:
+        return probe(src)
+
+
+def needs_stripping(kinds, remove_exif=True, remove_iptc=True, remove_xmp=True):
+    """Check whether any of the probed kinds would be removed by the toggles"""
+    return any(_should_drop(kind, remove_exif, remove_iptc, remove_xmp) for kind in kinds)
+
+
+# ---------------------------------------------------------------------------
+# Header-only metadata reads
+# ---------------------------------------------------------------------------
+
+# Photoshop image resource holding the IPTC-IIM record
+PHOTOSHOP_IPTC_RESOURCE = 0x0404
+
+# Names of the IPTC-IIM application record (record 2) datasets
+IPTC_DATASETS = {
+    5: 'ObjectName', 7: 'EditStatus', 10: 'Urgency', 15: 'Category',
+    20: 'SupplementalCategories', 22: 'FixtureIdentifier', 25: 'Keywords',
+    26: 'ContentLocationCode', 27: 'ContentLocationName', 30: 'ReleaseDate',
+    35: 'ReleaseTime', 40: 'SpecialInstructions', 55: 'DateCreated', 60: 'TimeCreated',
+    62: 'DigitalCreationDate', 63: 'DigitalCreationTime', 65: 'OriginatingProgram',
+    70: 'ProgramVersion', 80: 'By-line', 85: 'By-lineTitle', 90: 'City', 92: 'Sub-location',
+    95: 'Province-State', 100: 'Country-PrimaryLocationCode', 101: 'Country-PrimaryLocationName',
+    103: 'OriginalTransmissionReference', 105: 'Headline', 110: 'Credit', 115: 'Source',
+    116: 'CopyrightNotice', 118: 'Contact', 120: 'Caption-Abstract', 122: 'Writer-Editor',
+}
+
+# Element and attribute names in an XMP packet; group 1 or 2 is the name
+XMP_NAME = re.compile(rb'<([A-Za-z][\w.-]*:[A-Za-z][\w.-]*)(?=[\s/>])'
+                      rb'|\s([A-Za-z][\w.-]*:[A-Za-z][\w.-]*)\s*=\s*["\']')
+
+# Prefixes of XMP names that are packet structure, not properties
+XMP_STRUCTURE_PREFIXES = ('rdf:', 'x:', 'xmlns:', 'xml:')
+
+
+class MetadataBlocks:
+    """Raw metadata blocks found in a file's headers.
+
+    exif is a TiffStructure over the EXIF block (over the file itself for
+    TIFF files), xmp the main XMP packet, iptc the IPTC-IIM records and
+    comments the text of comment segments and chunks. kinds holds every
+    metadata kind seen, as probe_file would report them, even for blocks
+    that could not be decoded.
+    """
+
+    def __init__(self):
+        self.exif = None
+        self.xmp = None
+        self.iptc = None
+        self.comments = []
+        self.kinds = set()
+
+
+def _exif_structure(payload):
+    """TiffStructure over an EXIF payload, or None if it is not valid TIFF"""
+    if payload.startswith(EXIF_HEADER):
+        payload = payload[len(EXIF_HEADER):]
+    try:
+        return TiffStructure(io.BytesIO(payload))
+    except MetadataFormatError:
+        return None
+
+
+# Names of the sub-IFDs reached from the main IFD chain
+TIFF_SUB_IFD_NAMES = {TIFF_EXIF_IFD: 'Exif', TIFF_GPS_IFD: 'GPS', TIFF_INTEROP_IFD: 'Interop'}
+
+
+def iter_exif_entries(tiff):
+    """Yield (ifd, entry) for the main IFD chain and its Exif, GPS and Interop IFDs.
+
+    ifd is 'IFD0', 'IFD1', ... or a TIFF_SUB_IFD_NAMES name, and entry is
+    (tag, type, count, value, raw_entry) as from TiffStructure.read_ifd.
+    Each IFD is read once even if it is referenced more than once;
+    unreadable sub-IFDs are skipped.
+    """
+    visited = set()
+    offset, index = tiff.first_ifd, 0
+    while offset and offset not in visited:
+        visited.add(offset)
+        entries, next_offset = tiff.read_ifd(offset)
+        stack = [(f"IFD{index}", entries)]
+        while stack:
+            name, entries = stack.pop()
+            for entry in entries:
+                yield name, entry
+                sub_name = TIFF_SUB_IFD_NAMES.get(entry[0])
+                if sub_name and entry[3] and entry[3] not in visited:
+                    visited.add(entry[3])
+                    try:
+                        stack.append((sub_name, tiff.read_ifd(entry[3])[0]))
+                    except MetadataFormatError:
+                        pass
+        offset, index = next_offset, index + 1
+
+
+def read_tiff_value(tiff, entry):
+    """Return the value bytes of an IFD entry from iter_exif_entries"""
+    tag, field_type, count, value, raw_entry = entry
+    return _tiff_entry_bytes(tiff, field_type, count, value, raw_entry)
+
+
+def exif_thumbnail(tiff):
+    """Return the JPEG thumbnail embedded in an EXIF block's IFD1, or None"""
+    values = {}
+    for ifd, entry in iter_exif_entries(tiff):
+        if ifd == 'IFD1' and entry[0] in (TIFF_THUMBNAIL_OFFSET, TIFF_THUMBNAIL_LENGTH):
+            values[entry[0]] = entry[3]
+    start, size = values.get(TIFF_THUMBNAIL_OFFSET), values.get(TIFF_THUMBNAIL_LENGTH)
+    if not start or not size or start + size > tiff.size:
+        return None
+    data = tiff.read(start, size)
+    return data if data.startswith(b'\xff\xd8') else None
+
+
+# struct formats of the numeric TIFF field types; rationals are pairs
+TIFF_VALUE_FORMATS = {1: 'B', 3: 'H', 4: 'I', 5: 'II', 6: 'b', 8: 'h', 9: 'i', 10: 'ii',
+                      11: 'f', 12: 'd', 13: 'I', 16: 'Q', 17: 'q', 18: 'Q'}
+TIFF_RATIONAL_TYPES = {5, 10}
+
+
+def decode_tiff_value(tiff, entry):
+    """Return the Python value of an IFD entry from iter_exif_entries.
+
+    ASCII values are returned as str and UNDEFINED values as bytes.
+    Numbers, including BYTE values such as GPSVersionID, are returned as
+    int; rationals and floating point types as float. A count other than
+    1 gives a tuple of them.
+    """
+    tag, field_type, count, value, raw_entry = entry
+    data = read_tiff_value(tiff, entry)
+    if field_type == 2:
+        return data.rstrip(b'\x00').decode('utf-8', 'replace')
+    fmt = TIFF_VALUE_FORMATS.get(field_type)
+    if fmt is None:
+        return bytes(data)
+
+    numbers = struct.unpack(f"{tiff.order}{count * len(fmt)}{fmt[0]}", data)
+    if field_type in TIFF_RATIONAL_TYPES:
+        numbers = tuple(num / den if den else float('nan')
+                        for num, den in zip(numbers[::2], numbers[1::2]))
+    return numbers[0] if len(numbers) == 1 else numbers
+
+
+def photoshop_iptc(data):
+    """Return the IPTC-IIM bytes in a run of Photoshop image resource blocks"""
+    found = []
+    pos = 0
+    while pos + 12 <= len(data) and data[pos:pos + 4] == b'8BIM':
+        resource = struct.unpack_from('>H', data, pos + 4)[0]
+        # Pascal name: length byte and name, padded to an even size
+        pos += 6 + ((data[pos + 6] + 2) & ~1)
+        if pos + 4 > len(data):
+            break
+        size = struct.unpack_from('>I', data, pos)[0]
+        pos += 4
+        if resource == PHOTOSHOP_IPTC_RESOURCE:
+            found.append(bytes(data[pos:pos + size]))
+        pos += size + (size & 1)
+    return b''.join(found)
+
+
+def iter_iptc_records(data):
+    """Yield (record, dataset, value bytes) for each IPTC-IIM dataset in data"""
+    pos = 0
+    while pos + 5 <= len(data) and data[pos] == 0x1C:
+        record, dataset, size = struct.unpack_from('>BBH', data, pos + 1)
+        pos += 5
+        if size & 0x8000:
+            # Extended dataset: the low bits give the size of the length field
+            length_size = size & 0x7FFF
+            size = int.from_bytes(data[pos:pos + length_size], 'big')
+            pos += length_size
+        yield record, dataset, bytes(data[pos:pos + size])
+        pos += size
+
+
+def iptc_dataset_name(record, dataset):
+    """Readable name of an IPTC-IIM dataset"""
+    if record == 2 and dataset in IPTC_DATASETS:
+        return IPTC_DATASETS[dataset]
+    return f"{record}:{dataset}"
+
+
+def xmp_property_names(packet):
+    """Return the property names ('ns:Name') used in an XMP packet, in order"""
+    names = {}
+    for match in XMP_NAME.finditer(packet):
+        name = (match.group(1) or match.group(2)).decode('ascii', 'replace')
+        if not name.startswith(XMP_STRUCTURE_PREFIXES):
+            names[name] = None
+    return list(names)
+
+
+def iptc_values(data):
+    """Return {dataset name: value} for the IPTC-IIM records in data.
+
+    Values are decoded as UTF-8, falling back to Latin-1. Repeated
+    datasets such as Keywords give a list of their values.
+    """
+    values = {}
+    for record, dataset, raw in iter_iptc_records(data):
+        if not dataset:
+            # Record version numbers are binary and not interesting
+            continue
+        try:
+            text = raw.decode('utf-8')
+        except UnicodeDecodeError:
+            text = raw.decode('latin-1')
+        name = iptc_dataset_name(record, dataset)
+        if name not in values:
+            values[name] = text
+        elif isinstance(values[name], list):
+            values[name].append(text)
+        else:
+            values[name] = [values[name], text]
+    return values
+
+
+RDF_NS = '{http://www.w3.org/1999/02/22-rdf-syntax-ns#}'
+XML_NS = '{http://www.w3.org/XML/1998/namespace}'
+RDF_CONTAINERS = {RDF_NS + 'Bag', RDF_NS + 'Seq', RDF_NS + 'Alt'}
+
+
+def _xmp_fields(description, prefix, properties, qname):
+    """Record the properties of an rdf:Description or struct under prefix"""
+    for attribute, value in description.attrib.items():
+        if attribute.startswith('{') and not attribute.startswith((RDF_NS, XML_NS)):
+            properties[prefix + qname(attribute)] = value
+    for element in description:
+        _xmp_property(element, prefix + qname(element.tag), properties, qname)
+
+
+def _xmp_property(element, name, properties, qname):
+    resource = element.get(RDF_NS + 'resource')
+    children = list(element)
+    if resource is not None:
+        properties[name] = resource
+    elif not children:
+        properties[name] = (element.text or '').strip()
+        # Struct fields written as attributes of an empty element
+        _xmp_fields(element, name + '/', properties, qname)
+    elif children[0].tag in RDF_CONTAINERS:
+        properties[name] = [(item.text or '').strip() for item in children[0]
+                            if item.tag == RDF_NS + 'li']
+    elif children[0].tag == RDF_NS + 'Description':
+        _xmp_fields(children[0], name + '/', properties, qname)
+    else:
+        # rdf:parseType="Resource" struct
+        _xmp_fields(element, name + '/', properties, qname)
+
+
+def xmp_properties(packet):
+    """Return {'ns:Name': value} for the properties of an XMP packet.
+
+    Simple values are str, arrays (rdf:Bag, Seq and Alt) lists of their
+    items, and struct fields are named 'ns:Struct/ns:Field'. A packet
+    that is not well-formed XML falls back to xmp_property_names with
+    empty values.
+    """
+    prefixes = {}
+    try:
+        events = ElementTree.iterparse(io.BytesIO(bytes(packet).strip(b'\x00 \t\r\n')),
+                                       events=('start-ns',))
+        for _, (prefix, uri) in events:
+            prefixes.setdefault(uri, prefix)
+        root = events.root
+    except ElementTree.ParseError:
+        return dict.fromkeys(xmp_property_names(packet), '')
+
+    def qname(tag):
+        if not tag.startswith('{'):
+            return tag
+        uri, _, local = tag[1:].partition('}')
+        return f"{prefixes.get(uri, uri)}:{local}"
+
+    properties = {}
+    for rdf in root.iter(RDF_NS + 'RDF'):
+        for description in rdf:
+            if description.tag == RDF_NS + 'Description':
+                _xmp_fields(description, '', properties, qname)
+    return properties
+
+
+def png_text(chunk_type, data):
+    """Return the text of a tEXt, zTXt or iTXt chunk as bytes"""
+    keyword, _, rest = data.partition(b'\x00')
+    try:
+        if chunk_type == b'tEXt':
+            return rest
+        if chunk_type == b'zTXt':
+            return zlib.decompress(rest[1:])
+        compressed = rest[:1] == b'\x01'
+        # Skip the compression method, language tag and translated keyword
+        text = rest[2:].split(b'\x00', 2)[-1]
+        return zlib.decompress(text) if compressed else text
+    except zlib.error:
+        raise MetadataFormatError(f"Corrupt compressed PNG text chunk {keyword!r}")
+
+
+def raw_profile(text):
+    """Decode the text of a raw profile chunk into the profile's bytes.
+
+    The text is a newline, the profile type, its length in bytes and the
+    bytes in hex, spread over lines. Raises MetadataFormatError if it is
+    malformed.
+    """
+    parts = text.split(None, 2)
+    if len(parts) != 3 or not parts[1].isdigit():
+        raise MetadataFormatError("Malformed PNG raw profile header")
+    length = int(parts[1])
+    try:
+        payload = bytes.fromhex(parts[2].decode('ascii'))
+    except (UnicodeDecodeError, ValueError):
+        raise MetadataFormatError("Malformed PNG raw profile data")
+    if len(payload) < length:
+        raise MetadataFormatError("PNG raw profile is shorter than its length")
+    return payload[:length]
+
+
+def read_jpeg_metadata(src):
+    """Collect the metadata segments in front of a JPEG's first scan"""
+    if _read_exact(src, 2) != b'\xff\xd8':
+        raise MetadataFormatError("Not a JPEG file (missing SOI marker)")
+
+    blocks = MetadataBlocks()
+    while True:
+        marker = _next_jpeg_marker(src)
+        if marker in JPEG_STANDALONE_MARKERS:
+            if marker == JPEG_EOI:
+                return blocks
+            continue
+        if marker == JPEG_SOS:
+            return blocks
+
+        length = struct.unpack('>H', _read_exact(src, 2))[0]
+        if length < 2:
+            raise MetadataFormatError(f"Invalid length for JPEG marker 0x{marker:02X}")
+        if marker not in (JPEG_APP1, JPEG_APP13, JPEG_COM):
+            src.seek(length - 2, os.SEEK_CUR)
+            continue
+
+        payload = _read_exact(src, length - 2)
+        kind = classify_jpeg_segment(marker, payload)
+        if kind:
+            blocks.kinds.add(kind)
+        if kind == 'exif' and blocks.exif is None:
+            blocks.exif = _exif_structure(payload)
+        elif kind == 'xmp' and payload.startswith(XMP_HEADER) and blocks.xmp is None:
+            blocks.xmp = payload[len(XMP_HEADER):]
+        elif kind == 'iptc' and payload.startswith(PHOTOSHOP_HEADER):
+            blocks.iptc = (blocks.iptc or b'') + photoshop_iptc(payload[len(PHOTOSHOP_HEADER):])
+        elif kind == 'comment':
+            blocks.comments.append(payload)
+
+
+def read_png_metadata(src):
+    """Collect the metadata chunks of a PNG, seeking over image data.
+
+    Raw profile text chunks are decoded, so EXIF and IPTC kept that way
+    are read like eXIf chunks and Photoshop resources.
+    """
+    if _read_exact(src, 8) != PNG_SIGNATURE:
+        raise MetadataFormatError("Not a PNG file (bad signature)")
+
+    blocks = MetadataBlocks()
+    while True:
+        length, chunk_type = struct.unpack('>I4s', _read_exact(src, 8))
+        if chunk_type == b'IEND':
+            return blocks
+        if chunk_type not in PNG_METADATA_CHUNKS:
+            src.seek(length + 4, os.SEEK_CUR)
+            continue
+
+        data = _read_exact(src, length)
+        src.seek(4, os.SEEK_CUR)
+        kind = classify_png_chunk(chunk_type, data)
+        blocks.kinds.add(kind)
+        if chunk_type == b'eXIf' and blocks.exif is None:
+            blocks.exif = _exif_structure(data)
+        elif kind == 'xmp' and data.startswith(b'XML:com.adobe.xmp\x00') and blocks.xmp is None:
+            blocks.xmp = png_text(chunk_type, data)
+        elif kind == 'comment':
+            blocks.comments.append(png_text(chunk_type, data))
+        elif data.startswith(RAW_PROFILE_PREFIX):
+            try:
+                payload = raw_profile(png_text(chunk_type, data))
+            except MetadataFormatError:
+                continue  # Still listed in kinds
+            if kind == 'exif' and blocks.exif is None:
+                blocks.exif = _exif_structure(payload)
+            elif kind == 'iptc':
+                # "8bim" profiles, and most "iptc" ones, hold Photoshop resources
+                if payload.startswith(b'8BIM'):
+                    payload = photoshop_iptc(payload)
+                blocks.iptc = (blocks.iptc or b'') + payload
+            elif kind == 'xmp' and blocks.xmp is None:
+                blocks.xmp = payload
+
+
+def read_webp_metadata(src):
+    """Collect the EXIF and XMP chunks of a WebP, seeking over image data"""
+    riff, riff_size, form = struct.unpack('<4sI4s', _read_exact(src, 12))
+    if riff != b'RIFF' or form != b'WEBP':
+        raise MetadataFormatError("Not a WebP file (bad RIFF header)")
+
+    blocks = MetadataBlocks()
+    remaining = riff_size - 4
+    while remaining >= 8:
+        fourcc, size = struct.unpack('<4sI', _read_exact(src, 8))
+        padded = size + (size & 1)
+        if 8 + padded > remaining:
+            raise MetadataFormatError(f"WebP chunk {fourcc!r} runs past the end of the file")
+        remaining -= 8 + padded
+
+        kind = classify_webp_chunk(fourcc)
+        if kind is None:
+            src.seek(padded, os.SEEK_CUR)
+            continue
+        blocks.kinds.add(kind)
+        data = _read_exact(src, size)
+        src.seek(padded - size, os.SEEK_CUR)
+        if kind == 'exif' and blocks.exif is None:
+            blocks.exif = _exif_structure(data)
+        elif kind == 'xmp' and blocks.xmp is None:
+            blocks.xmp = data
+    return blocks
+
+
+def read_tiff_metadata(src):
+    """Collect the metadata of a TIFF, whose IFDs are themselves the EXIF block.
+
+    src must stay open while blocks.exif is used.
+    """
+    tiff = TiffStructure(src)
+    blocks = MetadataBlocks()
+    blocks.exif = tiff
+    if not tiff.first_ifd:
+        return blocks
+
+    entries, _ = tiff.read_ifd(tiff.first_ifd)
+    for tag, field_type, count, value, raw_entry in entries:
+        kind = classify_tiff_tag(tag)
+        if kind:
+            blocks.kinds.add(kind)
+        if tag == TIFF_XMP:
+            blocks.xmp = _tiff_entry_bytes(tiff, field_type, count, value, raw_entry)
+        elif tag == TIFF_IPTC:
+            blocks.iptc = _tiff_entry_bytes(tiff, field_type, count, value, raw_entry)
+        elif tag == TIFF_PHOTOSHOP and blocks.iptc is None:
+            resources = _tiff_entry_bytes(tiff, field_type, count, value, raw_entry)
+            blocks.iptc = photoshop_iptc(resources) or None
+    return blocks
+
+
+# Header-only metadata readers by lowercase file extension
+METADATA_READERS = {
+    '.jpg': read_jpeg_metadata,
+    '.jpeg': read_jpeg_metadata,
+    '.png': read_png_metadata,
+    '.webp': read_webp_metadata,
+    '.tif': read_tiff_metadata,
+    '.tiff': read_tiff_metadata,
+}
+
+
+def read_metadata(ext, src):
+    """Read the metadata blocks of an open file with the given extension.
+
+    Only metadata segments and chunks are read; image data is seeked
+    over. Raises MetadataFormatError for unsupported or unparsable files.
+    """
+    reader = METADATA_READERS.get(ext.lower())
+    if reader is None:
+        raise MetadataFormatError(f"No metadata reader for {ext} files")
+    return reader(src)
+
+
+# ---------------------------------------------------------------------------
+# Dispatch
+# ---------------------------------------------------------------------------
+
+# Lossless strippers by lowercase file extension
+LOSSLESS_STRIPPERS = {
+    '.jpg': strip_jpeg,
+    '.jpeg': strip_jpeg,
+    '.png': strip_png,
+    '.webp': strip_webp,
+    '.tif': strip_tiff,
+    '.tiff': strip_tiff,
+}
+
+# Strippers that can rewrite a file where it is, by lowercase file extension
+IN_PLACE_STRIPPERS = {
+    '.tif': strip_tiff_in_place,
+    '.tiff': strip_tiff_in_place,
+}
+
+
+# Lossless EXIF writers by lowercase file extension
+EXIF_INJECTORS = {
+    '.jpg': inject_jpeg_exif,
+    '.jpeg': inject_jpeg_exif,
+    '.png': inject_png_exif,
+}
+
+
+def supports_lossless(ext):
+    """Check whether a file extension has a container-level stripper"""
+    return ext.lower() in LOSSLESS_STRIPPERS
+
+
+def supports_exif_injection(ext):
+    """Check whether a file extension can be given new EXIF without decoding"""
+    return ext.lower() in EXIF_INJECTORS
+
+
+def supports_in_place(ext):
+    """Check whether a file extension can be cleaned without a full copy"""
+    return ext.lower() in IN_PLACE_STRIPPERS
+
+
+def strip_file_in_place(path, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Strip metadata from path by patching it in place.
+
+    scrub is an optional ExifScrubPolicy applied to the EXIF that is
+    kept. Returns the number of metadata blocks removed. Raises
+    MetadataFormatError, before anything is written, if the file cannot
+    be parsed.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    stripper = IN_PLACE_STRIPPERS.get(ext)
+    if stripper is None:
+        raise MetadataFormatError(f"No in-place stripper for {ext} files")
+    return stripper(path, remove_exif=remove_exif, remove_iptc=remove_iptc, remove_xmp=remove_xmp,
+                    scrub=scrub)
+
+
+def strip_stream(ext, src, dst, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Strip metadata from the binary stream src of a file with extension ext.
+
+    Like strip_file, for callers that already hold the file's contents.
+    dst must be seekable. Returns the number of metadata blocks removed.
+    """
+    stripper = LOSSLESS_STRIPPERS.get(ext.lower())
+    if stripper is None:
+        raise MetadataFormatError(f"No lossless stripper for {ext.lower()} files")
+    return stripper(src, dst,
+                    remove_exif=remove_exif,
+                    remove_iptc=remove_iptc,
+                    remove_xmp=remove_xmp,
+                    scrub=scrub)
+
+
+def strip_file(src_path, dst_path, remove_exif=True, remove_iptc=True, remove_xmp=True, scrub=None):
+    """Strip metadata from src_path into dst_path without decoding the image.
+
+    scrub is an optional ExifScrubPolicy applied to the EXIF that is
+    kept. Returns the number of metadata blocks removed. Raises
+    MetadataFormatError if the container cannot be parsed; the partially
+    written destination is removed in that case.
+    """
+    ext = os.path.splitext(src_path)[1].lower()
+    if ext not in LOSSLESS_STRIPPERS:
+        raise MetadataFormatError(f"No lossless stripper for {ext} files")
+
+    try:
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            return strip_stream(ext, src, dst,
+                                remove_exif=remove_exif,
+                                remove_iptc=remove_iptc,
+                                remove_xmp=remove_xmp,
+                                scrub=scrub)
+    except Exception:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        raise
+
+
+def inject_exif_stream(ext, src, dst, exif_blob, remove_iptc=True, remove_xmp=True):
+    """Replace the EXIF of the binary stream src of a file with extension ext.
+
+    Like inject_exif_file, for callers that already hold the file's
+    contents. Returns the number of metadata blocks removed.
+    """
+    injector = EXIF_INJECTORS.get(ext.lower())
+    if injector is None:
+        raise MetadataFormatError(f"No lossless EXIF writer for {ext.lower()} files")
+    return injector(src, dst, exif_blob, remove_iptc=remove_iptc, remove_xmp=remove_xmp)
+
+
+def inject_exif_file(src_path, dst_path, exif_blob, remove_iptc=True, remove_xmp=True):
+    """Copy src_path to dst_path with its EXIF replaced by exif_blob.
+
+    The image data is not decoded. Returns the number of metadata blocks
+    removed. Raises MetadataFormatError if the container cannot be parsed;
+    the partially written destination is removed in that case.
+    """
+    ext = os.path.splitext(src_path)[1].lower()
+    if ext not in EXIF_INJECTORS:
+        raise MetadataFormatError(f"No lossless EXIF writer for {ext} files")
+
+    try:
+        with open(src_path, 'rb') as src, open(dst_path, 'wb') as dst:
+            return inject_exif_stream(ext, src, dst, exif_blob,
+                                      remove_iptc=remove_iptc,
+                                      remove_xmp=remove_xmp)
+    except Exception:
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        raise
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Incremental run manifest for MetadataManager
+
+Records every file that was processed successfully in a small SQLite
+database, keyed by absolute path and the fingerprint of the settings used.
+On the next run a file whose size and mtime_ns still match its record is
+skipped after a single stat and an indexed lookup. If only the mtime
+changed, the content hash decides. A file whose separate output was
+recorded is only skipped while that output still exists with the
+recorded size, so a deleted or moved output is made again.
+
+This module must not import tkinter so it can be used from the CLI.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+
+# Bump when processing changes enough that earlier runs should not count
+MANIFEST_VERSION = 1
+
+# Bytes read per step when hashing file contents
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Records written between commits
+COMMIT_INTERVAL = 256
+
+# Settings that change how a batch runs but not the files it writes
+OUTPUT_NEUTRAL_SETTINGS = ('create_backup', 'backup_mode', 'durability')
+
+
+def default_manifest_path():
+    """Per-user manifest location used by the GUI"""
+    return os.path.join(os.path.expanduser("~"), ".metadatamanager", "manifest.sqlite3")
+
+
+def settings_fingerprint(settings):
+    """Stable hash of the settings that affect a file's output.
+
+    OUTPUT_NEUTRAL_SETTINGS are left out, so toggling them keeps the
+    manifest records and checkpoints made under the other settings.
+    """
+    relevant = {key: value for key, value in settings.items()
+                if key not in OUTPUT_NEUTRAL_SETTINGS}
+    payload = json.dumps({'version': MANIFEST_VERSION, 'settings': relevant},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_digest(path):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_state(path, data=None):
+    """(size, mtime_ns, digest) of a file as it is now on disk.
+
+    data, if given, is the file's current contents, hashed instead of
+    reading the file again.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha256(data).hexdigest() if data is not None else file_digest(path)
+    return stat.st_size, stat.st_mtime_ns, digest
+
+
+def manifest_key(path):
+    """Normalised path used as the manifest key"""
+    return os.path.normcase(os.path.abspath(path))
+
+
+class RunManifest:
+    """SQLite record of files already processed with a given set of settings"""
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.fingerprint = settings_fingerprint(settings)
+        self.pending = 0
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " digest TEXT NOT NULL,"
+            " output TEXT,"
+            " output_size INTEGER,"
+            " PRIMARY KEY (path, fingerprint))")
+        self.connection.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def is_unchanged(self, path):
+        """True if path is unchanged since it was last processed successfully.
+
+        The output recorded for it, if any, must still exist with its
+        recorded size.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, digest, output, output_size FROM files"
+            " WHERE path = ? AND fingerprint = ?",
+            (manifest_key(path), self.fingerprint)).fetchone()
+        if row is None or row[0] != stat.st_size:
+            return False
+        size, mtime_ns, digest, output, output_size = row
+        if output is not None:
+            try:
+                if os.stat(output).st_size != output_size:
+                    return False
+            except OSError:
+                return False
+        if mtime_ns == stat.st_mtime_ns:
+            return True
+
+        # Touched but possibly not modified: let the content decide
+        if file_digest(path) != digest:
+            return False
+        self.record(path, (stat.st_size, stat.st_mtime_ns, digest), output)
+        return True
+
+    def record(self, path, state, output=None):
+        """Remember the (size, mtime_ns, digest) of a successfully processed file.
+
+        output is the separate file written for it, if any; its current
+        size is recorded with it. Nothing is recorded if it is missing.
+        """
+        size, mtime_ns, digest = state
+        output_size = None
+        if output is not None:
+            try:
+                output_size = os.stat(output).st_size
+            except OSError:
+                return
+        self.connection.execute(
+            "INSERT OR REPLACE INTO files"
+            " (path, fingerprint, size, mtime_ns, digest, output, output_size)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (manifest_key(path), self.fingerprint, size, mtime_ns, digest, output, output_size))
+        self.pending += 1
+        if self.pending >= COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        """Flush pending records to disk"""
+        self.connection.commit()
+        self.pending = 0
+
+    def close(self):
+        """Commit pending records and close the database"""
+        if self.connection is not None:
+            self.commit()
+            self.connection.close()
+            self.connection = None
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Per-stage timing instrumentation for MetadataManager
+
+Each processed file carries a FileMetrics record of how long it spent in
+each stage (probe, backup, strip, open, decode, process, encode, rename,
+...) and how many bytes it read and wrote. Records are small plain dicts
+so they travel back from worker processes with the file's result. The
+parent folds them into a BatchMetrics, whose log-bucketed histograms give
+p50/p95/p99 per stage in constant memory.
+
+This module must not import tkinter so it can be used from worker
+processes and headless tools.
+"""
+
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+
+
+# Histogram buckets grow by 10% from one microsecond, so percentiles are
+# accurate to within 10% whatever the batch size
+HISTOGRAM_MIN = 1e-6
+HISTOGRAM_GROWTH = 1.1
+
+
+def default_metrics_dir():
+    """Per-user folder for exported batch timing reports"""
+    return os.path.join(os.path.expanduser("~"), ".metadatamanager", "metrics")
+
+
+class FileMetrics:
+    """Stage wall times and byte counts for one file"""
+
+    def __init__(self):
+        self.stages = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block; repeated stages for one file add up"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def add_bytes(self, read=0, written=0):
+        """Count bytes read from the source and written to the output"""
+        self.bytes_read += read
+        self.bytes_written += written
+
+    def merge(self, record):
+        """Add in a to_dict() record taken elsewhere, such as on a worker"""
+        for name, seconds in record['stages'].items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+        self.add_bytes(record['bytes_read'], record['bytes_written'])
+
+    def to_dict(self):
+        """Picklable, JSON-ready form sent back with the file's result"""
+        return {'stages': self.stages,
+                'bytes_read': self.bytes_read,
+                'bytes_written': self.bytes_written}
+
+
+class Histogram:
+    """Log-bucketed histogram of durations in seconds"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """Record one sample"""
+        if value <= HISTOGRAM_MIN:
+            index = 0
+        else:
+            index = int(math.log(value / HISTOGRAM_MIN, HISTOGRAM_GROWTH)) + 1
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile sample"""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(q / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return min(HISTOGRAM_MIN * HISTOGRAM_GROWTH ** index, self.max)
+        return self.max
+
+    def summary(self):
+        """Count, total, mean, p50/p95/p99 and max, in seconds"""
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+
+class BatchMetrics:
+    """Aggregates FileMetrics records from a whole batch"""
+
+    def __init__(self):
+        self.stages = {}
+        self.file_times = Histogram()
+        self.files = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def add(self, record):
+        """Fold in one file's FileMetrics.to_dict() record"""
+        if not record:
+            return
+        self.files += 1
+        self.bytes_read += record['bytes_read']
+        self.bytes_written += record['bytes_written']
+        for name, seconds in record['stages'].items():
+            self.stages.setdefault(name, Histogram()).add(seconds)
+        self.file_times.add(sum(record['stages'].values()))
+
+    def finish(self):
+        """Stop the batch wall clock"""
+        self.finished = time.perf_counter()
+
+    def to_dict(self):
+        """JSON-ready report of the batch"""
+        wall = (self.finished or time.perf_counter()) - self.started
+        return {
+            'files': self.files,
+            'wall_time': wall,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+            'per_file': self.file_times.summary(),
+            'stages': {name: histogram.summary() for name, histogram in self.stages.items()},
+        }
+
+    def format_table(self):
+        """Per-stage p50/p95/p99 in milliseconds, one line per stage"""
+        lines = [f"{'stage':<9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)"]
+        ordered = sorted(self.stages.items(), key=lambda item: -item[1].total)
+        for name, histogram in ordered + [('per file', self.file_times)]:
+            lines.append(f"{name:<9}" + "".join(
+                f"{histogram.percentile(q) * 1000:>9.1f}" for q in (50, 95, 99)))
+        return "\n".join(lines)
+
+    def export(self, path):
+        """Write the report as JSON to path"""
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Pipelined batch processing for MetadataManager
+
+On network shares a worker that reads, processes and writes each file in
+turn leaves the CPU idle while it waits on the share, and the share idle
+while it computes. PipelineEngine splits every file into three stages:
+
+    reader threads -> worker processes -> writer threads
+
+Readers prefetch whole files into memory, the worker pool transforms the
+bytes with metadata_engine.process_data, and writers create backups and
+commit the outputs through metadata_commit. The number of files in flight
+and the bytes they hold are both capped, so memory stays bounded however
+large the batch is: twice a file's size is reserved before its read is
+submitted, for the source and an output of about the same size, and the
+reservation is trued up to the actual output once it is processed and
+only released when the output is written.
+
+This module must not import tkinter so it can be used from headless tools.
+"""
+
+import os
+import shutil
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from metadata_commit import commit_file, new_temp_path
+from metadata_engine import (BatchEngine, create_backup, ignore_interrupts, output_path_for,
+                             pending_path, process_data, skipped_result)
+from metadata_manifest import file_state
+from metadata_metrics import FileMetrics
+
+
+# Reader and writer threads per batch; the stages are I/O bound, so these
+# do not depend on the number of CPU cores
+DEFAULT_READERS = 4
+DEFAULT_WRITERS = 4
+
+# Source and output bytes held in memory between the reader and writer stages
+DEFAULT_BUFFER_BYTES = 256 * 1024 * 1024
+
+
+def read_source(file_path, metrics):
+    """Reader stage: read a whole file into memory"""
+    with metrics.stage('read'):
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+
+def _write_bytes(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def write_result(file_path, data, result, settings, track_state, metrics, defer_commits=False):
+    """Writer stage: back up the source and commit the worker's output.
+
+    data is the source as read by the reader stage, so backups and copies
+    of clean files need no second read. Produces the same files and log
+    lines as process_single_file and keep_clean_file. Returns the result
+    without its 'output', with the file's 'state' added when track_state
+    is set and the deferred 'commits' listed as in process_file.
+    """
+    output = result.pop('output', None)
+    metrics.merge(result['metrics'])
+    log = result['log'].append
+    overwrite = settings['overwrite_original']
+    durability = settings.get('durability', 'none')
+    commits = [] if defer_commits else None
+    temp_path = None
+
+    try:
+        if not result['success']:
+            pass
+        elif output is None:
+            if overwrite:
+                log("  ✨ No metadata to remove, original left untouched")
+            else:
+                output_path = output_path_for(file_path, settings)
+                temp_path = new_temp_path(output_path)
+                with metrics.stage('copy'):
+                    _write_bytes(temp_path, data)
+                    shutil.copystat(file_path, temp_path)
+                    commit_file(temp_path, output_path, durability, commits)
+                temp_path = None
+                metrics.add_bytes(written=len(data))
+                log(f"  ✨ No metadata to remove, copied as is: {os.path.basename(output_path)}")
+        else:
+            output_path = file_path if overwrite else output_path_for(file_path, settings)
+            if settings['create_backup'] and not overwrite:
+                create_backup(file_path, settings, log, metrics, data)
+
+            temp_path = new_temp_path(output_path)
+            with metrics.stage('write'):
+                _write_bytes(temp_path, output)
+            with metrics.stage('rename'):
+                commit_file(temp_path, output_path, durability, commits)
+            temp_path = None
+
+            if overwrite:
+                action = "updated" if settings['advanced_mode'] else "cleaned"
+                log(f"  ✅ Original file {action}")
+            else:
+                action = "edited" if settings['advanced_mode'] else "clean"
+                log(f"  ✅ {action.title()} file saved: {os.path.basename(output_path)}")
+
+        if commits:
+            result['commits'] = commits
+        if track_state and result['success']:
+            try:
+                current = output if overwrite and output is not None else data
+                result['state'] = file_state(pending_path(file_path, commits), current)
+            except OSError:
+                pass
+    except Exception as e:
+        log(f"  ❌ Error: {str(e)}")
+        result['success'] = False
+        if temp_path and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    result['metrics'] = metrics.to_dict()
+    return result
+
+
+class PipelineEngine(BatchEngine):
+    """BatchEngine that overlaps reading, processing and writing.
+
+    Each file is read by a reader thread, transformed by a worker process
+    and committed by a writer thread, so reads, writes and CPU work on
+    different files proceed at the same time. At most jobs * queue_depth
+    files are in flight, and a file is only started once the bytes it
+    reserves for its source and output fit in buffer_bytes next to those
+    already held; a file larger than the whole budget runs alone.
+    Results are yielded in submission order, and the manifest, pausing
+    and checkpoints are handled as in BatchEngine.
+    """
+
+    def __init__(self, settings, jobs=None, manifest_path=None, readers=DEFAULT_READERS,
+                 writers=DEFAULT_WRITERS, buffer_bytes=DEFAULT_BUFFER_BYTES,
+                 checkpoint_path=None, control=None):
+        super().__init__(settings, jobs, manifest_path, checkpoint_path, control)
+        self.readers = max(1, readers)
+        self.writers = max(1, writers)
+        self.buffer_bytes = buffer_bytes
+        self.buffered = 0
+        self.buffered_lock = threading.Lock()
+
+    def _run(self, files, manifest):
+        """Run the batch through the three stages, consulting the manifest first"""
+        track_state = manifest is not None
+        window = self.jobs * self.queue_depth
+
+        workers = ProcessPoolExecutor(max_workers=self.jobs, initializer=ignore_interrupts)
+        with ThreadPoolExecutor(self.readers) as readers, workers, \
+                ThreadPoolExecutor(self.writers) as writers:
+            stages = (readers, workers, writers)
+            pending = deque()
+            for index, file_path in enumerate(files):
+                if self.control.stopping:
+                    yield from self._drain(pending)
+                    if not self.control.wait():
+                        break
+                if manifest and manifest.is_unchanged(file_path):
+                    future = Future()
+                    future.set_result(skipped_result(file_path))
+                else:
+                    size = self._reservation(file_path)
+                    # Finished files release their bytes before their results
+                    # are set, so the budget frees up as the oldest are collected
+                    while pending and not self._reserve(size):
+                        yield self._collect(*pending.popleft())
+                    if not pending:
+                        self._hold(size)
+                    future = self._submit(file_path, size, stages, track_state)
+                pending.append((index, file_path, future))
+                while len(pending) >= window:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+
+    @staticmethod
+    def _reservation(file_path):
+        """Bytes to reserve for file_path's source and output; 0 if it cannot be stat'ed"""
+        try:
+            return 2 * os.stat(file_path).st_size
+        except OSError:
+            return 0  # The reader reports the error
+
+    def _reserve(self, size):
+        """Hold size bytes if they fit in the budget; returns whether they did"""
+        with self.buffered_lock:
+            if self.buffered + size > self.buffer_bytes:
+                return False
+            self.buffered += size
+            return True
+
+    def _hold(self, size):
+        with self.buffered_lock:
+            self.buffered += size
+
+    def _release(self, size):
+        with self.buffered_lock:
+            self.buffered -= size
+
+    def _submit(self, file_path, reserved, stages, track_state):
+        """Send a file down the stages; returns a Future of its result.
+
+        reserved is the number of bytes already held for the file's source
+        and output; once it is processed the hold is set to the size of the
+        source and the actual output, and released when the write
+        finishes. Each stage hands the file to the next from its
+        completion callback, so no thread waits on another stage.
+        """
+        readers, workers, writers = stages
+        done = Future()
+        metrics = FileMetrics()
+
+        def fail(error, held):
+            self._release(held)
+            if not done.done():
+                done.set_exception(error)
+
+        def on_read(future):
+            try:
+                data = future.result()
+            except Exception as e:
+                fail(e, reserved)
+                return
+            try:
+                processed = workers.submit(process_data, file_path, data, self.settings)
+            except Exception as e:
+                fail(e, reserved)
+                return
+            processed.add_done_callback(lambda f: on_processed(f, data))
+
+        def on_processed(future, data):
+            held = reserved
+            try:
+                result = future.result()
+                output = result.get('output')
+                actual = len(data) + (len(output) if output is not None else 0)
+                self._hold(actual - held)
+                held = actual
+                written = writers.submit(write_result, file_path, data, result,
+                                         self.settings, track_state, metrics, self.defer_commits)
+            except Exception as e:
+                fail(e, held)
+                return
+            written.add_done_callback(lambda f: on_written(f, held))
+
+        def on_written(future, held):
+            self._release(held)
+            try:
+                done.set_result(future.result())
+            except Exception as e:
+                fail(e, 0)
+
+        try:
+            readers.submit(read_source, file_path, metrics).add_done_callback(on_read)
+        except Exception as e:
+            fail(e, reserved)
+        return done
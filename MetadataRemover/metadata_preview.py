@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Cached metadata reads for the MetadataManager preview
+
+MetadataCache keeps the metadata of recently previewed files in a
+bounded LRU, so opening a preview again does not read the file again.
+Each entry remembers the (path, size, mtime_ns) it was read for and is
+only used while the file still matches, so a file rewritten by a batch
+is never shown with stale metadata; the batch also drops its entries
+explicitly through invalidate().
+
+A background thread warms the cache: prefetch() hands it the files near
+the current selection, nearest first, and a newer request replaces the
+older one, so the thread never falls behind the user.
+
+preview_node and preview_rows describe metadata values for the lazy
+preview tree: each value gets a one-line summary, and dicts, long lists,
+long text and binary values are only expanded into rows, a page at a
+time, when the user opens them. Binary values are shown as a size until
+then, and as a hex dump after.
+
+This module must not import tkinter so it can be tested headless.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from metadata_engine import extract_metadata
+
+
+# Files whose metadata is kept
+PREVIEW_CACHE_SIZE = 256
+
+# Rows on each side of the selection that are read ahead
+PREFETCH_RADIUS = 8
+
+# Longest text shown on one line of the preview tree
+PREVIEW_TEXT_LIMIT = 120
+
+# Bytes per hex dump line, and rows added per expand or "Show more"
+HEX_LINE_BYTES = 16
+PREVIEW_PAGE_ROWS = 256
+
+
+def file_stamp(path):
+    """(path, size, mtime_ns) identifying the current contents of a file"""
+    st = os.stat(path)
+    return path, st.st_size, st.st_mtime_ns
+
+
+def nearby(items, index, radius=PREFETCH_RADIUS):
+    """items around index, nearest first, starting with items[index]"""
+    found = []
+    for distance in range(radius + 1):
+        for i in ((index,) if distance == 0 else (index + distance, index - distance)):
+            if 0 <= i < len(items):
+                found.append(items[i])
+    return found
+
+
+def preview_node(value):
+    """Return (summary, expandable) describing value on one line"""
+    if isinstance(value, dict):
+        return f"{len(value):,} entries", bool(value)
+    if isinstance(value, (bytes, bytearray)):
+        return f"<{len(value):,} bytes>", bool(value)
+    if isinstance(value, (list, tuple)):
+        if not any(isinstance(item, (dict, list, tuple, bytes, bytearray)) for item in value):
+            text = ", ".join(str(item) for item in value)
+            if len(text) <= PREVIEW_TEXT_LIMIT:
+                return text, False
+        return f"{len(value):,} items", bool(value)
+    text = " ".join(str(value).splitlines())
+    if len(text) <= PREVIEW_TEXT_LIMIT:
+        return text, False
+    return f"{text[:PREVIEW_TEXT_LIMIT]}… ({len(text):,} characters)", True
+
+
+def hex_line(data, offset):
+    """One hex dump line of data starting at offset, with its printable text"""
+    chunk = bytes(data[offset:offset + HEX_LINE_BYTES])
+    text = ''.join(chr(b) if 32 <= b < 127 else '.' for b in chunk)
+    return f"{chunk.hex(' '):<{HEX_LINE_BYTES * 3}} {text}"
+
+
+def preview_rows(value, start=0, count=PREVIEW_PAGE_ROWS):
+    """Return (rows, next_start) for the children of an expandable value.
+
+    rows is a list of (label, child value) for at most count children from
+    start on; next_start is where the next page begins, or None after the
+    last one. Binary values become hex dump lines and long text becomes
+    lines of PREVIEW_TEXT_LIMIT characters, labeled with their offsets.
+    """
+    if isinstance(value, dict):
+        items = list(value.items())[start:start + count]
+        rows = [(str(key), child) for key, child in items]
+        total = len(value)
+    elif isinstance(value, (list, tuple)):
+        rows = [(f"[{i}]", value[i]) for i in range(start, min(start + count, len(value)))]
+        total = len(value)
+    elif isinstance(value, (bytes, bytearray)):
+        end = min(len(value), start + count * HEX_LINE_BYTES)
+        rows = [(f"{offset:08X}", hex_line(value, offset))
+                for offset in range(start, end, HEX_LINE_BYTES)]
+        return rows, end if end < len(value) else None
+    else:
+        text = " ".join(str(value).splitlines())
+        end = min(len(text), start + count * PREVIEW_TEXT_LIMIT)
+        rows = [(f"{offset:,}", text[offset:offset + PREVIEW_TEXT_LIMIT])
+                for offset in range(start, end, PREVIEW_TEXT_LIMIT)]
+        return rows, end if end < len(text) else None
+    end = start + len(rows)
+    return rows, end if end < total else None
+
+
+class MetadataCache:
+    """Thread-safe LRU of extracted metadata with a prefetch thread.
+
+    extract is the function reading a file's metadata dict; it defaults
+    to metadata_engine.extract_metadata.
+    """
+
+    def __init__(self, max_entries=PREVIEW_CACHE_SIZE, extract=extract_metadata):
+        self.max_entries = max_entries
+        self.extract = extract
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.wanted = threading.Condition(self.lock)
+        self.pending = []
+        self.thread = None
+        self.closed = False
+
+    def lookup(self, stamp):
+        """Cached metadata for a file_stamp, or None"""
+        with self.lock:
+            entry = self.entries.get(stamp[0])
+            if entry is None or entry[0] != stamp:
+                return None
+            self.entries.move_to_end(stamp[0])
+            return entry[1]
+
+    def store(self, stamp, metadata):
+        with self.lock:
+            self.entries[stamp[0]] = (stamp, metadata)
+            self.entries.move_to_end(stamp[0])
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, path):
+        """Return (metadata, size) of path, reading the file on a cache miss.
+
+        Errors reading the file are raised to the caller and not cached.
+        May block on slow storage, so call it off the Tk thread.
+        """
+        stamp = file_stamp(path)
+        metadata = self.lookup(stamp)
+        if metadata is None:
+            metadata = self.extract(path)
+            self.store(stamp, metadata)
+        return metadata, stamp[1]
+
+    def invalidate(self, path):
+        """Forget the metadata of a file that was rewritten"""
+        with self.lock:
+            self.entries.pop(path, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.pending = []
+
+    def prefetch(self, paths):
+        """Read paths into the cache in the background, replacing earlier requests"""
+        with self.lock:
+            if self.closed:
+                return
+            self.pending = list(reversed(paths))
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._warm, name="metadata-prefetch",
+                                               daemon=True)
+                self.thread.start()
+            self.wanted.notify()
+
+    def close(self):
+        """Stop the prefetch thread once it has finished the file it is reading"""
+        with self.lock:
+            self.closed = True
+            self.pending = []
+            self.wanted.notify()
+            thread = self.thread
+        if thread is not None:
+            thread.join()
+
+    def _warm(self):
+        while True:
+            with self.lock:
+                while not self.pending and not self.closed:
+                    self.wanted.wait()
+                if self.closed:
+                    return
+                path = self.pending.pop()
+            try:
+                self.get(path)
+            except Exception:
+                # The preview reports errors when the file is opened
+                pass
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Background thumbnails for the MetadataManager file list
+
+Thumbnails are made as cheaply as the file allows: the JPEG thumbnail
+embedded in the EXIF block is used when there is one, JPEGs without one
+are decoded in draft mode (the decoder scales the DCT blocks down, so
+only a fraction of the pixels is produced), and other formats are
+decoded and reduced. Either way the thumbnail is turned upright by the
+image's EXIF Orientation. Results are kept as small PNGs in an on-disk
+cache keyed by the file's content identity, a hash of its size and of
+its first and last 64 KiB, so renamed or copied files hit the cache and
+changed files miss it without reading the whole file. The cache is
+capped at THUMBNAIL_CACHE_BYTES: the least recently used thumbnails are
+removed once it grows past that, and clear() empties it.
+
+ThumbnailLoader makes them on a thread pool. The file list asks for the
+rows in view and collects finished thumbnails when it polls; rows that
+scrolled out of view before their turn are skipped.
+
+This module must not import tkinter; the file list turns the PNG data
+into images on the Tk thread.
+"""
+
+import hashlib
+import io
+import os
+import queue
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+from metadata_commit import new_temp_path
+from metadata_formats import (METADATA_READERS, MetadataFormatError, decode_tiff_value,
+                              exif_thumbnail, iter_exif_entries, read_metadata)
+
+
+# Largest width and height of a thumbnail, in pixels
+THUMBNAIL_SIZE = 32
+
+# Bytes hashed at each end of a file for its content identity
+IDENTITY_SAMPLE_SIZE = 64 * 1024
+
+# Threads making thumbnails
+THUMBNAIL_JOBS = 4
+
+# Bytes of thumbnails kept on disk; the cache is pruned to 3/4 of this
+THUMBNAIL_CACHE_BYTES = 32 * 1024 * 1024
+
+# Bump when thumbnails are made differently, so cached ones are remade
+THUMBNAIL_VERSION = 2
+
+# EXIF tag holding the orientation of the main image
+ORIENTATION_TAG = 0x0112
+
+# How to turn an image stored in each EXIF orientation upright
+ORIENTATION_TRANSPOSE = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+
+def default_thumbnail_dir():
+    """Per-user thumbnail cache location used by the GUI"""
+    return os.path.join(os.path.expanduser("~"), ".metadatamanager", "thumbnails")
+
+
+def content_key(path, size=THUMBNAIL_SIZE):
+    """Hex key identifying a file's contents and the thumbnail size"""
+    digest = hashlib.sha256(f"{THUMBNAIL_VERSION}:{size}:".encode('ascii'))
+    with open(path, 'rb') as src:
+        length = os.fstat(src.fileno()).st_size
+        digest.update(f"{length}:".encode('ascii'))
+        digest.update(src.read(IDENTITY_SAMPLE_SIZE))
+        if length > IDENTITY_SAMPLE_SIZE:
+            src.seek(max(IDENTITY_SAMPLE_SIZE, length - IDENTITY_SAMPLE_SIZE))
+            digest.update(src.read(IDENTITY_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def _encode(img, size):
+    """Reduce an open image to fit size and return it as PNG bytes"""
+    img.thumbnail((size, size))
+    if img.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+    buf = io.BytesIO()
+    img.save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def exif_orientation(tiff):
+    """The Orientation in an EXIF block's IFD0, 1 (upright) if it has none"""
+    for ifd, entry in iter_exif_entries(tiff):
+        if ifd == 'IFD0' and entry[0] == ORIENTATION_TAG:
+            orientation = decode_tiff_value(tiff, entry)
+            return orientation if isinstance(orientation, int) else 1
+    return 1
+
+
+def embedded_thumbnail(path):
+    """(JPEG thumbnail in a file's EXIF block, orientation of the image).
+
+    The thumbnail is None when there is none. It is stored unrotated, so
+    the orientation of the main image applies to it too.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in METADATA_READERS or ext in ('.tif', '.tiff'):
+        # A TIFF's second IFD is a page, not a thumbnail
+        return None, 1
+    with open(path, 'rb') as src:
+        try:
+            blocks = read_metadata(ext, src)
+            if blocks.exif is None:
+                return None, 1
+            return exif_thumbnail(blocks.exif), exif_orientation(blocks.exif)
+        except MetadataFormatError:
+            return None, 1
+
+
+def make_thumbnail(path, size=THUMBNAIL_SIZE):
+    """PNG bytes of an upright thumbnail of path fitting in size x size pixels.
+
+    Errors opening or decoding the file are raised to the caller.
+    """
+    data, orientation = embedded_thumbnail(path)
+    if data:
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                img.draft('RGB', (size, size))
+                if orientation in ORIENTATION_TRANSPOSE:
+                    img = img.transpose(ORIENTATION_TRANSPOSE[orientation])
+                return _encode(img, size)
+        except (OSError, SyntaxError):
+            pass  # A broken embedded thumbnail; decode the image instead
+
+    with Image.open(path) as img:
+        # JPEGs decode at 1/2, 1/4 or 1/8 scale; a no-op for other formats
+        img.draft('RGB', (size, size))
+        return _encode(ImageOps.exif_transpose(img), size)
+
+
+class ThumbnailCache:
+    """On-disk thumbnail PNGs keyed by content_key, capped at max_bytes.
+
+    A thumbnail's mtime is bumped whenever it is used, so pruning removes
+    the least recently used ones first.
+    """
+
+    def __init__(self, root, size=THUMBNAIL_SIZE, max_bytes=THUMBNAIL_CACHE_BYTES):
+        self.root = root
+        self.size = size
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # Bytes on disk, counted on the first store
+        self.used = None
+
+    def path_for(self, key):
+        return os.path.join(self.root, key[:2], key + ".png")
+
+    def get(self, path):
+        """Return thumbnail PNG bytes for path, making and storing them on a miss"""
+        cache_path = self.path_for(content_key(path, self.size))
+        try:
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+            os.utime(cache_path)
+            return data
+        except FileNotFoundError:
+            pass
+
+        data = make_thumbnail(path, self.size)
+        temp_path = new_temp_path(cache_path)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, cache_path)
+            self._stored(len(data))
+        except OSError:
+            pass  # An unwritable cache only costs speed
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return data
+
+    def _entries(self):
+        """(mtime_ns, size, path) of every cached thumbnail"""
+        entries = []
+        for folder, _, names in os.walk(self.root):
+            for name in names:
+                path = os.path.join(folder, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+        return entries
+
+    def _stored(self, size):
+        """Count a new thumbnail and prune the cache once it is over budget"""
+        with self.lock:
+            if self.used is None:
+                self.used = sum(entry[1] for entry in self._entries())
+            else:
+                self.used += size
+            if self.used <= self.max_bytes:
+                return
+            entries = sorted(self._entries())
+            self.used = sum(entry[1] for entry in entries)
+            for _, entry_size, path in entries:
+                if self.used <= self.max_bytes * 3 // 4:
+                    break
+                try:
+                    os.remove(path)
+                    self.used -= entry_size
+                except OSError:
+                    pass
+
+    def clear(self):
+        """Remove every cached thumbnail"""
+        with self.lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self.used = 0
+
+
+class ThumbnailLoader:
+    """Makes thumbnails on a thread pool for the paths currently wanted.
+
+    request() replaces the wanted paths; results() returns (path, data)
+    pairs finished since the last call, with data None for files that
+    have no thumbnail.
+    """
+
+    def __init__(self, cache, jobs=THUMBNAIL_JOBS):
+        self.cache = cache
+        self.pool = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix="thumbnail")
+        self.done = queue.Queue()
+        self.lock = threading.Lock()
+        self.wanted = set()
+        self.in_flight = set()
+
+    def request(self, paths):
+        """Make thumbnails for paths, dropping requests for paths no longer wanted"""
+        with self.lock:
+            self.wanted = set(paths)
+            todo = [path for path in paths if path not in self.in_flight]
+            self.in_flight.update(todo)
+        for path in todo:
+            self.pool.submit(self._load, path)
+
+    def _load(self, path):
+        with self.lock:
+            if path not in self.wanted:
+                self.in_flight.discard(path)
+                return
+        try:
+            data = self.cache.get(path)
+        except Exception:
+            data = None
+        self.done.put((path, data))
+        with self.lock:
+            self.in_flight.discard(path)
+
+    def results(self):
+        """(path, data) pairs finished since the last call"""
+        finished = []
+        while True:
+            try:
+                finished.append(self.done.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def close(self):
+        """Stop making thumbnails; queued requests are dropped"""
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Lazy metadata tree widget for MetadataManager
+
+A ttk.Treeview showing a metadata dict from extract_metadata. Rows are
+only created when their parent is expanded: the categories start
+collapsed, sub-IFDs such as GPSInfo, long lists and long text open on
+demand, and binary values such as MakerNote or ICC data show their size
+until expanded into a hex dump. Large values are filled a page at a time
+behind a "Show more" row, so opening a preview costs the same however
+much metadata the file carries.
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+from metadata_preview import preview_node, preview_rows
+
+
+class MetadataTree(ttk.Frame):
+    """Two-column (tag, value) tree over a metadata dict, filled on expand"""
+
+    def __init__(self, parent, metadata, font=('Consolas', 9)):
+        super().__init__(parent)
+        self.tree = ttk.Treeview(self, columns=('value',), show='tree headings')
+        self.tree.heading('#0', text="Tag")
+        self.tree.heading('value', text="Value")
+        self.tree.column('#0', width=220, stretch=False)
+        self.tree.column('value', width=360)
+        self.tree.tag_configure('detail', font=font)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+
+        # Unloaded values by item, and the "Show more" rows of partly loaded ones
+        self.unloaded = {}
+        self.more_rows = {}
+
+        self.tree.bind('<<TreeviewOpen>>', self._on_open)
+        self.tree.bind('<Double-Button-1>', self._on_double_click)
+
+        for category, data in metadata.items():
+            self._add('', category.upper(), data)
+
+    def _add(self, parent, label, value, tags=()):
+        """Insert one row; expandable values get a placeholder child"""
+        summary, expandable = preview_node(value)
+        item = self.tree.insert(parent, 'end', text=label, values=(summary,), tags=tags)
+        if expandable:
+            self.unloaded[item] = value
+            self.tree.insert(item, 'end', text="…")
+        return item
+
+    def _fill(self, parent, value, start=0):
+        """Add a page of value's rows under parent, with a "Show more" row if needed"""
+        rows, next_start = preview_rows(value, start)
+        # Hex dump lines need a fixed-width font to line up
+        tags = ('detail',) if isinstance(value, (bytes, bytearray)) else ()
+        for label, child in rows:
+            self._add(parent, label, child, tags)
+        if next_start is not None:
+            more = self.tree.insert(parent, 'end', text="…",
+                                    values=("Show more (double-click)",), tags=('detail',))
+            self.more_rows[more] = (parent, value, next_start)
+
+    def load(self, item):
+        """Create the children of item if they are not loaded yet"""
+        value = self.unloaded.pop(item, None)
+        if value is None:
+            return
+        self.tree.delete(*self.tree.get_children(item))
+        self._fill(item, value)
+
+    def _on_open(self, event):
+        self.load(self.tree.focus())
+
+    def _on_double_click(self, event):
+        item = self.tree.identify_row(event.y)
+        if item in self.more_rows:
+            parent, value, start = self.more_rows.pop(item)
+            self.tree.delete(item)
+            self._fill(parent, value, start)
@@ -15,15 +15,36 @@ A comprehensive tool for managing metadata in images:
 - Custom metadata templates
 """
 
+import sys
+import multiprocessing
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # Command-line run: hand over to the CLI before tkinter is loaded
+    multiprocessing.freeze_support()
+    from metadata_cli import main as cli_main
+    sys.exit(cli_main())
+
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog, simpledialog
 import os
-import shutil
 from datetime import datetime
 import threading
-from PIL import Image, ExifTags
-from PIL.ExifTags import TAGS, GPSTAGS
-import json
+import queue
+from itertools import takewhile
+import metadata_engine
+from metadata_engine import (BatchEngine, SUPPORTED_FORMATS, default_worker_count, is_supported,
+                             scan_images)
+from metadata_manifest import default_manifest_path
+from metadata_audit import audit_files, audit_format_for, write_findings
+from metadata_checkpoint import BatchControl, default_checkpoint_path
+from file_list import VirtualFileList
+from log_sink import LogSink, default_log_path
+from metadata_metrics import BatchMetrics, default_metrics_dir
+from metadata_pipeline import PipelineEngine
+from metadata_preview import MetadataCache, nearby
+from metadata_tree import MetadataTree
+from metadata_thumbnails import (THUMBNAIL_SIZE, ThumbnailCache, ThumbnailLoader,
+                                 default_thumbnail_dir)
 
 
 class MetadataManagerGUI:
@@ -59,12 +80,25 @@ class MetadataManagerGUI:
         }
         
         # Supported image formats
-        self.supported_formats = {'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.bmp', '.webp'}
+        self.supported_formats = set(SUPPORTED_FORMATS)
         
-        # File lists
+        # File lists (the set mirrors selected_files for O(1) duplicate checks)
         self.selected_files = []
+        self.selected_set = set()
         self.processed_files = []
         
+        # Cancel event of the folder scan in progress, if any, and the event
+        # set when the files it already found should be dropped too
+        self.scan_cancel = None
+        self.scan_discard = None
+        self.scan_batch_size = 500
+        
+        # Pause/cancel switches of the batch in progress, if any
+        self.batch_control = None
+        
+        # Metadata of recently previewed files, read ahead around the selection
+        self.metadata_cache = MetadataCache()
+        
         # Mode settings
         self.advanced_mode = tk.BooleanVar(value=False)
         
@@ -72,8 +106,33 @@ class MetadataManagerGUI:
         self.remove_exif = tk.BooleanVar(value=True)
         self.remove_iptc = tk.BooleanVar(value=True)
         self.remove_xmp = tk.BooleanVar(value=True)
+        self.scrub_exif = tk.BooleanVar(value=False)
+        self.scrub_tags_var = tk.StringVar(value="")
         self.create_backup = tk.BooleanVar(value=True)
+        self.backup_modes = {
+            "Link or clone (fast)": 'link',
+            "Full copy": 'copy',
+            "Deduplicated store": 'store',
+        }
+        self.backup_mode_var = tk.StringVar(value="Link or clone (fast)")
         self.overwrite_original = tk.BooleanVar(value=False)
+        self.durability_modes = {
+            "Grouped sync (fast)": 'batch',
+            "Sync every file": 'file',
+            "No sync (fastest)": 'none',
+        }
+        self.durability_var = tk.StringVar(value="Grouped sync (fast)")
+        self.worker_count = tk.IntVar(value=default_worker_count())
+        self.skip_unchanged = tk.BooleanVar(value=False)
+        self.pipeline_io = tk.BooleanVar(value=False)
+        
+        # Batch results coming back from the processing thread
+        self.event_queue = queue.Queue()
+        
+        # Log lines from any thread, shown at a fixed frame rate
+        self.log_sink = LogSink()
+        self.log_frame_ms = 100
+        self.log_to_file = tk.BooleanVar(value=False)
         
         # Initialize output path variable
         self.output_path_var = tk.StringVar(value="Same as source")
@@ -118,6 +177,9 @@ class MetadataManagerGUI:
         
         # Set up window resizing handler
         self.setup_responsive_layout()
+        
+        # Start the progress log refresh loop
+        self.root.after(self.log_frame_ms, self.flush_log)
         # Don't call toggle_mode() here - it will be called after widgets are created
         
     def create_custom_icon(self):
@@ -460,10 +522,10 @@ class MetadataManagerGUI:
                                      style='Modern.TButton')
         select_files_btn.pack(side=tk.LEFT, padx=(0, 10))
         
-        select_folder_btn = ttk.Button(file_btn_frame, text="📂 Select Folder", 
-                                      command=self.select_folder,
-                                      style='Modern.TButton')
-        select_folder_btn.pack(side=tk.LEFT)
+        self.select_folder_btn = ttk.Button(file_btn_frame, text="📂 Select Folder", 
+                                           command=self.select_folder,
+                                           style='Modern.TButton')
+        self.select_folder_btn.pack(side=tk.LEFT)
         
         # Modern drag and drop area
         self.drop_frame = tk.Frame(file_section, bg='#f8f9ff', relief='solid', bd=2, height=80)
@@ -506,27 +568,15 @@ class MetadataManagerGUI:
         middle_content = tk.Frame(self.middle_frame, bg=self.colors['white'])
         middle_content.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
         
-        # File listbox with modern styling
-        list_container = tk.Frame(middle_content, bg=self.colors['white'])
-        list_container.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
-        
-        self.file_listbox = tk.Listbox(list_container, 
-                                      selectmode=tk.MULTIPLE,
-                                      font=('Segoe UI', 9),
-                                      bg=self.colors['white'],
-                                      fg=self.colors['dark'],
-                                      selectbackground=self.colors['secondary'],
-                                      selectforeground='white',
-                                      borderwidth=1,
-                                      relief='solid',
-                                      highlightthickness=0)
-        self.file_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.file_listbox.bind('<Double-Button-1>', self.preview_metadata)
-        
-        list_scroll = ttk.Scrollbar(list_container, orient=tk.VERTICAL, 
-                                   command=self.file_listbox.yview)
-        list_scroll.pack(side=tk.RIGHT, fill=tk.Y)
-        self.file_listbox.configure(yscrollcommand=list_scroll.set)
+        # Virtualized file list: only the visible rows are drawn, and their
+        # thumbnails are made on a thread pool and cached on disk
+        self.thumbnail_cache = ThumbnailCache(default_thumbnail_dir())
+        thumbnails = ThumbnailLoader(self.thumbnail_cache)
+        self.file_list = VirtualFileList(middle_content, self.selected_files, self.colors,
+                                         on_activate=self.preview_file_at,
+                                         on_select=self.warm_preview_cache,
+                                         thumbnails=thumbnails, thumbnail_size=THUMBNAIL_SIZE)
+        self.file_list.pack(fill=tk.BOTH, expand=True, pady=(0, 15))
         
         # File info section
         info_frame = tk.Frame(middle_content, bg=self.colors['white'])
@@ -604,6 +654,14 @@ class MetadataManagerGUI:
                                      fg=self.colors['info'])
         self.results_label.pack(anchor=tk.W)
         
+        # Per-stage timing percentiles of the last batch
+        self.metrics_label = tk.Label(right_content, text="", 
+                                     font=('Consolas', 8),
+                                     bg=self.colors['white'],
+                                     fg=self.colors['muted'],
+                                     justify=tk.LEFT)
+        self.metrics_label.pack(anchor=tk.W, pady=(5, 0))
+        
         # Modern status bar
         status_frame = tk.Frame(main_container, bg=self.colors['dark'], height=35)
         status_frame.pack(fill=tk.X, pady=(20, 0))
@@ -623,8 +681,11 @@ class MetadataManagerGUI:
         current_mode = self.advanced_mode.get()
         
         # Clear all file selections and reset state
+        self.cancel_folder_scan(keep_found=False)
         self.selected_files.clear()
+        self.selected_set.clear()
         self.processed_files.clear()
+        self.metadata_cache.clear()
         
         # Reset progress
         self.progress_var.set(0)
@@ -696,6 +757,22 @@ class MetadataManagerGUI:
         ttk.Checkbutton(checkbox_frame, text="XMP Data (Adobe metadata)", 
                        variable=self.remove_xmp,
                        style='Modern.TCheckbutton').pack(anchor=tk.W, pady=5)
+        ttk.Checkbutton(checkbox_frame, text="Keep other EXIF, only scrub GPS location and thumbnail", 
+                       variable=self.scrub_exif,
+                       style='Modern.TCheckbutton').pack(anchor=tk.W, pady=5)
+        
+        scrub_frame = tk.Frame(checkbox_frame, bg=self.colors['white'])
+        scrub_frame.pack(fill=tk.X, padx=(20, 0), pady=(0, 5))
+        
+        scrub_label = tk.Label(scrub_frame, text="Also scrub tags:",
+                              font=('Segoe UI', 9),
+                              bg=self.colors['white'],
+                              fg=self.colors['dark'])
+        scrub_label.pack(side=tk.LEFT, padx=(0, 10))
+        
+        scrub_entry = ttk.Entry(scrub_frame, textvariable=self.scrub_tags_var,
+                               style='Modern.TEntry')
+        scrub_entry.pack(side=tk.LEFT, fill=tk.X, expand=True)
         
         # Output options section
         output_label = tk.Label(self.settings_container, text="Output Options:", 
@@ -710,10 +787,42 @@ class MetadataManagerGUI:
         ttk.Checkbutton(output_checkbox_frame, text="Create backup copies", 
                        variable=self.create_backup,
                        style='Modern.TCheckbutton').pack(anchor=tk.W, pady=5)
+        
+        backup_frame = tk.Frame(output_checkbox_frame, bg=self.colors['white'])
+        backup_frame.pack(fill=tk.X, padx=(20, 0), pady=(0, 5))
+        
+        backup_label = tk.Label(backup_frame, text="Backup method:",
+                               font=('Segoe UI', 9),
+                               bg=self.colors['white'],
+                               fg=self.colors['dark'])
+        backup_label.pack(side=tk.LEFT, padx=(0, 10))
+        
+        backup_combo = ttk.Combobox(backup_frame, textvariable=self.backup_mode_var,
+                                   values=list(self.backup_modes.keys()),
+                                   state='readonly',
+                                   style='Modern.TCombobox',
+                                   width=24)
+        backup_combo.pack(side=tk.LEFT)
         ttk.Checkbutton(output_checkbox_frame, text="Overwrite original files", 
                        variable=self.overwrite_original,
                        style='Modern.TCheckbutton').pack(anchor=tk.W, pady=5)
         
+        durability_frame = tk.Frame(output_checkbox_frame, bg=self.colors['white'])
+        durability_frame.pack(fill=tk.X, pady=(0, 5))
+        
+        durability_label = tk.Label(durability_frame, text="Write safety:",
+                                   font=('Segoe UI', 9),
+                                   bg=self.colors['white'],
+                                   fg=self.colors['dark'])
+        durability_label.pack(side=tk.LEFT, padx=(0, 10))
+        
+        durability_combo = ttk.Combobox(durability_frame, textvariable=self.durability_var,
+                                       values=list(self.durability_modes.keys()),
+                                       state='readonly',
+                                       style='Modern.TCombobox',
+                                       width=24)
+        durability_combo.pack(side=tk.LEFT)
+        
         # Output directory section
         output_dir_frame = tk.Frame(self.settings_container, bg=self.colors['white'])
         output_dir_frame.pack(fill=tk.X, pady=(0, 25))
@@ -738,6 +847,9 @@ class MetadataManagerGUI:
                                style='Modern.TButton')
         browse_btn.pack(side=tk.RIGHT)
         
+        # Parallel processing
+        self.create_worker_setting(self.settings_container)
+        
         # Action buttons
         action_frame = tk.Frame(self.settings_container, bg=self.colors['white'])
         action_frame.pack(fill=tk.X, pady=(25, 0))
@@ -747,11 +859,17 @@ class MetadataManagerGUI:
                                      state='disabled',
                                      style='Danger.TButton')
         self.process_btn.pack(side=tk.LEFT, padx=(0, 10))
+        self.create_batch_controls(action_frame)
         
         clear_btn = ttk.Button(action_frame, text="🧹 Clear List", 
                               command=self.clear_files,
                               style='Modern.TButton')
-        clear_btn.pack(side=tk.LEFT)
+        clear_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        audit_btn = ttk.Button(action_frame, text="🔍 Audit",
+                              command=self.start_audit,
+                              style='Modern.TButton')
+        audit_btn.pack(side=tk.LEFT)
     
     def create_advanced_settings(self):
         """Create advanced mode settings (metadata editing) with modern design"""
@@ -839,6 +957,9 @@ class MetadataManagerGUI:
                        variable=self.create_backup,
                        style='Modern.TCheckbutton').pack(anchor=tk.W, pady=5)
         
+        # Parallel processing
+        self.create_worker_setting(self.settings_container)
+        
         # Action buttons
         action_frame = tk.Frame(self.settings_container, bg=self.colors['white'])
         action_frame.pack(fill=tk.X)
@@ -848,11 +969,61 @@ class MetadataManagerGUI:
                                      state='disabled',
                                      style='Success.TButton')
         self.process_btn.pack(side=tk.LEFT, padx=(0, 10))
+        self.create_batch_controls(action_frame)
         
         clear_btn = ttk.Button(action_frame, text="🧹 Clear List", 
                               command=self.clear_files,
                               style='Modern.TButton')
-        clear_btn.pack(side=tk.LEFT)
+        clear_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        audit_btn = ttk.Button(action_frame, text="🔍 Audit",
+                              command=self.start_audit,
+                              style='Modern.TButton')
+        audit_btn.pack(side=tk.LEFT)
+    
+    def create_batch_controls(self, parent):
+        """Create the pause and cancel buttons, enabled while a batch runs"""
+        self.pause_btn = ttk.Button(parent, text="⏸️ Pause",
+                                   command=self.toggle_pause,
+                                   state='disabled',
+                                   style='Modern.TButton')
+        self.pause_btn.pack(side=tk.LEFT, padx=(0, 10))
+        
+        self.cancel_btn = ttk.Button(parent, text="⏹️ Cancel",
+                                    command=self.cancel_processing,
+                                    state='disabled',
+                                    style='Modern.TButton')
+        self.cancel_btn.pack(side=tk.LEFT, padx=(0, 10))
+    
+    def create_worker_setting(self, parent):
+        """Create the worker process count selector and batch run toggles"""
+        worker_frame = tk.Frame(parent, bg=self.colors['white'])
+        worker_frame.pack(fill=tk.X, pady=(0, 15))
+        
+        worker_label = tk.Label(worker_frame, text="Worker processes:",
+                               font=('Segoe UI', 9, 'bold'),
+                               bg=self.colors['white'],
+                               fg=self.colors['dark'])
+        worker_label.pack(side=tk.LEFT, padx=(0, 10))
+        
+        worker_spinbox = ttk.Spinbox(worker_frame, 
+                                    from_=1, to=max(64, default_worker_count()),
+                                    textvariable=self.worker_count,
+                                    width=5)
+        worker_spinbox.pack(side=tk.LEFT)
+        
+        ttk.Checkbutton(parent, text="Skip files unchanged since last run", 
+                       variable=self.skip_unchanged,
+                       style='Modern.TCheckbutton').pack(anchor=tk.W, pady=(0, 5))
+        ttk.Checkbutton(parent, text="Pipelined I/O (faster on network folders)", 
+                       variable=self.pipeline_io,
+                       style='Modern.TCheckbutton').pack(anchor=tk.W, pady=(0, 5))
+        ttk.Checkbutton(parent, text="Save full log to file", 
+                       variable=self.log_to_file,
+                       style='Modern.TCheckbutton').pack(anchor=tk.W, pady=(0, 5))
+        ttk.Button(parent, text="🧹 Clear Thumbnail Cache",
+                  command=self.clear_thumbnail_cache,
+                  style='Modern.TButton').pack(anchor=tk.W, pady=(0, 15))
     
     def load_template(self, event=None):
         """Load metadata template with modern styling"""
@@ -981,26 +1152,102 @@ class MetadataManagerGUI:
         folder = filedialog.askdirectory(title="Select Folder Containing Images")
         
         if folder:
-            image_files = []
-            for root, dirs, files in os.walk(folder):
-                for file in files:
-                    if any(file.lower().endswith(ext) for ext in self.supported_formats):
-                        image_files.append(os.path.join(root, file))
-            
-            if image_files:
-                self.add_files(image_files)
-                self.log_message(f"Found {len(image_files)} image files in folder")
+            self.start_folder_scan(folder)
+    
+    def start_folder_scan(self, folder):
+        """Scan a folder on a background thread, streaming images into the list"""
+        self.cancel_folder_scan()
+        
+        cancel = threading.Event()
+        discard = threading.Event()
+        scan_queue = queue.Queue()
+        self.scan_cancel = cancel
+        self.scan_discard = discard
+        
+        scan_thread = threading.Thread(target=self.scan_folder,
+                                       args=(folder, cancel, scan_queue))
+        scan_thread.daemon = True
+        scan_thread.start()
+        
+        self.select_folder_btn.configure(text="⏹️ Stop Scan", command=self.cancel_folder_scan)
+        self.status_var.set(f"Scanning {folder}...")
+        self.root.after(50, self.poll_scan_results, cancel, discard, scan_queue)
+    
+    def scan_folder(self, folder, cancel, scan_queue):
+        """Walk a folder for images (runs on the scan thread), posting batches"""
+        batch = []
+        found = 0
+        try:
+            for path in scan_images(folder, cancel):
+                batch.append(path)
+                if len(batch) >= self.scan_batch_size:
+                    found += len(batch)
+                    scan_queue.put(('files', batch))
+                    batch = []
+        finally:
+            found += len(batch)
+            scan_queue.put(('files', batch))
+            scan_queue.put(('done', found))
+    
+    def poll_scan_results(self, cancel, discard, scan_queue):
+        """Add scanned batches to the file list on the Tk thread.
+
+        A stopped scan is still drained until its thread finishes, so the
+        batches it queued before stopping are kept unless discard is set.
+        """
+        found = None
+        while True:
+            try:
+                event = scan_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'files':
+                if event[1] and not discard.is_set():
+                    self.add_files(event[1])
             else:
-                messagebox.showwarning("No Images", "No supported image files found in the selected folder.")
+                found = event[1]
+        
+        if found is None:
+            self.root.after(50, self.poll_scan_results, cancel, discard, scan_queue)
+            return
+        if cancel.is_set():
+            # cancel_folder_scan already restored the folder button
+            return
+        
+        self.finish_folder_scan()
+        if found:
+            self.log_message(f"Found {found} image files in folder")
+        else:
+            messagebox.showwarning("No Images", "No supported image files found in the selected folder.")
+    
+    def cancel_folder_scan(self, keep_found=True):
+        """Stop the folder scan in progress.
+
+        Files found so far, including batches not yet shown, are kept
+        unless keep_found is False.
+        """
+        if self.scan_cancel is None:
+            return
+        if not keep_found:
+            self.scan_discard.set()
+        self.scan_cancel.set()
+        self.finish_folder_scan()
+        self.status_var.set(f"Folder scan stopped. Total: {len(self.selected_files)} files")
+    
+    def finish_folder_scan(self):
+        """Restore the folder button after a scan ends"""
+        self.scan_cancel = None
+        self.scan_discard = None
+        self.select_folder_btn.configure(text="📂 Select Folder", command=self.select_folder)
     
     def add_files(self, files):
         """Add files to the processing list"""
         new_files = []
         for file in files:
-            if file not in self.selected_files:
-                if any(file.lower().endswith(ext) for ext in self.supported_formats):
-                    self.selected_files.append(file)
-                    new_files.append(file)
+            if file not in self.selected_set and is_supported(file):
+                self.selected_set.add(file)
+                self.selected_files.append(file)
+                new_files.append(file)
         
         if new_files:
             self.update_file_list()
@@ -1009,15 +1256,16 @@ class MetadataManagerGUI:
             self.status_var.set("No new supported image files to add")
     
     def update_file_list(self):
-        """Update the file listbox"""
+        """Update the file list view and the controls that depend on it"""
         # Check if widgets exist before trying to update them
-        if not hasattr(self, 'file_listbox') or not self.file_listbox:
+        if not hasattr(self, 'file_list') or not self.file_list:
             return
-            
-        self.file_listbox.delete(0, tk.END)
-        for file in self.selected_files:
-            filename = os.path.basename(file)
-            self.file_listbox.insert(tk.END, filename)
+        
+        # The view reads self.selected_files directly, so a redraw is enough
+        if self.selected_files:
+            self.file_list.refresh()
+        else:
+            self.file_list.clear()
         
         # Update UI state
         file_count = len(self.selected_files)
@@ -1030,14 +1278,23 @@ class MetadataManagerGUI:
     
     def clear_files(self):
         """Clear the file list"""
+        self.cancel_folder_scan(keep_found=False)
         self.selected_files.clear()
+        self.selected_set.clear()
         self.processed_files.clear()
+        self.metadata_cache.clear()
         self.update_file_list()
         self.progress_text.delete(1.0, tk.END)
         self.progress_var.set(0)
         self.results_label.configure(text="Ready to process files", fg=self.colors['info'])
         self.status_var.set("File list cleared")
     
+    def clear_thumbnail_cache(self):
+        """Delete the cached thumbnails; the rows in view are made again"""
+        self.thumbnail_cache.clear()
+        self.file_list.reload_thumbnails()
+        self.status_var.set("Thumbnail cache cleared")
+    
     def select_output_folder(self):
         """Select output folder for processed files"""
         folder = filedialog.askdirectory(title="Select Output Folder")
@@ -1046,7 +1303,7 @@ class MetadataManagerGUI:
     
     def preview_selected_metadata(self):
         """Preview metadata for selected files"""
-        selection = self.file_listbox.curselection()
+        selection = self.file_list.curselection()
         if not selection:
             messagebox.showwarning("No Selection", "Please select a file to preview metadata.")
             return
@@ -1055,52 +1312,82 @@ class MetadataManagerGUI:
         file_path = self.selected_files[file_index]
         self.preview_metadata_for_file(file_path)
     
-    def preview_metadata(self, event):
+    def preview_file_at(self, file_index):
         """Preview metadata on double-click"""
-        selection = self.file_listbox.curselection()
-        if selection:
-            file_index = selection[0]
-            file_path = self.selected_files[file_index]
-            self.preview_metadata_for_file(file_path)
+        self.warm_preview_cache(file_index)
+        self.preview_metadata_for_file(self.selected_files[file_index])
+    
+    def warm_preview_cache(self, file_index):
+        """Read the metadata of the rows around file_index in the background"""
+        self.metadata_cache.prefetch(nearby(self.selected_files, file_index))
     
     def preview_metadata_for_file(self, file_path):
-        """Show metadata preview window for a specific file"""
+        """Show metadata preview window for a specific file.
+        
+        The metadata comes from self.metadata_cache, read on a background
+        thread so a slow share or a huge MakerNote never blocks the window.
+        """
+        results = queue.Queue()
+        preview_thread = threading.Thread(target=self.load_preview_metadata,
+                                          args=(file_path, results))
+        preview_thread.daemon = True
+        preview_thread.start()
+        self.root.after(10, self.poll_preview_metadata, file_path, results)
+    
+    def load_preview_metadata(self, file_path, results):
+        """Fetch metadata for a preview (runs on a preview thread)"""
+        try:
+            results.put(('metadata',) + self.metadata_cache.get(file_path))
+        except Exception as e:
+            results.put(('error', e))
+    
+    def poll_preview_metadata(self, file_path, results):
+        """Open the preview window once its metadata has been read"""
+        try:
+            event = results.get_nowait()
+        except queue.Empty:
+            self.status_var.set(f"Reading metadata: {os.path.basename(file_path)}")
+            self.root.after(50, self.poll_preview_metadata, file_path, results)
+            return
+        
+        if event[0] == 'error':
+            self.log_message(f"Error extracting metadata from {file_path}: {str(event[1])}")
+            messagebox.showerror("Error", f"Failed to preview metadata: {str(event[1])}")
+            return
+        self.status_var.set(f"Metadata preview: {os.path.basename(file_path)}")
+        self.show_metadata_preview(file_path, event[1], event[2])
+    
+    def show_metadata_preview(self, file_path, metadata, file_size):
+        """Show the metadata preview window of a file.
+        
+        Tags are shown in a MetadataTree, which only creates rows as their
+        parents are expanded, so large MakerNotes or ICC profiles cost
+        nothing until they are opened.
+        """
         try:
-            metadata = self.extract_metadata(file_path)
-            
             # Create preview window
             preview_window = tk.Toplevel(self.root)
             preview_window.title(f"Metadata Preview - {os.path.basename(file_path)}")
             preview_window.geometry("600x500")
             
-            # Create text widget with scrollbar
-            text_frame = ttk.Frame(preview_window, padding="10")
-            text_frame.pack(fill=tk.BOTH, expand=True)
-            
-            text_widget = tk.Text(text_frame, wrap=tk.WORD, font=('Consolas', 9))
-            text_widget.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+            preview_frame = ttk.Frame(preview_window, padding="10")
+            preview_frame.pack(fill=tk.BOTH, expand=True)
             
-            scrollbar = ttk.Scrollbar(text_frame, orient=tk.VERTICAL, command=text_widget.yview)
-            scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-            text_widget.configure(yscrollcommand=scrollbar.set)
+            ttk.Label(preview_frame, text=f"File: {file_path}").pack(anchor='w')
+            ttk.Label(preview_frame, text=f"File Size: {file_size:,} bytes").pack(anchor='w', pady=(0, 8))
             
             # Display metadata
-            if metadata:
-                text_widget.insert(tk.END, f"File: {file_path}\n")
-                text_widget.insert(tk.END, f"File Size: {os.path.getsize(file_path):,} bytes\n")
-                text_widget.insert(tk.END, "=" * 50 + "\n\n")
-                
-                for category, data in metadata.items():
-                    if data:
-                        text_widget.insert(tk.END, f"{category.upper()} DATA:\n")
-                        text_widget.insert(tk.END, "-" * 30 + "\n")
-                        for key, value in data.items():
-                            text_widget.insert(tk.END, f"{key}: {value}\n")
-                        text_widget.insert(tk.END, "\n")
+            if any(metadata.values()):
+                tree = MetadataTree(preview_frame, metadata)
+                tree.pack(fill=tk.BOTH, expand=True)
+                # Open the first category with tags; the rest load on expand
+                for item in tree.tree.get_children():
+                    if item in tree.unloaded:
+                        tree.load(item)
+                        tree.tree.item(item, open=True)
+                        break
             else:
-                text_widget.insert(tk.END, "No metadata found in this image.")
-            
-            text_widget.configure(state='disabled')
+                ttk.Label(preview_frame, text="No metadata found in this image.").pack(anchor='w')
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to preview metadata: {str(e)}")
@@ -1108,40 +1395,7 @@ class MetadataManagerGUI:
     def extract_metadata(self, file_path):
         """Extract metadata from an image file"""
         try:
-            with Image.open(file_path) as img:
-                metadata = {
-                    'exif': {},
-                    'iptc': {},
-                    'xmp': {}
-                }
-                
-                # Extract EXIF data
-                if hasattr(img, '_getexif') and img._getexif():
-                    exif_data = img._getexif()
-                    for tag_id, value in exif_data.items():
-                        tag = TAGS.get(tag_id, tag_id)
-                        
-                        # Handle GPS data specially
-                        if tag == 'GPSInfo':
-                            gps_data = {}
-                            for gps_tag_id, gps_value in value.items():
-                                gps_tag = GPSTAGS.get(gps_tag_id, gps_tag_id)
-                                gps_data[gps_tag] = gps_value
-                            metadata['exif'][tag] = gps_data
-                        else:
-                            # Convert bytes to string if needed
-                            if isinstance(value, bytes):
-                                try:
-                                    value = value.decode('utf-8')
-                                except UnicodeDecodeError:
-                                    value = str(value)
-                            metadata['exif'][tag] = value
-                
-                # Note: IPTC and XMP extraction would require additional libraries
-                # like iptcinfo3 and python-xmp-toolkit for full implementation
-                
-                return metadata
-                
+            return self.metadata_cache.get(file_path)[0]
         except Exception as e:
             self.log_message(f"Error extracting metadata from {file_path}: {str(e)}")
             return None
@@ -1159,257 +1413,343 @@ class MetadataManagerGUI:
             if not custom_metadata:
                 messagebox.showwarning("No Metadata", "Please enter some metadata to apply to the images.")
                 return
+            try:
+                metadata_engine.build_exif_blob(custom_metadata)
+            except ValueError as e:
+                messagebox.showwarning("Invalid Metadata", str(e))
+                return
         else:
             # In basic mode, check if any removal options are selected
-            if not (self.remove_exif.get() or self.remove_iptc.get() or self.remove_xmp.get()):
+            if not (self.remove_exif.get() or self.remove_iptc.get() or self.remove_xmp.get()
+                    or self.scrub_exif.get()):
                 messagebox.showwarning("No Options", "Please select at least one type of metadata to remove.")
                 return
+            try:
+                metadata_engine.scrub_policy(self.get_processing_settings())
+            except ValueError as e:
+                messagebox.showwarning("Invalid Tag", str(e))
+                return
         
         # Disable process button during processing
         self.process_btn.configure(state='disabled', text='Processing...')
         self.progress_var.set(0)
         self.progress_text.delete(1.0, tk.END)
+        self.file_list.clear_statuses()
+        self.metrics_label.configure(text="")
+        
+        # Full log goes to a rotating file when requested
+        if self.log_to_file.get():
+            self.log_sink.set_log_file(default_log_path())
+            self.log_message(f"Full log: {default_log_path()}")
+        else:
+            self.log_sink.set_log_file(None)
+        
+        # Snapshot settings on the Tk thread; workers never touch Tk variables
+        manifest_path = default_manifest_path() if self.skip_unchanged.get() else None
+        engine_class = PipelineEngine if self.pipeline_io.get() else BatchEngine
+        self.batch_control = BatchControl()
+        engine = engine_class(self.get_processing_settings(), jobs=self.worker_count.get(),
+                              manifest_path=manifest_path,
+                              checkpoint_path=default_checkpoint_path(),
+                              control=self.batch_control)
+        self.pause_btn.configure(state='normal', text="⏸️ Pause")
+        self.cancel_btn.configure(state='normal')
         
         # Start processing in separate thread
-        processing_thread = threading.Thread(target=self.process_files)
+        processing_thread = threading.Thread(target=self.process_files,
+                                             args=(engine, list(self.selected_files)))
         processing_thread.daemon = True
         processing_thread.start()
+        self.root.after(50, self.poll_processing_events)
+    
+    def start_audit(self):
+        """Report the metadata of the listed files to a CSV or JSON Lines file"""
+        if not self.selected_files:
+            messagebox.showwarning("No Files", "Please select files to audit.")
+            return
+        if self.batch_control is not None:
+            return
+        
+        report_path = filedialog.asksaveasfilename(title="Save Audit Report",
+                                                   defaultextension=".csv",
+                                                   filetypes=[("CSV files", "*.csv"),
+                                                              ("JSON Lines", "*.jsonl")])
+        if not report_path:
+            return
+        
+        self.process_btn.configure(state='disabled', text='Auditing...')
+        self.progress_var.set(0)
+        self.progress_text.delete(1.0, tk.END)
+        self.metrics_label.configure(text="")
+        self.batch_control = BatchControl()
+        self.cancel_btn.configure(state='normal')
+        
+        audit_thread = threading.Thread(target=self.run_audit,
+                                        args=(report_path, list(self.selected_files),
+                                              self.worker_count.get(), self.batch_control))
+        audit_thread.daemon = True
+        audit_thread.start()
+        self.root.after(50, self.poll_processing_events)
     
-    def process_files(self):
-        """Process all selected files"""
+    def run_audit(self, report_path, files, jobs, control):
+        """Audit files header-only on worker processes (runs on the audit thread)"""
+        events = self.event_queue
+        log = self.log_sink.write
         try:
-            self.processed_files.clear()
-            total_files = len(self.selected_files)
-            successful = 0
-            failed = 0
-            
-            mode_desc = "metadata editing" if self.advanced_mode.get() else "metadata removal"
-            self.log_message(f"Starting {mode_desc} process...")
-            self.log_message(f"Processing {total_files} files...")
+            total_files = len(files)
+            log(f"Auditing metadata of {total_files} files with {jobs} worker processes...")
             
-            for i, file_path in enumerate(self.selected_files):
-                try:
-                    # Update progress
-                    progress = (i / total_files) * 100
-                    self.progress_var.set(progress)
-                    
-                    filename = os.path.basename(file_path)
-                    self.log_message(f"Processing: {filename}")
-                    
-                    # Process the file
-                    if self.process_single_file(file_path):
-                        successful += 1
-                        self.processed_files.append(file_path)
-                    else:
-                        failed += 1
-                        
-                except Exception as e:
-                    self.log_message(f"Error processing {filename}: {str(e)}")
-                    failed += 1
-            
-            # Final progress
-            self.progress_var.set(100)
+            def track(findings):
+                for i, finding in enumerate(findings):
+                    if finding['error']:
+                        log(f"  ⚠️ {os.path.basename(finding['path'])}: {finding['error']}")
+                    if i % 256 == 255:
+                        events.put(('progress', ((i + 1) / total_files) * 100))
+                    yield finding
             
-            # Show results
-            self.log_message("\n" + "=" * 40)
-            self.log_message("PROCESSING COMPLETE")
-            self.log_message("=" * 40)
-            self.log_message(f"Total files: {total_files}")
-            self.log_message(f"Successful: {successful}")
-            self.log_message(f"Failed: {failed}")
+            paths = takewhile(lambda path: not control.cancelled, files)
+            with open(report_path, 'w', newline='', encoding='utf-8') as out:
+                summary = write_findings(track(audit_files(paths, jobs=jobs)), out,
+                                         audit_format_for(report_path))
             
-            # Update results label
-            if failed == 0:
-                self.results_label.configure(text=f"✅ Successfully processed {successful} files", 
-                                           fg=self.colors['success'])
-                self.status_var.set("All files processed successfully!")
-            else:
-                self.results_label.configure(text=f"⚠️ Processed {successful}, Failed {failed}", 
-                                           fg=self.colors['warning'])
-                self.status_var.set(f"Processing complete with {failed} errors")
+            log("\n" + "=" * 40)
+            log("AUDIT CANCELLED" if control.cancelled else "AUDIT COMPLETE")
+            log("=" * 40)
+            for line in summary.format_table().splitlines():
+                log(line)
+            log(f"Audit report: {report_path}")
+            events.put(('audited', summary.files, summary.flags['gps'], summary.flags['serial']))
             
         except Exception as e:
-            self.log_message(f"Critical error during processing: {str(e)}")
-            self.results_label.configure(text="❌ Processing failed", fg=self.colors['danger'])
+            log(f"Critical error during audit: {str(e)}")
+            events.put(('failed',))
             
         finally:
-            # Re-enable process button with appropriate text
-            button_text = "✏️ Apply Metadata" if self.advanced_mode.get() else "🗑️ Remove Metadata"
-            self.root.after(0, lambda: self.process_btn.configure(state='normal', text=button_text))
+            events.put(('done',))
+    
+    def toggle_pause(self):
+        """Pause the batch after the files in progress, or resume it"""
+        control = self.batch_control
+        if control is None or control.cancelled:
+            return
+        if control.paused:
+            control.resume()
+            self.pause_btn.configure(text="⏸️ Pause")
+            self.status_var.set("Processing resumed")
+        else:
+            control.pause()
+            self.pause_btn.configure(text="▶️ Resume")
+            self.status_var.set("Paused after the files in progress")
     
-    def process_single_file(self, file_path):
-        """Process a single file to remove or edit metadata"""
+    def cancel_processing(self):
+        """Stop the batch after the files in progress; it can be resumed later"""
+        if self.batch_control is None:
+            return
+        self.batch_control.cancel()
+        self.pause_btn.configure(state='disabled', text="⏸️ Pause")
+        self.cancel_btn.configure(state='disabled')
+        self.status_var.set("Cancelling after the files in progress...")
+    
+    def get_scrub_tags(self):
+        """EXIF tag names or IDs entered for scrubbing, comma-separated"""
+        return [tag.strip() for tag in self.scrub_tags_var.get().split(',') if tag.strip()]
+    
+    def get_processing_settings(self):
+        """Collect the current settings as a plain dict for the batch engine"""
+        return {
+            'advanced_mode': self.advanced_mode.get(),
+            'remove_exif': self.remove_exif.get(),
+            'remove_iptc': self.remove_iptc.get(),
+            'remove_xmp': self.remove_xmp.get(),
+            'scrub_exif': self.scrub_exif.get(),
+            'scrub_tags': self.get_scrub_tags(),
+            'create_backup': self.create_backup.get(),
+            'backup_mode': self.backup_modes.get(self.backup_mode_var.get(), 'link'),
+            'overwrite_original': self.overwrite_original.get(),
+            'durability': self.durability_modes.get(self.durability_var.get(), 'batch'),
+            'output_dir': self.output_path_var.get(),
+            'custom_metadata': self.get_custom_metadata(),
+        }
+    
+    def process_files(self, engine, files):
+        """Process all selected files (runs on the processing thread).
+        
+        Files are fanned out to the engine's worker processes. Log lines go
+        to self.log_sink; progress, row status and the final summary are
+        posted to self.event_queue and applied on the Tk thread by
+        poll_processing_events. Stage timings are aggregated into a
+        BatchMetrics and exported as JSON when the batch ends. Progress is
+        checkpointed, so a cancelled or crashed batch started again with
+        the same files and settings resumes where it stopped.
+        """
+        events = self.event_queue
+        log = self.log_sink.write
+        metrics = BatchMetrics()
         try:
-            # Get original file extension for proper PIL handling
-            original_ext = os.path.splitext(file_path)[1]
+            self.processed_files.clear()
+            total_files = len(files)
+            successful = 0
+            failed = 0
+            skipped = 0
+            clean = 0
+            resumed = 0
+            completed = 0
             
-            # Check if format is supported
-            if original_ext.lower() not in self.supported_formats:
-                self.log_message(f"  ❌ Unsupported format: {original_ext}")
-                return False
+            mode_desc = "metadata editing" if engine.settings['advanced_mode'] else "metadata removal"
+            log(f"Starting {mode_desc} process...")
+            log(f"Processing {total_files} files with {engine.jobs} worker processes...")
             
-            # Determine output path
-            if self.overwrite_original.get():
-                output_path = file_path
-                # Use original extension for temp file so PIL can handle it
-                temp_path = file_path.replace(original_ext, f"_temp{original_ext}")
-            else:
-                output_dir = getattr(self, 'output_path_var', tk.StringVar(value="Same as source")).get()
-                if output_dir == "Same as source":
-                    output_dir = os.path.dirname(file_path)
+            # Results arrive in submission order, so progress stays sequential
+            for i, result in engine.run(files):
+                log(f"Processing: {os.path.basename(result['path'])}")
+                for line in result['log']:
+                    log(line)
+                metrics.add(result['metrics'])
                 
-                filename = os.path.basename(file_path)
-                name, ext = os.path.splitext(filename)
-                
-                if self.advanced_mode.get():
-                    output_path = os.path.join(output_dir, f"{name}_edited{ext}")
+                completed = i + 1
+                if result['skipped'] == 'unchanged':
+                    skipped += 1
+                elif result['skipped'] == 'resumed':
+                    resumed += 1
+                elif result['skipped'] == 'clean':
+                    clean += 1
+                elif result['success']:
+                    successful += 1
+                    self.processed_files.append(result['path'])
+                    self.metadata_cache.invalidate(result['path'])
                 else:
-                    output_path = os.path.join(output_dir, f"{name}_no_metadata{ext}")
-                # Use original extension for temp file so PIL can handle it
-                temp_path = output_path.replace(ext, f"_temp{ext}")
-            
-            # Create backup if requested
-            if self.create_backup.get() and not self.overwrite_original.get():
-                backup_path = file_path + ".backup"
-                if not os.path.exists(backup_path):
-                    shutil.copy2(file_path, backup_path)
-                    self.log_message(f"  Backup created: {os.path.basename(backup_path)}")
-            
-            # Process the image
-            with Image.open(file_path) as img:
-                # Handle different modes
-                if self.advanced_mode.get():
-                    # Advanced mode: Add/edit metadata
-                    processed_img = self.apply_custom_metadata(img, file_path)
-                else:
-                    # Basic mode: Remove metadata
-                    processed_img = self.remove_metadata(img)
-                
-                # Save processed image
-                save_kwargs = {}
-                
-                # Determine format from extension
-                file_format = None
-                ext_lower = original_ext.lower()
-                if ext_lower in ['.jpg', '.jpeg']:
-                    file_format = 'JPEG'
-                    save_kwargs['quality'] = 95
-                    save_kwargs['optimize'] = True
-                elif ext_lower == '.png':
-                    file_format = 'PNG'
-                    save_kwargs['optimize'] = True
-                elif ext_lower in ['.tiff', '.tif']:
-                    file_format = 'TIFF'
-                elif ext_lower == '.bmp':
-                    file_format = 'BMP'
-                elif ext_lower == '.webp':
-                    file_format = 'WEBP'
-                    save_kwargs['quality'] = 95
+                    failed += 1
                 
-                # Save to temporary file first with explicit format
-                if file_format:
-                    processed_img.save(temp_path, format=file_format, **save_kwargs)
+                if result['skipped']:
+                    status = result['skipped']
                 else:
-                    processed_img.save(temp_path, **save_kwargs)
-            
-            # Move temp file to final location
-            if os.path.exists(temp_path):
-                if self.overwrite_original.get():
-                    # Replace original
-                    if os.path.exists(file_path):
-                        os.remove(file_path)
-                    os.rename(temp_path, file_path)
-                    action = "updated" if self.advanced_mode.get() else "cleaned"
-                    self.log_message(f"  ✅ Original file {action}")
-                else:
-                    # Move to output location
-                    if os.path.exists(output_path):
-                        os.remove(output_path)
-                    os.rename(temp_path, output_path)
-                    action = "edited" if self.advanced_mode.get() else "clean"
-                    self.log_message(f"  ✅ {action.title()} file saved: {os.path.basename(output_path)}")
+                    status = 'done' if result['success'] else 'failed'
+                events.put(('status', i, status))
                 
-                return True
+                events.put(('progress', ((i + 1) / total_files) * 100))
+            
+            # Show results
+            cancelled = engine.control.cancelled and completed < total_files
+            log("\n" + "=" * 40)
+            log("PROCESSING CANCELLED" if cancelled else "PROCESSING COMPLETE")
+            log("=" * 40)
+            log(f"Total files: {total_files}")
+            if cancelled:
+                log(f"Stopped after: {completed}")
+            log(f"Successful: {successful}")
+            log(f"Failed: {failed}")
+            log(f"Already clean: {clean}")
+            log(f"Skipped (unchanged): {skipped}")
+            log(f"Done in an earlier run: {resumed}")
+            if cancelled:
+                log("Start again with the same files and settings to resume")
+            
+            # Stage timings: percentiles in the results panel, full report as JSON
+            metrics.finish()
+            events.put(('metrics', metrics.format_table()))
+            try:
+                report_path = os.path.join(default_metrics_dir(),
+                                           f"batch-{datetime.now():%Y%m%d-%H%M%S}.json")
+                metrics.export(report_path)
+                log(f"Timing report: {report_path}")
+            except OSError as e:
+                log(f"Could not save timing report: {str(e)}")
+            if cancelled:
+                events.put(('cancelled', completed, total_files))
             else:
-                self.log_message(f"  ❌ Failed to create processed file")
-                return False
-                
+                events.put(('finished', successful, failed, skipped, clean, resumed))
+            
         except Exception as e:
-            self.log_message(f"  ❌ Error: {str(e)}")
-            # Clean up temp file if it exists
-            if 'temp_path' in locals() and os.path.exists(temp_path):
-                os.remove(temp_path)
-            return False
-    
-    def remove_metadata(self, img):
-        """Remove metadata from image (basic mode)"""
-        # Convert to RGB if necessary (for JPEG compatibility)
-        if img.mode in ('RGBA', 'LA', 'P'):
-            background = Image.new('RGB', img.size, (255, 255, 255))
-            if img.mode == 'P':
-                img = img.convert('RGBA')
-            background.paste(img, mask=img.split()[-1] if img.mode in ('RGBA', 'LA') else None)
-            img = background
-        
-        # Create new image without metadata
-        clean_img = Image.new(img.mode, img.size)
-        clean_img.putdata(list(img.getdata()))
-        
-        return clean_img
+            log(f"Critical error during processing: {str(e)}")
+            events.put(('failed',))
+            
+        finally:
+            events.put(('done',))
     
-    def apply_custom_metadata(self, img, file_path):
-        """Apply custom metadata to image (advanced mode)"""
-        # Get custom metadata from form
-        custom_metadata = self.get_custom_metadata()
-        
-        if not custom_metadata:
-            self.log_message(f"  ⚠️ No custom metadata to apply")
-            return img
-        
-        # Create new image with metadata
-        processed_img = img.copy()
-        
-        # Prepare EXIF data
-        exif_dict = {}
-        
-        # Convert our custom metadata to EXIF format
-        exif_mapping = {
-            'Artist': 'Artist',
-            'Copyright': 'Copyright', 
-            'ImageDescription': 'ImageDescription',
-            'Software': 'Software',
-            'Make': 'Make',
-            'Model': 'Model',
-            'DateTime': 'DateTime'
-        }
-        
-        for custom_field, exif_field in exif_mapping.items():
-            if custom_field in custom_metadata:
-                # Find the EXIF tag number
-                for tag_num, tag_name in TAGS.items():
-                    if tag_name == exif_field:
-                        exif_dict[tag_num] = custom_metadata[custom_field]
-                        break
-        
-        # Apply EXIF data if we have any
-        if exif_dict:
+    def poll_processing_events(self):
+        """Apply queued events from the processing thread on the Tk thread"""
+        statuses = []
+        done = False
+        while True:
             try:
-                # This is a simplified approach - full EXIF manipulation
-                # would require more sophisticated handling
-                self.log_message(f"  ✏️ Applied {len(exif_dict)} metadata fields")
-            except Exception as e:
-                self.log_message(f"  ⚠️ Could not apply all metadata: {str(e)}")
-        
-        return processed_img
+                event = self.event_queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            kind = event[0]
+            if kind == 'status':
+                statuses.append(event[1:])
+            elif kind == 'progress':
+                self.progress_var.set(event[1])
+            elif kind == 'finished':
+                self.show_results(*event[1:])
+            elif kind == 'audited':
+                self.progress_var.set(100)
+                self.results_label.configure(
+                    text=f"🔍 Audited {event[1]} files: {event[2]} with GPS, {event[3]} with serial numbers",
+                    fg=self.colors['primary'])
+                self.status_var.set("Audit complete")
+            elif kind == 'cancelled':
+                self.results_label.configure(text=f"⏹️ Cancelled after {event[1]} of {event[2]} files",
+                                           fg=self.colors['warning'])
+                self.status_var.set("Processing cancelled; start again to resume")
+            elif kind == 'metrics':
+                self.metrics_label.configure(text=event[1])
+            elif kind == 'failed':
+                self.results_label.configure(text="❌ Processing failed", fg=self.colors['danger'])
+            elif kind == 'done':
+                done = True
+        
+        if statuses:
+            self.file_list.set_statuses(statuses)
+        
+        if done:
+            # Re-enable process button with appropriate text
+            button_text = "✏️ Apply Metadata" if self.advanced_mode.get() else "🗑️ Remove Metadata"
+            self.process_btn.configure(state='normal', text=button_text)
+            self.pause_btn.configure(state='disabled', text="⏸️ Pause")
+            self.cancel_btn.configure(state='disabled')
+            self.batch_control = None
+        else:
+            self.root.after(50, self.poll_processing_events)
+    
+    def show_results(self, successful, failed, skipped=0, clean=0, resumed=0):
+        """Update the results label and status bar after a batch"""
+        self.progress_var.set(100)
+        skipped_text = ""
+        if resumed:
+            skipped_text += f", {resumed} done earlier"
+        if clean:
+            skipped_text += f", {clean} already clean"
+        if skipped:
+            skipped_text += f", skipped {skipped} unchanged"
+        if failed == 0:
+            self.results_label.configure(text=f"✅ Successfully processed {successful} files{skipped_text}", 
+                                       fg=self.colors['success'])
+            self.status_var.set("All files processed successfully!")
+        else:
+            self.results_label.configure(text=f"⚠️ Processed {successful}, Failed {failed}{skipped_text}", 
+                                       fg=self.colors['warning'])
+            self.status_var.set(f"Processing complete with {failed} errors")
     
     def log_message(self, message):
         """Add message to progress text (thread-safe)"""
-        def update_log():
-            self.progress_text.insert(tk.END, message + "\n")
+        self.log_sink.write(message)
+    
+    def flush_log(self):
+        """Move buffered log lines into the progress text, once per frame"""
+        lines = self.log_sink.drain()
+        if lines and self.progress_text:
+            self.progress_text.insert(tk.END, "\n".join(lines) + "\n")
+            
+            # Keep only the newest lines on screen; the log file has the rest
+            line_count = int(self.progress_text.index('end-1c').split('.')[0]) - 1
+            excess = line_count - self.log_sink.max_lines
+            if excess > 0:
+                self.progress_text.delete('1.0', f'{excess + 1}.0')
             self.progress_text.see(tk.END)
-            self.root.update_idletasks()
         
-        self.root.after(0, update_log)
+        self.root.after(self.log_frame_ms, self.flush_log)
     
     def setup_responsive_layout(self):
         """Setup responsive layout handling"""
@@ -1506,4 +1846,6 @@ This library is required for image processing and metadata removal.
 
 
 if __name__ == "__main__":
+    # Required for worker processes in the frozen Windows executable
+    multiprocessing.freeze_support()
     main()
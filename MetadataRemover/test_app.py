@@ -17,7 +17,7 @@ try:
     required_attrs = [
         'root', 'colors', 'selected_files', 'processed_files',
         'advanced_mode', 'progress_var', 'status_var',
-        'file_listbox', 'file_count_label', 'progress_text',
+        'file_list', 'file_count_label', 'progress_text',
         'results_label', 'settings_container'
     ]
     
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for the header-only bulk metadata audit in metadata_audit.
+Run with: python -m pytest test_audit.py
+"""
+
+import csv
+import io
+import json
+
+from PIL import Image, PngImagePlugin
+
+import metadata_formats
+from metadata_audit import AuditSummary, audit_file, audit_files, write_findings
+from metadata_cli import main
+from test_formats import jpeg_segment, make_exif_with_thumbnail, make_jpeg, make_png, make_tiff
+
+
+XMP_PACKET = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF><rdf:Description '
+              b'aux:SerialNumber="42" exif:GPSLatitude="52,22N">'
+              b'<dc:subject><rdf:Bag><rdf:li>secret</rdf:li></rdf:Bag></dc:subject>'
+              b'</rdf:Description></rdf:RDF></x:xmpmeta>')
+
+
+def make_tagged_jpeg():
+    """A JPEG with a serial number, a thumbnail, XMP properties and IPTC keywords"""
+    iim = b'\x1c\x02\x19\x00\x06secret' + b'\x1c\x02\x78\x00\x07caption'
+    resource = b'8BIM\x04\x04\x00\x00' + len(iim).to_bytes(4, 'big') + iim + b'\x00' * (len(iim) & 1)
+    jpeg = make_jpeg()
+    return (b'\xff\xd8'
+            + jpeg_segment(0xE1, metadata_formats.EXIF_HEADER + make_exif_with_thumbnail())
+            + jpeg_segment(0xE1, metadata_formats.XMP_HEADER + XMP_PACKET)
+            + jpeg_segment(0xED, metadata_formats.PHOTOSHOP_HEADER + resource)
+            + jpeg[2:])
+
+
+def test_audit_file_reports_findings_and_tags(tmp_path):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(make_tagged_jpeg())
+    finding = audit_file(str(photo))
+
+    assert finding['error'] is None
+    assert all(finding[flag] for flag in ('exif', 'gps', 'serial', 'thumbnail', 'xmp', 'iptc'))
+    assert finding['make'] == "TestCam"
+    for tag in ('EXIF:Make', 'EXIF:BodySerialNumber', 'EXIF:GPSLatitude',
+                'XMP:aux:SerialNumber', 'XMP:dc:subject', 'IPTC:Keywords', 'IPTC:Caption-Abstract'):
+        assert tag in finding['tags']
+    assert not any(tag.startswith('XMP:rdf:') for tag in finding['tags'])
+
+
+def test_audit_handles_every_container(tmp_path):
+    (tmp_path / "a.png").write_bytes(make_png())
+    (tmp_path / "b.tif").write_bytes(make_tiff())
+    (tmp_path / "c.jpg").write_bytes(b'\xff\xd8 not a jpeg')
+    files = [str(tmp_path / name) for name in ("a.png", "b.tif", "c.jpg")]
+
+    png, tiff, broken = list(audit_files(files, jobs=2, chunk_size=1))
+    assert png['gps'] and png['xmp'] and png['comment'] and not png['error']
+    assert tiff['make'] == "TestCam" and tiff['iptc'] and not tiff['error']
+    assert 'EXIF:ImageWidth' not in tiff['tags']
+    assert broken['error']
+
+
+def raw_profile_text(name, payload):
+    """The text ImageMagick stores in a "Raw profile type <name>" chunk"""
+    hex_data = payload.hex()
+    lines = "\n".join(hex_data[i:i + 72] for i in range(0, len(hex_data), 72))
+    return f"\n{name}\n{len(payload):8d}\n{lines}\n"
+
+
+def test_audit_decodes_png_raw_profiles(tmp_path):
+    iim = b'\x1c\x02\x19\x00\x06secret'
+    resource = b'8BIM\x04\x04\x00\x00' + len(iim).to_bytes(4, 'big') + iim + b'\x00'
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Raw profile type exif",
+                  raw_profile_text("exif", metadata_formats.EXIF_HEADER + make_exif_with_thumbnail()),
+                  zip=True)
+    info.add_text("Raw profile type 8bim", raw_profile_text("8bim", resource))
+    path = tmp_path / "profiles.png"
+    Image.new('RGB', (8, 8)).save(path, pnginfo=info)
+
+    finding = audit_file(str(path))
+    assert finding['gps'] and finding['serial'] and finding['make'] == "TestCam"
+    assert 'IPTC:Keywords' in finding['tags']
+
+
+def test_findings_stream_as_csv_and_jsonl(tmp_path):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(make_tagged_jpeg())
+    findings = [audit_file(str(photo)), audit_file(str(photo))]
+
+    out = io.StringIO()
+    summary = write_findings(findings, out, 'csv')
+    rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert len(rows) == 2 and rows[0]['gps'] == 'True'
+    assert 'EXIF:BodySerialNumber' in rows[0]['tags'].split(';')
+    assert summary.tags['IPTC:Keywords'] == 2
+    assert summary.to_dict()['flags']['serial'] == 2
+
+    out = io.StringIO()
+    write_findings(findings, out, 'jsonl', AuditSummary())
+    assert json.loads(out.getvalue().splitlines()[1])['path'] == str(photo)
+
+
+def test_cli_audit_changes_nothing(tmp_path, capsys):
+    photo = tmp_path / "photo.jpg"
+    photo.write_bytes(make_tagged_jpeg())
+    original = photo.read_bytes()
+    report = tmp_path / "report.csv"
+
+    assert main([str(tmp_path), '--audit', str(report), '--jobs', '1']) == 0
+    assert photo.read_bytes() == original
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["photo.jpg", "report.csv"]
+    assert "EXIF:BodySerialNumber" in capsys.readouterr().err
+    assert report.read_text().startswith("path,format,size,exif,gps")
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for the linked and content-addressed backups in metadata_backup.
+Run with: python -m pytest test_backup.py
+"""
+
+import os
+
+from metadata_backup import BackupStore, make_backup
+from metadata_engine import process_file
+from test_engine import make_settings
+from test_formats import make_jpeg, make_tiff
+
+
+def test_link_and_copy_modes(tmp_path):
+    source = tmp_path / "photo.jpg"
+    source.write_bytes(make_jpeg())
+
+    method = make_backup(str(source), str(tmp_path / "linked.backup"), 'link')
+    assert method in ('reflink', 'link')
+    if method == 'link':
+        assert os.stat(tmp_path / "linked.backup").st_ino == os.stat(source).st_ino
+
+    method = make_backup(str(source), str(tmp_path / "copied.backup"), 'copy', data=source.read_bytes())
+    assert method in ('reflink', 'copy')
+    assert os.stat(tmp_path / "copied.backup").st_ino != os.stat(source).st_ino
+    assert (tmp_path / "copied.backup").read_bytes() == source.read_bytes()
+
+
+def test_store_deduplicates_identical_originals(tmp_path):
+    store_root = str(tmp_path / "store")
+    first, second = tmp_path / "a.jpg", tmp_path / "b.jpg"
+    first.write_bytes(make_jpeg())
+    second.write_bytes(make_jpeg())
+
+    assert make_backup(str(first), str(first) + ".backup", 'store', store_root=store_root) == 'stored'
+    assert make_backup(str(second), str(second) + ".backup", 'store', store_root=store_root) == 'deduplicated'
+
+    objects = [name for _, _, names in os.walk(tmp_path / "store" / "objects") for name in names]
+    assert len(objects) == 1
+    assert (tmp_path / "b.jpg.backup").read_bytes() == second.read_bytes()
+
+    store = BackupStore(store_root)
+    second.write_bytes(b'changed')
+    store.restore(str(second))
+    assert second.read_bytes() == first.read_bytes()
+
+
+def test_linked_backup_survives_later_overwrite(tmp_path):
+    source = tmp_path / "scan.tif"
+    source.write_bytes(make_tiff())
+    original = source.read_bytes()
+
+    result = process_file(str(source), make_settings(create_backup=True, backup_mode='link'))
+    assert result['success']
+    assert any("Backup created: scan.tif.backup" in line for line in result['log'])
+
+    # Overwriting must not patch the shared inode in place
+    result = process_file(str(source), make_settings(overwrite_original=True))
+    assert result['success']
+    assert source.read_bytes() != original
+    assert (tmp_path / "scan.tif.backup").read_bytes() == original
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the synthetic corpus and baseline checks in benchmark.
+Run with: python -m pytest test_benchmark.py
+"""
+
+import json
+
+from benchmark import CORPUS_FORMATS, compare_to_baseline, generate_corpus, main
+from metadata_formats import probe_file
+
+
+def test_corpus_is_deterministic_and_carries_metadata(tmp_path):
+    first = generate_corpus(str(tmp_path / "a"), files_per_format=1, size=(64, 48),
+                            makernote_size=2048, xmp_size=512)
+    second = generate_corpus(str(tmp_path / "b"), files_per_format=1, size=(64, 48),
+                             makernote_size=2048, xmp_size=512)
+
+    assert [path[-4:].lstrip('.') for path in first] == [ext.lstrip('.') for ext in CORPUS_FORMATS]
+    for a, b in zip(first, second):
+        with open(a, 'rb') as fa, open(b, 'rb') as fb:
+            assert fa.read() == fb.read()
+
+    expected = {'.jpg': {'exif', 'xmp', 'iptc'}, '.png': {'exif', 'xmp', 'iptc'},
+                '.tif': {'exif', 'xmp', 'iptc'}, '.webp': {'exif', 'xmp'}}
+    for path in first:
+        ext = path[path.rindex('.'):]
+        if ext in expected:
+            assert expected[ext] <= probe_file(path)
+
+
+def test_compare_to_baseline_flags_regressions():
+    baseline = {'basic': {'files_per_sec': 100.0, 'mb_per_sec': 50.0, 'peak_rss': 100 * 2**20}}
+    steady = {'basic': {'files_per_sec': 90.0, 'mb_per_sec': 45.0, 'peak_rss': 110 * 2**20}}
+    slower = {'basic': {'files_per_sec': 60.0, 'mb_per_sec': 45.0, 'peak_rss': 200 * 2**20}}
+
+    assert compare_to_baseline(steady, baseline, 0.25) == []
+    regressions = compare_to_baseline(slower, baseline, 0.25)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("basic: files_per_sec")
+    assert compare_to_baseline({'extract': steady['basic']}, baseline) == []
+
+
+def test_benchmark_run_against_baseline(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+    options = ['--files-per-format', '1', '--width', '64', '--height', '48',
+               '--makernote-kb', '1', '--jobs', '1', '--corpus', str(tmp_path / "corpus")]
+
+    assert main(options + ['--save-baseline', str(baseline)]) == 0
+    saved = json.loads(baseline.read_text())
+    assert set(saved) == {'basic', 'advanced', 'extract'}
+    assert all(result['failed'] == 0 for result in saved.values())
+
+    # An impossible baseline must fail the run
+    for result in saved.values():
+        result['files_per_sec'] *= 1000
+    baseline.write_text(json.dumps(saved))
+    assert main(options + ['--baseline', str(baseline)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for pausing, cancelling and resuming batches via metadata_checkpoint.
+Run with: python -m pytest test_checkpoint.py
+"""
+
+import json
+import os
+import threading
+
+from metadata_checkpoint import BatchCheckpoint, BatchControl
+from metadata_engine import BatchEngine
+from metadata_pipeline import PipelineEngine
+from test_engine import make_batch, make_settings
+
+
+def test_cancelled_batch_resumes_where_it_stopped(tmp_path):
+    files = make_batch(tmp_path, 8)
+    checkpoint = str(tmp_path / "checkpoint.json")
+    # Report each file as soon as it is done, not at grouped commits
+    settings = make_settings(durability='none')
+
+    control = BatchControl()
+    engine = BatchEngine(settings, jobs=1, checkpoint_path=checkpoint, control=control)
+    results = []
+    for index, result in engine.run(files):
+        results.append(index)
+        if index == 2:
+            control.cancel()
+    assert results == [0, 1, 2]
+    with open(checkpoint) as f:
+        assert json.load(f)['completed'] == 3
+
+    # Other settings make a different batch, which starts from scratch
+    assert BatchCheckpoint(checkpoint, files, make_settings(durability='none', remove_xmp=False)).completed == 0
+
+    engine = BatchEngine(settings, jobs=2, checkpoint_path=checkpoint)
+    results = list(engine.run(files))
+    assert [index for index, _ in results] == list(range(len(files)))
+    assert [result['skipped'] for _, result in results[:3]] == ['resumed'] * 3
+    assert all(result['skipped'] is None for _, result in results[3:])
+    assert not os.path.exists(checkpoint)
+
+
+def test_paused_batch_drains_commits_and_continues(tmp_path):
+    for engine_class in (BatchEngine, PipelineEngine):
+        folder = tmp_path / engine_class.__name__
+        folder.mkdir()
+        files = make_batch(folder, 10)
+        control = BatchControl()
+        engine = engine_class(make_settings(durability='batch'), jobs=2,
+                              checkpoint_path=str(folder / "checkpoint.json"), control=control)
+
+        results = []
+        for index, result in engine.run(files):
+            results.append(index)
+            if index == 0:
+                control.pause()
+                threading.Timer(0.3, control.resume).start()
+            # Every reported file is already in place
+            name, ext = os.path.splitext(files[index])
+            assert os.path.exists(f"{name}_no_metadata{ext}")
+        assert results == list(range(len(files)))
+        assert not os.path.exists(folder / "checkpoint.json")
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Tests for the headless command-line interface in metadata_cli.
+Run with: python -m pytest test_cli.py
+"""
+
+import io
+import json
+import os
+import struct
+import subprocess
+import sys
+
+import metadata_formats
+from metadata_cli import expand_paths, main
+from metadata_engine import extract_metadata
+from test_engine import make_batch
+from test_formats import jpeg_segment, make_jpeg
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_cli(*argv):
+    """Run the CLI in-process and return (exit code, parsed JSON lines)"""
+    out = io.StringIO()
+    code = main(list(argv), out=out)
+    return code, [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_expand_paths_handles_folders_globs_and_duplicates(tmp_path):
+    nested = tmp_path / "nested"
+    nested.mkdir()
+    files = make_batch(tmp_path, 2) + make_batch(nested, 2)
+    (tmp_path / "notes.txt").write_text("not an image")
+
+    found = list(expand_paths([str(tmp_path), str(tmp_path / "**" / "*.png")]))
+
+    assert sorted(found) == sorted(files)
+    assert len(found) == len(set(found))
+
+
+def test_cli_prints_one_json_line_per_file(tmp_path):
+    files = make_batch(tmp_path, 4)
+    output_dir = tmp_path / "clean"
+
+    code, results = run_cli(*files, '--jobs', '2', '--no-backup', '--output-dir', str(output_dir))
+
+    assert code == 0
+    assert [result['path'] for result in results] == files
+    assert [result['index'] for result in results] == list(range(4))
+    assert all(result['success'] for result in results)
+    assert len(os.listdir(output_dir)) == 4
+    assert not list(tmp_path.glob("*.backup"))
+
+
+def test_cli_exit_codes(tmp_path):
+    broken = tmp_path / "broken.bmp"
+    broken.write_bytes(b'BM')
+    code, results = run_cli(str(broken), '--jobs', '1', '--no-backup')
+    assert code == 1
+    assert not results[0]['success']
+
+    assert main([str(tmp_path / "missing" / "*.jpg")], out=io.StringIO()) == 2
+
+
+def test_extract_metadata_reads_exif(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(make_jpeg())
+
+    metadata = extract_metadata(str(path))
+
+    assert metadata['exif']['Make'] == 'TestCam'
+    assert metadata['exif']['GPSInfo']
+
+
+def test_extract_metadata_decodes_byte_and_undefined_values(tmp_path):
+    def ifd(entries):
+        return (struct.pack('<H', len(entries)) + b''.join(entries) + struct.pack('<I', 0))
+
+    exif_at = 8 + 2 + 2 * 12 + 4
+    gps_at = exif_at + 2 + 2 * 12 + 4
+    tiff = (b'II*\x00' + struct.pack('<I', 8)
+            + ifd([struct.pack('<HHII', 0x8769, 4, 1, exif_at),
+                   struct.pack('<HHII', 0x8825, 4, 1, gps_at)])
+            + ifd([struct.pack('<HHI', 0x9000, 7, 4) + b'0230',
+                   struct.pack('<HHI', 0x9101, 7, 4) + b'\x01\x02\x03\x00'])
+            + ifd([struct.pack('<HHI', 0, 1, 4) + b'\x02\x02\x00\x00',
+                   struct.pack('<HHI', 5, 1, 1) + b'\x01\x00\x00\x00']))
+    data = make_jpeg()
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(data[:2] + jpeg_segment(0xE1, b'Exif\x00\x00' + tiff) + data[2:])
+
+    exif = extract_metadata(str(path))['exif']
+
+    assert exif['GPSInfo']['GPSVersionID'] == (2, 2, 0, 0)
+    assert exif['GPSInfo']['GPSAltitudeRef'] == 1
+    assert exif['ExifVersion'] == '0230'
+    assert exif['ComponentsConfiguration'] == b'\x01\x02\x03\x00'
+
+
+def test_extract_metadata_reads_iptc_and_xmp(tmp_path):
+    xmp = (b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF '
+           b'xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"><rdf:Description '
+           b'xmlns:aux="http://ns.adobe.com/exif/1.0/aux/" aux:SerialNumber="12345" '
+           b'xmlns:dc="http://purl.org/dc/elements/1.1/"><dc:subject><rdf:Bag>'
+           b'<rdf:li>cat</rdf:li><rdf:li>dog</rdf:li></rdf:Bag></dc:subject>'
+           b'</rdf:Description></rdf:RDF></x:xmpmeta>')
+    iptc = b''.join(b'\x1c\x02\x19' + struct.pack('>H', len(word)) + word
+                    for word in (b'cat', b'dog'))
+    resource = b'8BIM\x04\x04\x00\x00' + struct.pack('>I', len(iptc)) + iptc
+    data = make_jpeg()
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(data[:2] + jpeg_segment(0xE1, metadata_formats.XMP_HEADER + xmp)
+                     + jpeg_segment(0xED, metadata_formats.PHOTOSHOP_HEADER + resource)
+                     + data[2:])
+
+    metadata = extract_metadata(str(path))
+
+    assert metadata['exif']['GPSInfo']['GPSLatitudeRef'] == 'N'
+    assert metadata['iptc'] == {'Keywords': ['cat', 'dog']}
+    assert metadata['xmp'] == {'aux:SerialNumber': '12345', 'dc:subject': ['cat', 'dog']}
+
+
+def test_command_line_start_does_not_import_tkinter(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(make_jpeg())
+    probe = ("import runpy, sys\n"
+             "sys.argv = ['metadataremover', sys.argv[1], '--jobs', '1', '--no-backup']\n"
+             "try:\n"
+             "    runpy.run_module('metadataremover', run_name='__main__')\n"
+             "finally:\n"
+             "    print('tkinter' in sys.modules, file=sys.stderr)\n")
+
+    proc = subprocess.run([sys.executable, '-c', probe, str(path)], cwd=HERE,
+                          capture_output=True, text=True)
+
+    assert proc.returncode == 0, proc.stderr
+    assert proc.stderr.strip().splitlines()[-1] == 'False'
+    assert json.loads(proc.stdout)['success']
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for the atomic, grouped output commits in metadata_commit.
+Run with: python -m pytest test_commit.py
+"""
+
+import os
+
+import metadata_commit
+from metadata_commit import CommitGroup, commit_file, new_temp_path
+from metadata_engine import BatchEngine, process_file, scan_images
+from metadata_pipeline import PipelineEngine
+from test_engine import make_batch, make_settings
+from test_formats import make_jpeg
+
+
+def test_commit_file_replaces_atomically(tmp_path):
+    target = tmp_path / "photo.jpg"
+    target.write_bytes(b'old')
+    for durability in ('none', 'file', 'batch'):
+        temp = new_temp_path(str(target))
+        assert os.path.dirname(temp) == str(tmp_path) and temp.endswith(".tmp")
+        with open(temp, 'wb') as f:
+            f.write(durability.encode())
+        commit_file(temp, str(target), durability)
+        assert target.read_bytes() == durability.encode()
+    assert os.listdir(tmp_path) == ["photo.jpg"]
+
+
+def test_batch_durability_defers_commits_to_a_checkpoint(tmp_path, monkeypatch):
+    source = make_batch(tmp_path, 1)[0]
+    original = open(source, 'rb').read()
+
+    result = process_file(source, make_settings(overwrite_original=True), True, True)
+    (temp, final), = result['commits']
+    assert final == source
+    assert open(source, 'rb').read() == original
+    assert result['state'][0] == os.path.getsize(temp)
+
+    # Checkpoints flush the held files only, never every filesystem
+    monkeypatch.delattr(os, 'sync', raising=False)
+    synced = []
+    monkeypatch.setattr(metadata_commit, 'fsync_file', synced.append)
+    group = CommitGroup(max_files=1)
+    group.add('item', result)
+    assert group.due()
+    assert group.commit() == ['item']
+    assert synced == [temp]
+    assert not os.path.exists(temp)
+    assert open(source, 'rb').read() != original
+    assert result['success']
+
+
+def test_failed_checkpoint_commit_fails_the_file(tmp_path):
+    result = {'path': 'a.jpg', 'success': True, 'log': [], 'state': (1, 2, 'x'),
+              'commits': [(str(tmp_path / "gone.tmp.jpg"), str(tmp_path / "a.jpg"))]}
+    group = CommitGroup()
+    group.add(0, result)
+    group.commit()
+    assert not result['success'] and 'state' not in result
+    assert result['log'][-1].startswith("  ❌ Error:")
+
+
+def test_engines_leave_no_temporary_files(tmp_path):
+    for engine_class in (BatchEngine, PipelineEngine):
+        for durability in ('none', 'file', 'batch'):
+            folder = tmp_path / f"{engine_class.__name__}_{durability}"
+            folder.mkdir()
+            files = make_batch(folder, 6)
+            engine = engine_class(make_settings(durability=durability), jobs=2,
+                                  manifest_path=str(folder / "manifest.sqlite3"))
+            results = list(engine.run(files))
+            assert [index for index, _ in results] == list(range(len(files)))
+            assert all(result['success'] for _, result in results)
+            names = os.listdir(folder)
+            assert not [name for name in names if ".tmp" in name]
+            assert sum(name.endswith("_no_metadata" + os.path.splitext(name)[1])
+                       for name in names) == len(files)
+
+
+def test_crash_leftovers_are_not_scanned_and_are_removed(tmp_path):
+    files = make_batch(tmp_path, 2)
+    stale = new_temp_path(files[0])
+    with open(stale, 'wb') as f:
+        f.write(b'partial')
+    # Only names new_temp_path makes are taken for leftovers
+    kept = tmp_path / ".photo.0123456789ab.tmp.jpg"
+    kept.write_bytes(make_jpeg())
+
+    assert sorted(scan_images(str(tmp_path))) == sorted(files + [str(kept)])
+    results = list(BatchEngine(make_settings(), jobs=1).run(files))
+    assert all(result['success'] for _, result in results)
+    assert not os.path.exists(stale) and kept.exists()
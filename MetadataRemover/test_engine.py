@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Tests for the batch processing engine in metadata_engine.
+Run with: python -m pytest test_engine.py
+"""
+
+import os
+import threading
+
+from PIL import Image
+
+import metadata_engine
+from metadata_engine import (DEFAULT_SETTINGS, BatchEngine, build_exif_blob, process_file,
+                             scan_images)
+from test_formats import make_jpeg, make_png, make_tiff
+
+
+def die_on_broken_files(file_path, *args):
+    """process_file, except that the worker process dies on files named broken"""
+    if "broken" in os.path.basename(file_path):
+        os._exit(1)
+    return process_file(file_path, *args)
+
+
+def make_settings(**overrides):
+    """Default basic-mode settings with backups disabled"""
+    settings = dict(DEFAULT_SETTINGS, create_backup=False)
+    settings.update(overrides)
+    return settings
+
+
+def make_batch(folder, count):
+    """Write a mix of JPEG and PNG files carrying metadata"""
+    files = []
+    for i in range(count):
+        if i % 2:
+            path = folder / f"photo_{i:03d}.jpg"
+            path.write_bytes(make_jpeg())
+        else:
+            path = folder / f"shot_{i:03d}.png"
+            path.write_bytes(make_png())
+        files.append(str(path))
+    return files
+
+
+def test_process_file_collects_log_lines(tmp_path):
+    source = make_batch(tmp_path, 1)[0]
+    result = process_file(source, make_settings())
+
+    assert result['path'] == source
+    assert result['success']
+    assert any("Clean file saved" in line for line in result['log'])
+    with Image.open(tmp_path / "shot_000_no_metadata.png") as img:
+        assert not img.text
+
+
+def test_process_file_reports_failures(tmp_path):
+    broken = tmp_path / "broken.bmp"
+    broken.write_bytes(b'BM not really a bitmap')
+    result = process_file(str(broken), make_settings())
+
+    assert not result['success']
+    assert result['log'][-1].startswith("  ❌ Error:")
+    assert os.listdir(tmp_path) == ["broken.bmp"]
+
+
+def test_batch_engine_keeps_submission_order(tmp_path):
+    files = make_batch(tmp_path, 12)
+    broken = tmp_path / "broken.bmp"
+    broken.write_bytes(b'BM')
+    files.insert(5, str(broken))
+
+    for jobs in (1, 3):
+        engine = BatchEngine(make_settings(), jobs=jobs)
+        engine.queue_depth = 1
+        results = list(engine.run(files))
+
+        assert [index for index, _ in results] == list(range(len(files)))
+        assert [result['path'] for _, result in results] == files
+        assert [result['success'] for _, result in results].count(False) == 1
+        assert not results[5][1]['success']
+
+
+def test_batch_survives_a_dead_worker(tmp_path, monkeypatch):
+    files = make_batch(tmp_path, 24)
+    broken = tmp_path / "broken.jpg"
+    broken.write_bytes(make_jpeg())
+    files.insert(2, str(broken))
+    # Workers are forked, so they pick up the patched function
+    monkeypatch.setattr(metadata_engine, 'process_file', die_on_broken_files)
+
+    results = list(BatchEngine(make_settings(), jobs=2).run(files))
+    assert [index for index, _ in results] == list(range(len(files)))
+    assert not results[2][1]['success']
+    assert all(result['success'] for _, result in results[-8:])
+
+
+def test_manifest_skips_unchanged_files(tmp_path):
+    images = tmp_path / "images"
+    images.mkdir()
+    files = make_batch(images, 4)
+    manifest = str(tmp_path / "manifest.sqlite3")
+    settings = make_settings(overwrite_original=True)
+
+    def skipped(settings):
+        engine = BatchEngine(settings, jobs=2, manifest_path=manifest)
+        results = [result for _, result in engine.run(files)]
+        assert all(result['success'] for result in results)
+        return [result['skipped'] == 'unchanged' for result in results]
+
+    assert skipped(settings) == [False] * 4
+    assert skipped(settings) == [True] * 4
+
+    # Same content with a new mtime is still skipped; new content is not
+    os.utime(files[0], ns=(0, 0))
+    with open(files[1], 'ab') as f:
+        f.write(b'\0')
+    assert skipped(settings) == [True, False, True, True]
+
+    # Settings that do not change the output share the records
+    assert skipped(make_settings(overwrite_original=True, durability='file',
+                                 backup_mode='copy')) == [True] * 4
+
+    # Different settings have their own records
+    assert skipped(make_settings(overwrite_original=True, remove_xmp=False)) == [False] * 4
+
+
+def test_manifest_remakes_missing_outputs(tmp_path):
+    files = make_batch(tmp_path, 3)
+    engine = BatchEngine(make_settings(), jobs=1, manifest_path=str(tmp_path / "m.sqlite3"))
+    assert [r['skipped'] for _, r in engine.run(files)] == [None] * 3
+
+    output = tmp_path / os.path.basename(files[1]).replace(".", "_no_metadata.")
+    output.unlink()
+    assert [r['skipped'] for _, r in engine.run(files)] == ['unchanged', None, 'unchanged']
+    assert output.exists()
+    assert [r['skipped'] for _, r in engine.run(files)] == ['unchanged'] * 3
+
+
+def test_clean_files_are_not_rewritten(tmp_path):
+    source = tmp_path / "plain.png"
+    Image.new('RGB', (20, 10), (1, 2, 3)).save(source)
+    before = source.read_bytes()
+
+    result = process_file(str(source), make_settings(create_backup=True))
+    assert result['success'] and result['skipped'] == 'clean'
+    assert (tmp_path / "plain_no_metadata.png").read_bytes() == before
+    assert not os.path.exists(str(source) + ".backup")
+
+    result = process_file(str(source), make_settings(overwrite_original=True))
+    assert result['skipped'] == 'clean'
+    assert source.read_bytes() == before
+
+    # Files with targeted metadata still go through the full path
+    result = process_file(make_batch(tmp_path, 1)[0], make_settings())
+    assert result['success'] and result['skipped'] is None
+
+
+def test_advanced_mode_writes_custom_exif(tmp_path):
+    files = make_batch(tmp_path, 2) + [str(tmp_path / "plain.bmp")]
+    Image.new('RGB', (8, 8)).save(files[-1])
+    fields = {'Artist': "Jane Doe", 'GPS_Latitude': "-33.8568", 'Keywords': "harbour"}
+    engine = BatchEngine(make_settings(advanced_mode=True, custom_metadata=fields), jobs=1)
+    assert engine.settings['exif_blob'] == build_exif_blob(fields)
+
+    results = [result for _, result in engine.run(files)]
+    assert all(result['success'] for result in results)
+    assert 'inject' in results[1]['metrics']['stages']
+    for name in ("shot_000_edited.png", "photo_001_edited.jpg"):
+        with Image.open(tmp_path / name) as img:
+            exif = img.getexif()
+            assert exif[0x013B] == "Jane Doe"
+            gps = exif.get_ifd(0x8825)
+            assert gps[1] == 'S' and round(float(gps[2][0])) == 33
+            assert 0x010F not in exif  # the source's Make is gone
+
+    assert build_exif_blob({'Keywords': "harbour"}) is None
+    try:
+        build_exif_blob({'GPS_Longitude': "east"})
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_scrub_mode_keeps_exif_without_location(tmp_path):
+    files = make_batch(tmp_path, 2)
+    tiff = tmp_path / "scan.tif"
+    tiff.write_bytes(make_tiff())
+    settings = make_settings(scrub_exif=True, scrub_tags=['Software'], remove_xmp=False)
+
+    results = [result for _, result in BatchEngine(settings, jobs=1).run(files + [str(tiff)])]
+    assert all(result['success'] and result['skipped'] is None for result in results)
+    for name in ("photo_001_no_metadata.jpg", "scan_no_metadata.tif"):
+        with Image.open(tmp_path / name) as img:
+            exif = img.getexif()
+            assert exif[0x010F] == "TestCam"
+            assert 0x0131 not in exif
+            assert not exif.get_ifd(0x8825)
+
+    try:
+        BatchEngine(make_settings(scrub_exif=True, scrub_tags=['NoSuchTag']))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_tiffs_are_only_patched_in_place_without_durability(tmp_path):
+    for durability, patched in (('none', True), ('file', False), ('batch', False)):
+        tiff = tmp_path / f"scan_{durability}.tif"
+        tiff.write_bytes(make_tiff())
+        inode = tiff.stat().st_ino
+        settings = make_settings(overwrite_original=True, durability=durability)
+
+        results = [result for _, result in BatchEngine(settings, jobs=1).run([str(tiff)])]
+        assert results[0]['success']
+        assert any("(in place)" in line for line in results[0]['log']) == patched
+        # Otherwise a new file replaced the original, which was never written to
+        assert (tiff.stat().st_ino == inode) == patched
+        with Image.open(tiff) as img:
+            assert 0x010F not in img.getexif()
+
+
+def test_scan_images_streams_supported_files(tmp_path):
+    (tmp_path / "sub" / "deeper").mkdir(parents=True)
+    for name in ("b.JPG", "a.png", "notes.txt", "sub/c.tif", "sub/deeper/d.webp", "sub/e.gif"):
+        (tmp_path / name).write_bytes(b'')
+
+    found = list(scan_images(str(tmp_path)))
+    assert [os.path.relpath(path, tmp_path) for path in found] == [
+        "a.png", "b.JPG", os.path.join("sub", "c.tif"), os.path.join("sub", "deeper", "d.webp")]
+
+    cancel = threading.Event()
+    scan = scan_images(str(tmp_path), cancel)
+    next(scan)
+    cancel.set()
+    assert list(scan) == []
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Tests for the virtualized file list widget in file_list.
+Needs a display; skipped when Tk cannot be started.
+Run with: python -m pytest test_file_list.py
+"""
+
+import io
+import tkinter as tk
+
+import pytest
+from PIL import Image
+
+from file_list import VirtualFileList
+
+COLORS = {'white': '#ffffff', 'secondary': '#a29bfe', 'dark': '#2d3436'}
+
+
+@pytest.fixture
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display available")
+    root.geometry("300x200")
+    yield root
+    root.destroy()
+
+
+def test_only_visible_rows_are_materialized(root):
+    files = [f"/photos/img_{i:06d}.jpg" for i in range(100000)]
+    view = VirtualFileList(root, files, COLORS)
+    view.pack(fill=tk.BOTH, expand=True)
+    root.update()
+
+    assert len(view.rows) <= view.visible_rows() + 1
+    assert len(view.canvas.find_all()) == 3 * len(view.rows)
+
+    view.yview('moveto', '0.5')
+    name = view.canvas.itemcget(view.rows[0][2], 'text')
+    assert name == "img_050000.jpg"
+
+    files.append("/photos/late.jpg")
+    view.yview('moveto', '1.0')
+    assert view.top + len(view.rows) > len(files) - 1
+
+
+def test_statuses_and_selection(root):
+    files = [f"/photos/img_{i}.jpg" for i in range(10)]
+    activated = []
+    view = VirtualFileList(root, files, COLORS, on_activate=activated.append)
+    view.pack(fill=tk.BOTH, expand=True)
+    root.update()
+
+    view.set_statuses([(1, 'failed'), (2, 'done')])
+    assert view.canvas.itemcget(view.rows[1][1], 'text') == '❌'
+
+    view._on_click(type('Event', (), {'y': view.row_height * 3 + 1}))
+    assert view.curselection() == (3,)
+    view._on_double_click(type('Event', (), {'y': 1}))
+    assert activated == [0]
+
+    files.clear()
+    view.clear()
+    assert view.curselection() == () and not view.statuses
+
+
+class FakeThumbnails:
+    def __init__(self):
+        self.requested = []
+        self.finished = []
+
+    def request(self, paths):
+        self.requested = list(paths)
+
+    def results(self):
+        finished, self.finished = self.finished, []
+        return finished
+
+    def close(self):
+        pass
+
+
+def test_thumbnails_are_requested_for_visible_rows(root):
+    files = [f"/photos/img_{i:06d}.jpg" for i in range(1000)]
+    thumbnails = FakeThumbnails()
+    view = VirtualFileList(root, files, COLORS, thumbnails=thumbnails)
+    view.pack(fill=tk.BOTH, expand=True)
+    root.update()
+
+    assert thumbnails.requested == files[:len(thumbnails.requested)]
+    assert 0 < len(thumbnails.requested) <= view.visible_rows()
+
+    png = io.BytesIO()
+    Image.new('RGB', (32, 32), (0, 0, 255)).save(png, 'PNG')
+    thumbnails.finished = [(files[0], png.getvalue()), (files[1], None)]
+    view._poll_thumbnails()
+    assert view.canvas.itemcget(view.thumbnail_items[0], 'image')
+    assert files[0] not in thumbnails.requested and files[1] not in thumbnails.requested
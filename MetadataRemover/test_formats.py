@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Tests for the container-level metadata strippers in metadata_formats.
+Run with: python -m pytest test_formats.py
+"""
+
+import io
+import struct
+import zlib
+
+from PIL import Image, PngImagePlugin, TiffImagePlugin
+
+import metadata_formats
+from metadata_formats import (ExifScrubPolicy, MetadataFormatError, inject_jpeg_exif,
+                              inject_png_exif, needs_stripping, probe_file, rebuild_tiff,
+                              scrub_exif_block, strip_file, strip_jpeg, strip_png, strip_tiff,
+                              strip_tiff_in_place, strip_webp)
+
+
+def make_exif():
+    """Build a small EXIF block with camera and GPS information"""
+    exif = Image.Exif()
+    exif[0x010F] = "TestCam"      # Make
+    exif[0x0110] = "Model 1"      # Model
+    exif[0x0131] = "Editor 2.0"   # Software
+    gps = exif.get_ifd(0x8825)
+    gps[1] = "N"
+    gps[2] = (52.0, 22.0, 1.5)
+    return exif.tobytes()
+
+
+def make_exif_with_thumbnail():
+    """Build an EXIF block with a camera tag, serial number, GPS and a JPEG thumbnail"""
+    def ifd(entries, next_offset=0):
+        return (struct.pack('<H', len(entries))
+                + b''.join(struct.pack('<HHII', *entry) for entry in entries)
+                + struct.pack('<I', next_offset))
+
+    make, serial = b'TestCam\x00', b'SN-12345\x00'
+    latitude = struct.pack('<6I', 52, 1, 22, 1, 15, 10)
+    thumbnail = b'\xff\xd8' + b'\x55' * 64 + b'\xff\xd9'
+
+    make_at = 8 + 2 + 3 * 12 + 4
+    exif_at = make_at + len(make)
+    serial_at = exif_at + 2 + 12 + 4
+    gps_at = serial_at + len(serial)
+    latitude_at = gps_at + 2 + 2 * 12 + 4
+    ifd1_at = latitude_at + len(latitude)
+    thumbnail_at = ifd1_at + 2 + 2 * 12 + 4
+
+    return (b'II*\x00' + struct.pack('<I', 8)
+            + ifd([(271, 2, len(make), make_at), (34665, 4, 1, exif_at), (34853, 4, 1, gps_at)],
+                  ifd1_at)
+            + make
+            + ifd([(0xA431, 2, len(serial), serial_at)])
+            + serial
+            + ifd([(1, 2, 2, ord('N')), (2, 5, 3, latitude_at)])
+            + latitude
+            + ifd([(513, 4, 1, thumbnail_at), (514, 4, 1, len(thumbnail))])
+            + thumbnail)
+
+
+def jpeg_segment(marker, payload):
+    """Encode a single JPEG marker segment"""
+    return bytes((0xFF, marker)) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def make_jpeg(size=(64, 48)):
+    """Create a JPEG carrying EXIF, XMP, IPTC and a comment"""
+    buf = io.BytesIO()
+    Image.new('RGB', size, (200, 30, 90)).save(buf, 'JPEG', quality=90, exif=make_exif())
+    data = buf.getvalue()
+    extra = (jpeg_segment(0xE1, metadata_formats.XMP_HEADER + b'<x:xmpmeta/>')
+             + jpeg_segment(0xED, metadata_formats.PHOTOSHOP_HEADER + b'8BIM\x04\x04\x00\x00\x00\x00\x00\x00')
+             + jpeg_segment(0xFE, b'shot by someone'))
+    return data[:2] + extra + data[2:]
+
+
+def png_chunk(chunk_type, data):
+    """Encode a single PNG chunk with its CRC"""
+    crc = zlib.crc32(chunk_type + data) & 0xFFFFFFFF
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', crc)
+
+
+def make_png(size=(40, 30)):
+    """Create a PNG carrying text, XMP, IPTC, eXIf and tIME chunks"""
+    info = PngImagePlugin.PngInfo()
+    info.add_text("Author", "someone")
+    info.add_text("Comment", "x" * 200, zip=True)
+    info.add_itxt("XML:com.adobe.xmp", "<x:xmpmeta/>")
+    info.add_text("Raw profile type iptc", "\niptc\n      4\n1c020000\n")
+    buf = io.BytesIO()
+    Image.new('RGB', size, (10, 120, 240)).save(buf, 'PNG', pnginfo=info, exif=make_exif())
+    data = buf.getvalue()
+    ihdr_end = 8 + 25
+    stamp = png_chunk(b'tIME', struct.pack('>HBBBBB', 2025, 8, 1, 12, 0, 0))
+    return data[:ihdr_end] + stamp + data[ihdr_end:]
+
+
+def png_chunks(data):
+    """List (type, data, crc) tuples for every chunk in a PNG"""
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        length, chunk_type = struct.unpack('>I4s', data[pos:pos + 8])
+        body = data[pos + 8:pos + 8 + length]
+        crc = struct.unpack('>I', data[pos + 8 + length:pos + 12 + length])[0]
+        chunks.append((chunk_type, body, crc))
+        pos += 12 + length
+    return chunks
+
+
+def make_webp(animated=False, lossless=False):
+    """Create a VP8X WebP carrying EXIF and XMP chunks"""
+    buf = io.BytesIO()
+    frame = Image.new('RGB', (32, 32), (20, 200, 20))
+    kwargs = {'exif': make_exif(), 'xmp': b'<x:xmpmeta/>', 'lossless': lossless}
+    if animated:
+        kwargs.update(save_all=True, append_images=[Image.new('RGB', (32, 32), (200, 20, 20))])
+    frame.save(buf, 'WEBP', **kwargs)
+    return buf.getvalue()
+
+
+def riff_chunks(data):
+    """List (fourcc, payload) tuples for every chunk in a RIFF file"""
+    chunks = []
+    pos = 12
+    while pos + 8 <= len(data):
+        fourcc, size = struct.unpack('<4sI', data[pos:pos + 8])
+        chunks.append((fourcc, data[pos + 8:pos + 8 + size]))
+        pos += 8 + size + (size & 1)
+    return chunks
+
+
+def make_tiff(image=None):
+    """Create a TIFF with identity tags, XMP, IPTC and EXIF/GPS sub-IFDs"""
+    info = TiffImagePlugin.ImageFileDirectory_v2()
+    info[271] = "TestCam"
+    info[305] = "Editor 2.0"
+    info[700] = b'<x:xmpmeta>secret-xmp</x:xmpmeta>'
+    info[33723] = b'\x1c\x02\x05\x00\x0bsecret-iptc'
+    info[34665] = {36867: "2025:01:01 10:00:00", 37500: b'secret-makernote' * 20}
+    info[34853] = {1: "N", 2: (52.0, 22.0, 1.5)}
+    buf = io.BytesIO()
+    if image is None:
+        image = Image.new('RGB', (50, 40), (90, 60, 30))
+    image.save(buf, 'TIFF', tiffinfo=info)
+    return buf.getvalue()
+
+
+def break_exif_pointer(data):
+    """Point a TIFF's EXIF sub-IFD entry past the end of the file"""
+    data = bytearray(data)
+    entry = data.index(struct.pack('<HHI', 34665, 4, 1))
+    data[entry + 8:entry + 12] = struct.pack('<I', len(data) + 100)
+    return bytes(data)
+
+
+def jpeg_markers(data):
+    """List the marker codes in front of the first scan"""
+    markers = []
+    pos = 2
+    while True:
+        marker = data[pos + 1]
+        markers.append(marker)
+        if marker == 0xDA:
+            return markers
+        pos += 2 + struct.unpack('>H', data[pos + 2:pos + 4])[0]
+
+
+def test_jpeg_strip_removes_all_metadata():
+    original = make_jpeg()
+    out = io.BytesIO()
+    removed = strip_jpeg(io.BytesIO(original), out)
+
+    cleaned = out.getvalue()
+    assert removed == 4
+    assert not {0xE1, 0xED, 0xFE} & set(jpeg_markers(cleaned))
+    # Scan data is copied byte for byte
+    scan = original.index(b'\xff\xda')
+    assert cleaned.endswith(original[scan:])
+    with Image.open(io.BytesIO(cleaned)) as img:
+        assert img.size == (64, 48)
+        assert not img.getexif()
+
+
+def test_jpeg_strip_respects_toggles():
+    out = io.BytesIO()
+    removed = strip_jpeg(io.BytesIO(make_jpeg()), out,
+                         remove_exif=False, remove_iptc=True, remove_xmp=False)
+
+    cleaned = out.getvalue()
+    assert removed == 1
+    assert metadata_formats.EXIF_HEADER in cleaned
+    assert metadata_formats.XMP_HEADER in cleaned
+    assert metadata_formats.PHOTOSHOP_HEADER not in cleaned
+
+
+def test_jpeg_strip_rejects_non_jpeg():
+    try:
+        strip_jpeg(io.BytesIO(b'not a jpeg'), io.BytesIO())
+    except MetadataFormatError:
+        pass
+    else:
+        raise AssertionError("expected MetadataFormatError")
+
+
+def test_strip_file_cleans_up_on_error(tmp_path):
+    src = tmp_path / "broken.jpg"
+    src.write_bytes(b'\xff\xd8\xff\xe1\x00')
+    dst = tmp_path / "out.jpg"
+    try:
+        strip_file(str(src), str(dst))
+    except MetadataFormatError:
+        pass
+    assert not dst.exists()
+
+
+def test_jpeg_inject_replaces_exif_without_reencoding():
+    original = make_jpeg()
+    exif = Image.Exif()
+    exif[0x013B] = "New Artist"
+    out = io.BytesIO()
+    removed = inject_jpeg_exif(io.BytesIO(original), out, exif.tobytes(), remove_xmp=False)
+
+    tagged = out.getvalue()
+    assert removed == 3
+    assert jpeg_markers(tagged)[0] == 0xE1
+    scan = original.index(b'\xff\xda')
+    assert tagged.endswith(original[scan:])
+    assert metadata_formats.XMP_HEADER in tagged
+    with Image.open(io.BytesIO(tagged)) as img:
+        assert dict(img.getexif()) == {0x013B: "New Artist"}
+
+
+def test_png_inject_writes_exif_after_header():
+    exif = Image.Exif()
+    exif[0x8298] = "(c) someone"
+    out = io.BytesIO()
+    inject_png_exif(io.BytesIO(make_png()), out, exif.tobytes())
+
+    chunks = png_chunks(out.getvalue())
+    assert [chunk[0] for chunk in chunks[:2]] == [b'IHDR', b'eXIf']
+    for chunk_type, body, crc in chunks:
+        assert zlib.crc32(chunk_type + body) & 0xFFFFFFFF == crc
+    with Image.open(io.BytesIO(out.getvalue())) as img:
+        img.load()
+        assert dict(img.getexif()) == {0x8298: "(c) someone"}
+
+
+def test_png_strip_removes_metadata_chunks():
+    original = make_png()
+    out = io.BytesIO()
+    removed = strip_png(io.BytesIO(original), out)
+
+    cleaned = out.getvalue()
+    assert removed == 6
+    types = [chunk[0] for chunk in png_chunks(cleaned)]
+    assert types == [b'IHDR', b'IDAT', b'IEND']
+    for chunk_type, body, crc in png_chunks(cleaned):
+        assert zlib.crc32(chunk_type + body) & 0xFFFFFFFF == crc
+    idat = [c for c in png_chunks(original) if c[0] == b'IDAT']
+    assert idat == [c for c in png_chunks(cleaned) if c[0] == b'IDAT']
+    with Image.open(io.BytesIO(cleaned)) as img:
+        img.load()
+        assert img.size == (40, 30)
+        assert not img.text
+
+
+def test_png_strip_respects_toggles():
+    out = io.BytesIO()
+    strip_png(io.BytesIO(make_png()), out,
+              remove_exif=False, remove_iptc=False, remove_xmp=True)
+
+    types = [chunk[0] for chunk in png_chunks(out.getvalue())]
+    keywords = [body.split(b'\x00')[0] for t, body, _ in png_chunks(out.getvalue()) if t in (b'tEXt', b'zTXt', b'iTXt')]
+    assert b'eXIf' in types and b'tIME' in types
+    assert b'XML:com.adobe.xmp' not in keywords
+    assert b'Raw profile type iptc' in keywords
+
+
+def test_webp_strip_removes_exif_and_xmp():
+    for animated, lossless in ((False, False), (False, True), (True, False)):
+        original = make_webp(animated=animated, lossless=lossless)
+        out = io.BytesIO()
+        removed = strip_webp(io.BytesIO(original), out)
+
+        cleaned = out.getvalue()
+        chunks = riff_chunks(cleaned)
+        assert removed == 2
+        assert struct.unpack('<I', cleaned[4:8])[0] == len(cleaned) - 8
+        assert not {b'EXIF', b'XMP '} & {fourcc for fourcc, _ in chunks}
+        assert chunks[0][0] == b'VP8X' and not chunks[0][1][0] & 0x0C
+        # Bitstream chunks are untouched
+        kept = [c for c in riff_chunks(original) if c[0] not in (b'VP8X', b'EXIF', b'XMP ')]
+        assert kept == chunks[1:]
+        with Image.open(io.BytesIO(cleaned)) as img:
+            img.load()
+            assert getattr(img, 'n_frames', 1) == (2 if animated else 1)
+            assert not img.getexif()
+
+
+def test_webp_strip_keeps_exif_when_disabled():
+    out = io.BytesIO()
+    removed = strip_webp(io.BytesIO(make_webp()), out, remove_exif=False)
+
+    chunks = riff_chunks(out.getvalue())
+    assert removed == 1
+    assert b'EXIF' in {fourcc for fourcc, _ in chunks}
+    assert chunks[0][1][0] & 0x08 and not chunks[0][1][0] & 0x04
+
+
+def test_tiff_strip_rewrites_only_ifds():
+    original = make_tiff()
+    out = io.BytesIO()
+    removed = strip_tiff(io.BytesIO(original), out)
+
+    cleaned = out.getvalue()
+    assert removed == 6
+    assert len(cleaned) == len(original)
+    for secret in (b'secret', b'TestCam', b'Editor 2.0'):
+        assert secret not in cleaned
+    with Image.open(io.BytesIO(original)) as before, Image.open(io.BytesIO(cleaned)) as after:
+        assert before.tag_v2[273] == after.tag_v2[273]
+        assert before.tobytes() == after.tobytes()
+        assert not {271, 305, 700, 33723, 34665, 34853} & set(after.tag_v2)
+
+
+def test_tiff_strip_in_place(tmp_path):
+    path = tmp_path / "scan.tif"
+    path.write_bytes(make_tiff())
+    removed = strip_tiff_in_place(str(path), remove_exif=False, remove_iptc=True, remove_xmp=True)
+
+    assert removed == 2
+    with Image.open(path) as img:
+        assert 700 not in img.tag_v2 and 33723 not in img.tag_v2
+        assert img.tag_v2[271] == "TestCam"
+        assert img.getexif().get_ifd(0x8825)
+
+
+def test_exif_scrub_drops_gps_thumbnail_and_listed_tags():
+    original = make_exif_with_thumbnail()
+    scrubbed = scrub_exif_block(original, ExifScrubPolicy([0xA431]))
+
+    assert len(scrubbed) < original.index(b'\xff\xd8')
+    assert b'SN-12345' not in scrubbed
+    assert struct.pack('<6I', 52, 1, 22, 1, 15, 10) not in scrubbed
+    exif = Image.Exif()
+    exif.load(metadata_formats.EXIF_HEADER + scrubbed)
+    assert dict(exif) == {271: "TestCam", 34665: exif[34665]}
+    assert not exif.get_ifd(0x8769) and not exif.get_ifd(0x8825)
+    # Kept values stay at their original offsets
+    assert scrubbed.index(b'TestCam') == original.index(b'TestCam')
+
+    assert scrub_exif_block(original, ExifScrubPolicy(drop_gps=False, drop_thumbnail=False)) == original
+
+
+def test_jpeg_scrub_keeps_pixels_and_other_exif():
+    original = make_jpeg()
+    exif_segment = jpeg_segment(0xE1, metadata_formats.EXIF_HEADER + make_exif_with_thumbnail())
+    original = original[:2] + exif_segment + original[2:]
+    out = io.BytesIO()
+    strip_jpeg(io.BytesIO(original), out, remove_exif=False, scrub=ExifScrubPolicy())
+
+    scrubbed = out.getvalue()
+    scan = original.index(b'\xff\xda')
+    assert scrubbed.endswith(original[scan:])
+    assert b'\x55' * 64 not in scrubbed
+    with Image.open(io.BytesIO(scrubbed)) as img:
+        exif = img.getexif()
+        assert exif[271] == "TestCam"
+        assert not exif.get_ifd(0x8825)
+
+
+def test_png_scrub_drops_exif_text_profiles_and_follows_comment_toggle():
+    raw_exif = metadata_formats.EXIF_HEADER + make_exif_with_thumbnail()
+    profile = png_chunk(b'tEXt', b'Raw profile type exif\x00\nexif\n' + raw_exif.hex().encode())
+    original = make_png()
+    original = original[:33] + profile + original[33:]
+
+    for remove_exif, comments_kept in ((True, False), (False, True)):
+        out = io.BytesIO()
+        strip_png(io.BytesIO(original), out, remove_exif=remove_exif, remove_iptc=False,
+                  remove_xmp=False, scrub=ExifScrubPolicy())
+        chunks = png_chunks(out.getvalue())
+        texts = [data.split(b'\x00', 1)[0] for chunk_type, data, _ in chunks
+                 if chunk_type == b'tEXt' or chunk_type == b'zTXt']
+        assert b'Raw profile type exif' not in texts
+        assert (b'Author' in texts) == comments_kept
+        exif = [data for chunk_type, data, _ in chunks if chunk_type == b'eXIf']
+        assert exif and b'TestCam' in exif[0]
+
+
+def test_tiff_scrub_removes_gps_only(tmp_path):
+    path = tmp_path / "scan.tif"
+    path.write_bytes(make_tiff())
+    strip_tiff_in_place(str(path), remove_exif=False, remove_iptc=False, remove_xmp=False,
+                        scrub=ExifScrubPolicy([37500]))
+
+    with Image.open(path) as img:
+        assert img.tag_v2[271] == "TestCam" and 700 in img.tag_v2
+        exif = img.getexif()
+        assert not exif.get_ifd(0x8825)
+        assert exif.get_ifd(0x8769) == {36867: "2025:01:01 10:00:00"}
+    assert b'secret-makernote' not in path.read_bytes()
+
+
+def test_tiff_rebuild_streams_strips():
+    original = break_exif_pointer(make_tiff())
+    out = io.BytesIO()
+    removed = strip_tiff(io.BytesIO(original), out)
+
+    cleaned = out.getvalue()
+    assert removed == 6
+    for secret in (b'secret', b'TestCam', b'Editor 2.0'):
+        assert secret not in cleaned
+    with Image.open(io.BytesIO(original)) as before, Image.open(io.BytesIO(cleaned)) as after:
+        assert before.tobytes() == after.tobytes()
+        assert set(after.tag_v2) <= metadata_formats.TIFF_IMAGE_TAGS
+
+
+def test_tiff_rebuild_keeps_every_page():
+    buf = io.BytesIO()
+    pages = [Image.new('L', (30, 20), shade) for shade in (10, 128, 250)]
+    pages[0].save(buf, 'TIFF', save_all=True, append_images=pages[1:], compression='tiff_lzw')
+    out = io.BytesIO()
+    rebuild_tiff(io.BytesIO(buf.getvalue()), out)
+
+    with Image.open(io.BytesIO(out.getvalue())) as img:
+        assert img.n_frames == 3
+        for index, page in enumerate(pages):
+            img.seek(index)
+            assert img.tobytes() == page.tobytes()
+
+
+def test_probe_reports_metadata_kinds(tmp_path):
+    samples = {
+        'photo.jpg': (make_jpeg(), {'exif', 'xmp', 'iptc', 'comment'}),
+        'shot.png': (make_png(), {'exif', 'xmp', 'iptc', 'comment'}),
+        'web.webp': (make_webp(), {'exif', 'xmp'}),
+        'scan.tif': (make_tiff(), {'exif', 'xmp', 'iptc'}),
+    }
+    for name, (data, kinds) in samples.items():
+        path = tmp_path / name
+        path.write_bytes(data)
+        assert probe_file(str(path)) == kinds
+
+        clean = tmp_path / f"clean_{name}"
+        strip_file(str(path), str(clean))
+        assert probe_file(str(clean)) == set()
+
+
+def test_probe_reads_only_headers(tmp_path):
+    path = tmp_path / "big.png"
+    buf = io.BytesIO()
+    Image.effect_noise((600, 600), 64).save(buf, 'PNG')
+    path.write_bytes(buf.getvalue())
+
+    reads = []
+    real_read = io.BufferedReader.read
+
+    class CountingReader(io.BufferedReader):
+        def read(self, size=-1):
+            data = real_read(self, size)
+            reads.append(len(data))
+            return data
+
+    with CountingReader(io.FileIO(str(path))) as src:
+        assert metadata_formats.probe_png(src) == set()
+    assert sum(reads) < 200 < len(buf.getvalue())
+
+
+def test_needs_stripping_follows_toggles():
+    assert needs_stripping({'xmp'})
+    assert not needs_stripping({'xmp'}, remove_xmp=False)
+    assert needs_stripping({'comment'}, remove_iptc=False, remove_xmp=False)
+    assert not needs_stripping(set())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Tests for the buffered progress log in log_sink.
+Run with: python -m pytest test_log_sink.py
+"""
+
+import threading
+
+import log_sink
+from log_sink import LogSink
+
+
+def test_drain_keeps_newest_lines_from_all_threads():
+    sink = LogSink(max_lines=100)
+
+    def produce(prefix):
+        for i in range(1000):
+            sink.write(f"{prefix} {i}")
+
+    threads = [threading.Thread(target=produce, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    lines = sink.drain()
+    assert len(lines) == 100
+    assert lines[-1] in ("a 999", "b 999")
+    assert sink.drain() == []
+
+
+def test_full_log_goes_to_rotating_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_sink, 'LOG_FILE_MAX_BYTES', 2000)
+    path = tmp_path / "logs" / "progress.log"
+    sink = LogSink(max_lines=10)
+    sink.set_log_file(str(path))
+    for i in range(200):
+        sink.write(f"line {i:03d}")
+    sink.set_log_file(None)
+    sink.write("not logged")
+
+    assert len(sink.drain()) == 10
+    assert "line 199" in path.read_text(encoding='utf-8')
+    rotated = sorted(p.name for p in path.parent.iterdir())
+    assert rotated == ["progress.log", "progress.log.1", "progress.log.2", "progress.log.3"]
+    assert "not logged" not in path.read_text(encoding='utf-8')
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Memory benchmarks for the decode fallback and the TIFF strip rebuild.
+
+Each case runs in a fresh interpreter and asserts that the peak RSS
+growth stays under a ceiling derived from the image's raw pixel size.
+Run with: python -m pytest test_memory.py
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+from PIL import Image
+
+from test_formats import break_exif_pointer, make_tiff
+
+resource = pytest.importorskip('resource')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+WIDTH, HEIGHT = 3000, 2000
+RAW_SIZE = WIDTH * HEIGHT * 3
+
+# Interpreter and allocator noise allowed on top of the ceilings
+SLACK = 16 * 1024 * 1024
+
+CHILD_SCRIPT = """
+import resource, sys
+sys.path.insert(0, {here!r})
+from metadata_engine import DEFAULT_SETTINGS, reencode_image
+from metadata_formats import strip_file
+
+def peak():
+    # ru_maxrss survives exec and would report the parent's peak on Linux
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * {scale}
+
+before = peak()
+{call}
+print(peak() - before)
+"""
+
+
+def peak_growth(call):
+    """Run call in a child interpreter and return its peak RSS growth in bytes"""
+    scale = 1 if sys.platform == 'darwin' else 1024
+    script = CHILD_SCRIPT.format(here=HERE, scale=scale, call=call)
+    output = subprocess.run([sys.executable, '-c', script], check=True,
+                            capture_output=True, text=True).stdout
+    return int(output.strip().splitlines()[-1])
+
+
+def make_photo():
+    """Create a WIDTH x HEIGHT RGB test image with some structure"""
+    gradient = Image.linear_gradient('L').resize((WIDTH, HEIGHT))
+    return Image.merge('RGB', (gradient, gradient.transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+                               gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM)))
+
+
+def test_decode_fallback_holds_at_most_two_copies(tmp_path):
+    source = tmp_path / "large.bmp"
+    make_photo().save(source, 'BMP')
+    target = tmp_path / "clean.bmp"
+
+    growth = peak_growth(f"reencode_image({str(source)!r}, {str(target)!r}, '.bmp', "
+                         f"dict(DEFAULT_SETTINGS), lambda line: None)")
+
+    # Decoded source plus the clean copy; no per-pixel Python objects
+    assert growth < 2 * RAW_SIZE + SLACK, f"peak grew by {growth / 2**20:.0f} MiB"
+    with Image.open(target) as img:
+        assert img.size == (WIDTH, HEIGHT)
+
+
+def test_tiff_rebuild_streams_strip_by_strip(tmp_path):
+    source = tmp_path / "scan.tif"
+    # A damaged EXIF pointer makes the IFD patcher fall back to a rebuild
+    source.write_bytes(break_exif_pointer(make_tiff(make_photo())))
+    target = tmp_path / "clean.tif"
+
+    growth = peak_growth(f"strip_file({str(source)!r}, {str(target)!r})")
+
+    assert growth < RAW_SIZE // 4 + SLACK, f"peak grew by {growth / 2**20:.0f} MiB"
+    with Image.open(source) as before, Image.open(target) as after:
+        assert before.tobytes() == after.tobytes()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Tests for the lazy metadata tree widget in metadata_tree.
+Needs a display; skipped when Tk cannot be started.
+Run with: python -m pytest test_metadata_tree.py
+"""
+
+import tkinter as tk
+
+import pytest
+
+from metadata_preview import PREVIEW_PAGE_ROWS
+from metadata_tree import MetadataTree
+
+
+@pytest.fixture
+def root():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display available")
+    yield root
+    root.destroy()
+
+
+def test_rows_are_created_on_expand(root):
+    metadata = {'exif': {'Make': 'TestCam', 'MakerNote': b'\x01' * 100000,
+                         'GPSInfo': {'GPSLatitudeRef': 'N'}},
+                'iptc': {}, 'xmp': {}}
+    view = MetadataTree(root, metadata)
+    tree = view.tree
+
+    exif, iptc, xmp = tree.get_children()
+    assert tree.item(exif, 'values')[0] == "3 entries"
+    assert len(tree.get_children(exif)) == 1
+    assert not tree.get_children(iptc)
+
+    view.load(exif)
+    make, maker_note, gps = tree.get_children(exif)
+    assert tree.item(maker_note, 'values')[0] == "<100,000 bytes>"
+    assert len(tree.get_children(maker_note)) == 1
+
+    view.load(maker_note)
+    rows = tree.get_children(maker_note)
+    assert len(rows) == PREVIEW_PAGE_ROWS + 1
+    assert tree.item(rows[0], 'text') == "00000000"
+    assert rows[-1] in view.more_rows
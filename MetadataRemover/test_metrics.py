@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-stage timing instrumentation in metadata_metrics.
+Run with: python -m pytest test_metrics.py
+"""
+
+import io
+import json
+
+from PIL import Image
+
+from metadata_cli import main
+from metadata_engine import process_file
+from metadata_metrics import BatchMetrics, Histogram
+from test_engine import make_batch, make_settings
+
+
+def test_histogram_percentiles_are_within_bucket_error():
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.add(ms / 1000)
+
+    for q in (50, 95, 99):
+        assert q / 100 <= histogram.percentile(q) <= q / 100 * 1.1
+    assert histogram.percentile(100) == 1.0
+    assert len(histogram.buckets) < 100
+    assert Histogram().percentile(50) == 0.0
+
+
+def test_process_file_records_stage_timings(tmp_path):
+    jpeg = make_batch(tmp_path, 2)[1]
+    lossless = process_file(jpeg, make_settings())['metrics']
+    assert {'probe', 'strip', 'rename'} <= set(lossless['stages'])
+    assert 0 < lossless['bytes_written'] < lossless['bytes_read']
+
+    bmp = tmp_path / "plain.bmp"
+    Image.new('RGB', (16, 16)).save(bmp)
+    reencoded = process_file(str(bmp), make_settings(advanced_mode=True,
+                                                     custom_metadata={'Artist': 'me'}))['metrics']
+    assert {'open', 'decode', 'process', 'encode', 'rename'} <= set(reencoded['stages'])
+
+    batch = BatchMetrics()
+    for record in (lossless, reencoded, None):
+        batch.add(record)
+    report = batch.to_dict()
+    assert report['files'] == 2
+    assert report['stages']['rename']['count'] == 2
+    assert "rename" in batch.format_table()
+
+
+def test_cli_exports_metrics(tmp_path):
+    files = make_batch(tmp_path, 3)
+    report_path = tmp_path / "timings.json"
+
+    assert main(files + ['--jobs', '1', '--no-backup', '--metrics', str(report_path)],
+                out=io.StringIO()) == 0
+
+    report = json.loads(report_path.read_text())
+    assert report['files'] == 3
+    assert set(report['stages']['strip']) == {'count', 'total', 'mean', 'p50', 'p95', 'p99', 'max'}
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for the pipelined read/process/write engine in metadata_pipeline.
+Run with: python -m pytest test_pipeline.py
+"""
+
+import os
+
+from PIL import Image
+
+from metadata_engine import BatchEngine
+from metadata_pipeline import PipelineEngine
+from test_engine import make_batch, make_settings
+from test_formats import make_tiff
+
+
+def make_mixed_batch(folder):
+    """Lossless, re-encoded and already-clean files side by side"""
+    folder.mkdir()
+    files = make_batch(folder, 4)
+    tiff = folder / "scan.tif"
+    tiff.write_bytes(make_tiff())
+    bitmap = folder / "plain.bmp"
+    Image.new('RGB', (12, 8), (4, 5, 6)).save(bitmap)
+    clean = folder / "clean.png"
+    Image.new('RGB', (12, 8), (7, 8, 9)).save(clean)
+    return files + [str(tiff), str(bitmap), str(clean)]
+
+
+def folder_contents(folder):
+    return {name: (folder / name).read_bytes() for name in sorted(os.listdir(folder))}
+
+
+def test_pipeline_writes_the_same_files_as_the_batch_engine(tmp_path):
+    for overwrite in (False, True):
+        settings = make_settings(create_backup=True, overwrite_original=overwrite)
+        serial = make_mixed_batch(tmp_path / f"serial_{overwrite}")
+        piped = make_mixed_batch(tmp_path / f"piped_{overwrite}")
+
+        expected = [result for _, result in BatchEngine(settings, jobs=1).run(serial)]
+        results = [result for _, result in PipelineEngine(settings, jobs=2).run(piped)]
+
+        assert [r['skipped'] for r in results] == [r['skipped'] for r in expected]
+        assert all(result['success'] for result in results)
+        assert all('output' not in result for result in results)
+        assert folder_contents(tmp_path / f"piped_{overwrite}") == \
+            folder_contents(tmp_path / f"serial_{overwrite}")
+
+
+def test_pipeline_keeps_order_under_a_tiny_buffer(tmp_path):
+    files = make_batch(tmp_path, 10)
+    files.insert(3, str(tmp_path / "missing.jpg"))
+    manifest = tmp_path / "manifest.sqlite3"
+
+    engine = PipelineEngine(make_settings(), jobs=2, manifest_path=str(manifest),
+                            readers=2, writers=1, buffer_bytes=1)
+    results = list(engine.run(files))
+    assert [index for index, _ in results] == list(range(len(files)))
+    assert not results[3][1]['success']
+    assert "No such file" in results[3][1]['log'][0]
+    assert 'read' in results[0][1]['metrics']['stages']
+    assert engine.buffered == 0
+
+    rerun = [result for _, result in engine.run(files)]
+    assert [r['skipped'] for r in rerun].count('unchanged') == len(files) - 1
+
+
+class PeakEngine(PipelineEngine):
+    """PipelineEngine remembering the most bytes it ever held"""
+
+    peak = 0
+
+    def _reserve(self, size):
+        reserved = super()._reserve(size)
+        self.peak = max(self.peak, self.buffered)
+        return reserved
+
+    def _hold(self, size):
+        super()._hold(size)
+        self.peak = max(self.peak, self.buffered)
+
+
+def test_pipeline_reserves_source_and_output_bytes(tmp_path):
+    files = make_batch(tmp_path, 8)
+    largest = max(os.path.getsize(path) for path in files)
+    # Room for the source and output reservations of two files
+    budget = 4 * largest
+
+    engine = PeakEngine(make_settings(), jobs=2, readers=4, writers=1, buffer_bytes=budget)
+    results = [result for _, result in engine.run(files)]
+    assert all(result['success'] for result in results)
+    # More than one file was in flight, never over the budget
+    assert 2 * largest < engine.peak <= budget
+    assert engine.buffered == 0
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Tests for the cached, prefetching metadata reads in metadata_preview.
+Run with: python -m pytest test_preview.py
+"""
+
+import os
+import time
+
+from metadata_engine import extract_metadata
+from metadata_preview import MetadataCache, nearby, preview_node, preview_rows
+from test_formats import make_jpeg
+
+
+class CountingExtract:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, path):
+        self.calls.append(path)
+        return extract_metadata(path)
+
+
+def test_cache_hits_until_the_file_changes(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(make_jpeg())
+    extract = CountingExtract()
+    cache = MetadataCache(extract=extract)
+
+    metadata, size = cache.get(str(path))
+    assert metadata['exif']['Make'] == 'TestCam'
+    assert size == path.stat().st_size
+    cache.get(str(path))
+    assert len(extract.calls) == 1
+
+    # A rewrite changes size and mtime, so the entry no longer matches
+    path.write_bytes(make_jpeg(size=(32, 32)))
+    os.utime(path, ns=(0, 0))
+    cache.get(str(path))
+    assert len(extract.calls) == 2
+
+    cache.invalidate(str(path))
+    cache.get(str(path))
+    assert len(extract.calls) == 3
+
+
+def test_cache_is_bounded_and_prefetches(tmp_path):
+    paths = []
+    for i in range(5):
+        path = tmp_path / f"photo{i}.jpg"
+        path.write_bytes(make_jpeg())
+        paths.append(str(path))
+    assert nearby(paths, 1, radius=2) == [paths[1], paths[2], paths[0], paths[3]]
+
+    extract = CountingExtract()
+    cache = MetadataCache(max_entries=3, extract=extract)
+    cache.prefetch(nearby(paths, 1, radius=2))
+    deadline = time.monotonic() + 5
+    while len(extract.calls) < 4 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    cache.close()
+
+    assert extract.calls == [paths[1], paths[2], paths[0], paths[3]]
+    assert list(cache.entries) == [paths[2], paths[0], paths[3]]
+
+
+def test_preview_rows_page_large_values():
+    assert preview_node((52.0, 22.0, 1.5)) == ("52.0, 22.0, 1.5", False)
+    assert preview_node({'GPSLatitudeRef': 'N'}) == ("1 entries", True)
+    assert preview_node(b'\x00' * 5000) == ("<5,000 bytes>", True)
+    summary, expandable = preview_node("x" * 1000)
+    assert expandable and summary.endswith("(1,000 characters)")
+
+    full_line = "41 42 " * 8 + " ABABABABABABABAB"
+    rows, next_start = preview_rows(b'AB' * 20, count=2)
+    assert rows == [("00000000", full_line), ("00000010", full_line)]
+    assert next_start == 32
+    rows, next_start = preview_rows(b'AB' * 20, start=next_start, count=2)
+    assert rows == [("00000020", f"{'41 42 ' * 4:<48} ABABABAB")]
+    assert next_start is None
+
+    rows, next_start = preview_rows(list(range(10)), start=8)
+    assert rows == [("[8]", 8), ("[9]", 9)] and next_start is None
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for the background thumbnails in metadata_thumbnails.
+Run with: python -m pytest test_thumbnails.py
+"""
+
+import io
+import os
+import shutil
+import struct
+import time
+
+from PIL import Image
+
+import metadata_thumbnails
+from metadata_thumbnails import ThumbnailCache, ThumbnailLoader, content_key, make_thumbnail
+from test_formats import jpeg_segment, make_png
+
+
+def jpeg_bytes(size, color):
+    buf = io.BytesIO()
+    Image.new('RGB', size, color).save(buf, 'JPEG')
+    return buf.getvalue()
+
+
+def make_jpeg_with_thumbnail(thumbnail, orientation=None):
+    """A red JPEG whose EXIF IFD1 embeds the given JPEG thumbnail"""
+    ifd0 = [] if orientation is None else [struct.pack('<HHIHH', 0x0112, 3, 1, orientation, 0)]
+    ifd1_at = 8 + 2 + 12 * len(ifd0) + 4
+    thumbnail_at = ifd1_at + 2 + 2 * 12 + 4
+    exif = (b'Exif\x00\x00II*\x00' + struct.pack('<I', 8)
+            + struct.pack('<H', len(ifd0)) + b''.join(ifd0) + struct.pack('<I', ifd1_at)
+            + struct.pack('<H', 2)
+            + struct.pack('<HHII', 513, 4, 1, thumbnail_at)
+            + struct.pack('<HHII', 514, 4, 1, len(thumbnail))
+            + struct.pack('<I', 0)
+            + thumbnail)
+    data = jpeg_bytes((640, 480), (255, 0, 0))
+    return data[:2] + jpeg_segment(0xE1, exif) + data[2:]
+
+
+def thumbnail_color(data):
+    with Image.open(io.BytesIO(data)) as img:
+        return img.convert('RGB').getpixel((img.width // 2, img.height // 2))
+
+
+def test_embedded_thumbnail_is_preferred(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(make_jpeg_with_thumbnail(jpeg_bytes((160, 120), (0, 0, 255))))
+
+    data = make_thumbnail(str(path))
+
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.size == (32, 24)
+    red, green, blue = thumbnail_color(data)
+    assert blue > 200 and red < 50
+
+
+def test_jpeg_without_thumbnail_uses_draft_mode(tmp_path, monkeypatch):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(jpeg_bytes((640, 480), (0, 255, 0)))
+    decoded = []
+    original = metadata_thumbnails._encode
+
+    def record(img, size):
+        decoded.append(img.size)
+        return original(img, size)
+
+    monkeypatch.setattr(metadata_thumbnails, '_encode', record)
+    data = make_thumbnail(str(path))
+
+    # The decoder scaled the 640x480 image down by 8 before resizing
+    assert decoded == [(80, 60)]
+    assert thumbnail_color(data)[1] > 200
+
+
+def test_thumbnails_follow_exif_orientation(tmp_path):
+    # Orientation 6: stored on its side, shown rotated 90 degrees clockwise
+    path = tmp_path / "embedded.jpg"
+    path.write_bytes(make_jpeg_with_thumbnail(jpeg_bytes((160, 120), (0, 0, 255)), 6))
+    with Image.open(io.BytesIO(make_thumbnail(str(path)))) as img:
+        assert img.size == (24, 32)
+
+    path = tmp_path / "decoded.jpg"
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    Image.new('RGB', (640, 480), (0, 255, 0)).save(path, exif=exif)
+    with Image.open(io.BytesIO(make_thumbnail(str(path)))) as img:
+        assert img.size == (24, 32)
+
+
+def test_cache_is_keyed_by_content(tmp_path, monkeypatch):
+    first = tmp_path / "a.png"
+    first.write_bytes(make_png())
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    data = cache.get(str(first))
+    assert os.path.exists(cache.path_for(content_key(str(first))))
+
+    # A copy under another name is served from the disk cache
+    second = tmp_path / "b.png"
+    shutil.copyfile(first, second)
+    monkeypatch.setattr(metadata_thumbnails, 'make_thumbnail', None)
+    assert cache.get(str(second)) == data
+
+
+def test_loader_reports_finished_and_failed_files(tmp_path):
+    good = tmp_path / "a.png"
+    good.write_bytes(make_png())
+    bad = tmp_path / "b.jpg"
+    bad.write_bytes(b'not an image')
+    loader = ThumbnailLoader(ThumbnailCache(str(tmp_path / "cache")), jobs=2)
+
+    loader.request([str(good), str(bad)])
+    finished = {}
+    deadline = time.monotonic() + 5
+    while len(finished) < 2 and time.monotonic() < deadline:
+        finished.update(loader.results())
+        time.sleep(0.01)
+    loader.close()
+
+    assert finished[str(good)].startswith(b'\x89PNG')
+    assert finished[str(bad)] is None
+
+
+def test_cache_drops_least_recently_used_and_clears(tmp_path):
+    paths = []
+    for i in range(4):
+        path = tmp_path / f"{i}.png"
+        Image.new('RGB', (64, 64), (i * 60, 0, 0)).save(path)
+        paths.append(str(path))
+    cache = ThumbnailCache(str(tmp_path / "cache"))
+    cached = [cache.path_for(content_key(path)) for path in paths]
+    for i, path in enumerate(paths[:3]):
+        cache.get(path)
+        os.utime(cached[i], ns=(i, i))
+    cache.get(paths[0])  # Used again, so now the most recent
+
+    cache.max_bytes = 3 * os.path.getsize(cached[0]) + 1
+    cache.get(paths[3])
+    assert [os.path.exists(path) for path in cached] == [True, False, False, True]
+
+    cache.clear()
+    assert not os.path.exists(cache.root)
+    assert cache.get(paths[0]) and os.path.exists(cached[0])